@@ -0,0 +1,132 @@
+import threading
+import time
+
+from utils.logger import logger
+
+
+class AdaptiveFrameRate:
+    """
+    根据推理吞吐调整 scrcpy 采集帧率：推理跟不上的帧解码出来也只会被丢弃
+    城镇等空闲场景可切换到低功耗模式
+    """
+
+    def __init__(
+            self,
+            source,
+            detector,
+            min_fps: int = 3,
+            max_fps: int = 30,
+            headroom: float = 1.2,
+            hysteresis: float = 0.25,
+            interval: float = 5.0,
+            min_restart_interval: float = 30.0,
+            low_power_fps: int = 2,
+            low_power_width: int = None,
+    ):
+        """
+        :param source: 帧来源，需支持 reconfigure
+        :param detector: 推理器，需提供 throughput()
+        :param min_fps: 帧率下限
+        :param max_fps: 帧率上限
+        :param headroom: 目标帧率 = 推理吞吐 * headroom，略高于推理速度保证推理线程不空等
+        :param hysteresis: 目标与当前帧率相差超过该比例才调整
+        :param interval: 采样间隔秒数
+        :param min_restart_interval: 两次重启 scrcpy 的最小间隔秒数
+        :param low_power_fps: 低功耗模式帧率
+        :param low_power_width: 低功耗模式画面宽度，默认不变
+                                （坐标表按采集宽度写死，改宽度会让固定坐标的点击失效，只在确认不点击时使用）
+        """
+        self.source = source
+        self.detector = detector
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.headroom = headroom
+        self.hysteresis = hysteresis
+        self.interval = interval
+        self.min_restart_interval = min_restart_interval
+        self.low_power_fps = low_power_fps
+        self.low_power_width = low_power_width
+        self.normal_width = source.max_width
+        self.low_power = False
+        self._last_restart = float("-inf")
+        self._wakeup = threading.Event()
+        # 模式切换请求与已处理的请求序号，set_low_power 据此等待重启完成
+        self._requested = 0
+        self._applied = 0
+        self._applied_cond = threading.Condition()
+        self.thread_run = True
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def set_low_power(self, enabled: bool, timeout: float = 15.0) -> bool:
+        """
+        切换低功耗模式，立即生效；等 scrcpy 重启完成后才返回，避免随后的点击发到正在重启的客户端上
+        :param enabled:
+        :param timeout: 最长等待秒数
+        :return: 是否已在超时前生效
+        """
+        if self.low_power == enabled:
+            return True
+        logger.info(f"低功耗模式: {enabled}")
+        self.low_power = enabled
+        # 模式切换不受重启间隔限制
+        self._last_restart = float("-inf")
+        with self._applied_cond:
+            self._requested += 1
+            request = self._requested
+        self._wakeup.set()
+        with self._applied_cond:
+            return self._applied_cond.wait_for(
+                lambda: self._applied >= request or not self.thread_run, timeout
+            )
+
+    def target_fps(self) -> int:
+        """
+        计算目标帧率
+        :return:
+        """
+        if self.low_power:
+            return self.low_power_fps
+        throughput = self.detector.throughput()
+        if throughput <= 0:
+            return self.source.max_fps
+        return int(min(self.max_fps, max(self.min_fps, round(throughput * self.headroom))))
+
+    def adjust(self):
+        """
+        按当前推理吞吐调整一次
+        :return: 是否重启了 scrcpy
+        """
+        now = time.perf_counter()
+        if now - self._last_restart < self.min_restart_interval:
+            return False
+        fps = self.target_fps()
+        width = self.low_power_width if self.low_power and self.low_power_width else self.normal_width
+        current = self.source.max_fps
+        if width == self.source.max_width and abs(fps - current) <= current * self.hysteresis:
+            return False
+        if self.source.reconfigure(max_fps=fps, max_width=width):
+            self._last_restart = now
+            return True
+        return False
+
+    def run(self):
+        while self.thread_run:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            with self._applied_cond:
+                request = self._requested
+            try:
+                self.adjust()
+            except Exception as e:
+                logger.error(e)
+            with self._applied_cond:
+                self._applied = request
+                self._applied_cond.notify_all()
+
+    def stop(self):
+        self.thread_run = False
+        self._wakeup.set()
+        with self._applied_cond:
+            self._applied_cond.notify_all()
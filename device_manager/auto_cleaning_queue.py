@@ -2,6 +2,10 @@ import queue
 
 class AutoCleaningQueue(queue.Queue):
     def put(self, item, block=True, timeout=None):
-        if self.full():
-            self.get()  # 自动丢弃最旧的元素
-        super().put(item, block, timeout)
+        # 在队列自身的锁内完成丢弃与写入，避免 full()/get()/put() 之间被其他线程插入导致阻塞
+        with self.not_full:
+            while self.maxsize > 0 and self._qsize() >= self.maxsize:
+                self._get()  # 自动丢弃最旧的元素
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
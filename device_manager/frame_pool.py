@@ -0,0 +1,117 @@
+import threading
+import time
+
+import numpy as np
+
+
+class FrameRef:
+    """
+    帧池中某个槽位的引用，持有者通过 image 读取只读视图，用完必须 release
+    """
+
+    __slots__ = ("pool", "slot", "frame_id", "timestamp", "image", "trace", "thumb")
+
+    def __init__(self, pool, slot, frame_id, timestamp, image):
+        self.pool = pool
+        self.slot = slot
+        self.frame_id = frame_id  # 帧序号
+        self.timestamp = timestamp  # 采集时间 time.perf_counter()
+        self.image = image  # 只读视图
+        self.trace = {}  # 各阶段时间戳，见 LatencyTracer
+        self.thumb = None  # 灰度缩略图，见 TransitionDetector
+
+    def retain(self, count: int = 1):
+        """
+        增加引用计数，把同一帧交给其他消费方前调用
+        :param count:
+        :return: self
+        """
+        self.pool.retain(self.slot, count)
+        return self
+
+    def release(self):
+        """
+        释放引用，引用计数归零后槽位可被复用
+        :return:
+        """
+        self.pool.release(self.slot)
+
+
+class FramePool:
+    """
+    预分配的帧缓冲池，避免每帧都分配一块新的 ndarray
+    """
+
+    def __init__(self, slots: int = 8):
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._buffers = [None] * slots
+        self._ref_counts = [0] * slots
+        self._next = 0
+        self.frame_id = 0
+        self.drop_count = 0  # 没有空闲槽位而被丢弃的帧数
+
+    def put(self, frame: np.ndarray, timestamp: float = None):
+        """
+        把一帧拷贝进空闲槽位
+        :param frame: 解码出的帧
+        :param timestamp: 采集时间，默认当前时间
+        :return: FrameRef（引用计数为 1），没有空闲槽位时返回 None
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        with self._lock:
+            slot = self._find_free_slot()
+            if slot is None:
+                self.drop_count += 1
+                return None
+            # 先占住槽位，拷贝放在锁外进行
+            self._ref_counts[slot] = 1
+            self.frame_id += 1
+            frame_id = self.frame_id
+        buffer = self._buffers[slot]
+        if buffer is None or buffer.shape != frame.shape or buffer.dtype != frame.dtype:
+            # 分辨率变化（如横竖屏切换）时才重新分配
+            buffer = np.empty_like(frame)
+            self._buffers[slot] = buffer
+        np.copyto(buffer, frame)
+        view = buffer.view()
+        view.flags.writeable = False
+        return FrameRef(self, slot, frame_id, timestamp, view)
+
+    def _find_free_slot(self):
+        for i in range(self.slots):
+            slot = (self._next + i) % self.slots
+            if self._ref_counts[slot] == 0:
+                self._next = (slot + 1) % self.slots
+                return slot
+        return None
+
+    def retain(self, slot: int, count: int = 1):
+        with self._lock:
+            self._ref_counts[slot] += count
+
+    def release(self, slot: int):
+        with self._lock:
+            if self._ref_counts[slot] > 0:
+                self._ref_counts[slot] -= 1
+
+    def in_use(self):
+        """
+        正在被引用的槽位数
+        :return:
+        """
+        with self._lock:
+            return sum(1 for count in self._ref_counts if count > 0)
+
+
+def release_frame(item):
+    """
+    信箱丢弃旧值时的回调：释放其中携带的 FrameRef
+    :param item: FrameRef 或 [FrameRef, ...] 形式的消息
+    :return:
+    """
+    if isinstance(item, FrameRef):
+        item.release()
+    elif isinstance(item, (list, tuple)) and item and isinstance(item[0], FrameRef):
+        item[0].release()
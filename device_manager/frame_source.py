@@ -0,0 +1,256 @@
+import os
+import threading
+import time
+
+import cv2 as cv
+import scrcpy
+from adbutils import adb
+
+from utils.logger import logger
+
+
+class FrameSource:
+    """
+    帧来源基类：start 后通过回调持续输出 BGR 帧
+    """
+
+    # 设备控制端，提供 touch(x, y, action, touch_id)，离线来源为 None
+    control = None
+
+    def start(self, on_frame):
+        """
+        开始输出帧
+        :param on_frame: 回调，参数为一帧 BGR 图像
+        :return:
+        """
+        raise NotImplementedError
+
+    def stop(self):
+        """
+        停止输出帧
+        :return:
+        """
+        raise NotImplementedError
+
+    def reconfigure(self, max_fps=None, max_width=None):
+        """
+        调整输出帧率与宽度，不支持的来源忽略
+        :param max_fps:
+        :param max_width:
+        :return: 是否生效
+        """
+        return False
+
+
+class ScrcpyFrameSource(FrameSource):
+    """
+    通过 scrcpy 获取真机/模拟器画面
+    """
+
+    def __init__(self, device=None, max_width=1168, max_fps=15):
+        """
+        :param device: adb 设备或序列号，默认取第一个设备
+        :param max_width: 画面最大宽度
+        :param max_fps: 最大帧率
+        """
+        if device is None:
+            devices = adb.device_list()
+            if not devices:
+                raise Exception("No devices connected")
+            device = devices[0]
+            adb.connect("127.0.0.1:5555")
+        elif isinstance(device, str):
+            device = adb.device(serial=device)
+        self.device = device
+        self.max_width = max_width
+        self.max_fps = max_fps
+        self.client = None
+        self._on_frame = None
+        self._lock = threading.Lock()
+
+    @property
+    def control(self):
+        # 重启期间等新客户端就绪，不把点击发给正在关闭的旧客户端
+        with self._lock:
+            return self.client.control if self.client is not None else None
+
+    def start(self, on_frame):
+        self._on_frame = on_frame
+        self.client = scrcpy.Client(
+            device=self.device, max_width=self.max_width, max_fps=self.max_fps
+        )
+        self.client.add_listener(scrcpy.EVENT_FRAME, on_frame)
+        self.client.start(threaded=True)
+
+    def stop(self):
+        if self.client is not None:
+            self.client.stop()
+
+    def reconfigure(self, max_fps=None, max_width=None):
+        """
+        scrcpy 不支持运行中修改参数，这里用新参数重启客户端
+        """
+        max_fps = max_fps or self.max_fps
+        max_width = max_width or self.max_width
+        if max_fps == self.max_fps and max_width == self.max_width:
+            return False
+        with self._lock:
+            logger.info(f"scrcpy 重启: fps {self.max_fps} -> {max_fps}, width {self.max_width} -> {max_width}")
+            self.stop()
+            self.max_fps = max_fps
+            self.max_width = max_width
+            self.start(self._on_frame)
+        return True
+
+
+class ReplayFrameSource(FrameSource):
+    """
+    回放录制的 MP4 或 PNG 图片目录（如 create_img/img/waitTrain），用于无设备的基准测试与回归测试
+    """
+
+    MODE_REALTIME = "realtime"  # 按录制时的时间间隔输出
+    MODE_FAST = "fast"  # 尽可能快地输出
+    MODE_FIXED = "fixed"  # 按固定帧率输出
+
+    IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+    def __init__(self, path: str, mode: str = MODE_REALTIME, fps: float = 15, max_width=1168, loop=False):
+        """
+        :param path: MP4 文件或图片目录
+        :param mode: realtime / fast / fixed
+        :param fps: fixed 模式的帧率，也是图片目录无法得到时间间隔时的默认帧率
+        :param max_width: 与 scrcpy 一致，宽度超过时等比缩放
+        :param loop: 播放完后是否从头循环
+        """
+        if mode not in (self.MODE_REALTIME, self.MODE_FAST, self.MODE_FIXED):
+            raise ValueError(f"{mode} is not support")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found")
+        self.path = path
+        self.mode = mode
+        self.fps = fps
+        self.max_width = max_width
+        self.loop = loop
+        # fast 模式下每帧输出前调用，等待下游取走上一帧，避免回放过快导致丢帧
+        self.backpressure = None
+        self.frame_count = 0
+        self.finished = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self, on_frame):
+        self.finished.clear()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(on_frame,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def wait(self, timeout=None):
+        """
+        等待回放结束
+        :param timeout:
+        :return: 是否已结束
+        """
+        return self.finished.wait(timeout)
+
+    def _run(self, on_frame):
+        run_start = time.perf_counter()
+        start_time = run_start
+        try:
+            while not self._stop_event.is_set():
+                first_offset = None
+                for index, (frame, offset) in enumerate(self._read_frames()):
+                    if self._stop_event.is_set():
+                        break
+                    if first_offset is None:
+                        first_offset = offset
+                    self._pace(start_time, offset - first_offset, index)
+                    on_frame(self._resize(frame))
+                    self.frame_count += 1
+                if not self.loop:
+                    break
+                start_time = time.perf_counter()
+        except Exception as e:
+            logger.error(e)
+        finally:
+            elapsed = time.perf_counter() - run_start
+            logger.info(f"回放结束: {self.frame_count} 帧, {elapsed:.1f}s")
+            self.finished.set()
+
+    def _pace(self, start_time: float, offset: float, index: int):
+        """
+        按回放模式控制输出节奏
+        :param start_time: 本轮回放开始时间
+        :param offset: 当前帧相对第一帧的录制时间偏移
+        :param index: 当前帧在本轮回放中的序号
+        :return:
+        """
+        if self.mode == self.MODE_FAST:
+            if self.backpressure is not None:
+                self.backpressure()
+            return
+        if self.mode == self.MODE_FIXED:
+            # 循环回放时 start_time 每轮重置，偏移也按本轮的帧序号计算
+            offset = index / self.fps
+        delay = start_time + offset - time.perf_counter()
+        if delay > 0:
+            self._stop_event.wait(delay)
+
+    def _resize(self, frame):
+        height, width = frame.shape[:2]
+        if self.max_width and width > self.max_width:
+            height = int(height * self.max_width / width)
+            frame = cv.resize(frame, (self.max_width, height), interpolation=cv.INTER_AREA)
+        return frame
+
+    def _read_frames(self):
+        """
+        逐帧读取
+        :return: (帧, 录制时间偏移秒数) 的生成器
+        """
+        if os.path.isdir(self.path):
+            yield from self._read_image_dir()
+        else:
+            yield from self._read_video()
+
+    def _read_video(self):
+        capture = cv.VideoCapture(self.path)
+        if not capture.isOpened():
+            raise Exception(f"{self.path} can not be opened")
+        try:
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                yield frame, capture.get(cv.CAP_PROP_POS_MSEC) / 1000.0
+        finally:
+            capture.release()
+
+    def _read_image_dir(self):
+        names = sorted(
+            name for name in os.listdir(self.path)
+            if name.lower().endswith(self.IMAGE_EXTENSIONS)
+        )
+        for index, name in enumerate(names):
+            file_path = os.path.join(self.path, name)
+            frame = cv.imread(file_path)
+            if frame is None:
+                logger.error(f"{file_path} can not be read")
+                continue
+            # 采集脚本按时间顺序保存截图，文件修改时间即录制时间；realtime 以外的模式不关心
+            if self.mode == self.MODE_REALTIME:
+                offset = os.path.getmtime(file_path)
+            else:
+                offset = index / self.fps
+            yield frame, offset
+
+
+if __name__ == "__main__":
+    source = ReplayFrameSource("create_img/img/waitTrain", mode=ReplayFrameSource.MODE_FAST)
+    source.start(lambda frame: None)
+    source.wait()
@@ -0,0 +1,115 @@
+import threading
+
+
+class LatestMailbox:
+    """
+    单槽位"最新值"信箱：写入永不阻塞，新值直接覆盖旧值；读取方通过条件变量等待，不再忙轮询
+    """
+
+    def __init__(self, on_drop=None):
+        """
+        :param on_drop: 旧值未被读取就被覆盖（或信箱关闭时仍未读取）时的回调，用于释放资源
+        """
+        self._cond = threading.Condition(threading.Lock())
+        self._item = None
+        self._has_item = False
+        self._closed = False
+        self.on_drop = on_drop
+        self.seq = 0  # 已写入的值的序号
+        self.last_seq = 0  # 最近一次读取到的值的序号
+        self.put_count = 0
+        self.get_count = 0
+        self.drop_count = 0  # 未被读取就被覆盖的值的数量
+
+    def put(self, item):
+        """
+        写入新值，覆盖未被读取的旧值
+        :param item:
+        :return: 新值的序号
+        """
+        with self._cond:
+            dropped = self._has_item
+            old_item = self._item
+            self._item = item
+            self._has_item = True
+            self.seq += 1
+            self.put_count += 1
+            if dropped:
+                self.drop_count += 1
+            seq = self.seq
+            self._cond.notify_all()
+        # 回调放在锁外执行，避免回调里再访问信箱时死锁
+        if dropped and self.on_drop is not None:
+            self.on_drop(old_item)
+        return seq
+
+    def get(self, timeout=None):
+        """
+        取出最新值，没有新值时阻塞等待
+        :param timeout: 超时秒数，None 表示一直等待
+        :return: 最新值，超时或信箱已关闭时返回 None
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._has_item or self._closed, timeout):
+                return None
+            if not self._has_item:
+                return None
+            item = self._item
+            self._item = None
+            self._has_item = False
+            self.last_seq = self.seq
+            self.get_count += 1
+            self._cond.notify_all()
+            return item
+
+    def get_nowait(self):
+        """
+        非阻塞读取
+        :return: 最新值，没有新值时返回 None
+        """
+        return self.get(timeout=0)
+
+    def wait_empty(self, timeout=None):
+        """
+        等待当前值被读取，用于回放等需要背压的场景
+        :param timeout: 超时秒数，None 表示一直等待
+        :return: 是否已被读取
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._has_item or self._closed, timeout)
+
+    def empty(self):
+        with self._cond:
+            return not self._has_item
+
+    def close(self):
+        """
+        关闭信箱，唤醒所有等待中的读取方
+        :return:
+        """
+        with self._cond:
+            self._closed = True
+            dropped = self._has_item
+            old_item = self._item
+            self._item = None
+            self._has_item = False
+            self._cond.notify_all()
+        if dropped and self.on_drop is not None:
+            self.on_drop(old_item)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def stats(self):
+        """
+        统计信息
+        :return:
+        """
+        with self._cond:
+            return {
+                "seq": self.seq,
+                "put": self.put_count,
+                "get": self.get_count,
+                "drop": self.drop_count,
+            }
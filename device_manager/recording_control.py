@@ -0,0 +1,183 @@
+import difflib
+import importlib
+import threading
+import time
+
+import scrcpy
+
+from utils.logger import logger
+
+
+class VirtualClock:
+    """
+    虚拟时钟：sleep 不真正等待，只推进时间偏移；now 为真实流逝时间加上累计的 sleep 时间
+    """
+
+    # 会调用 time.sleep 的模块，install 时把它们的 time 替换为虚拟时钟
+    MODULES = (
+        "device_manager.scrcpy_adb",
+        "game.dengeon.game_action",
+        "game.hero_control.hero_control_base",
+        "game.hero_control.axl",
+        "game.hero_control.hong_yan",
+        "game.hero_control.hua_hua",
+        "game.hero_control.jian_zong",
+        "game.hero_control.nai_ma",
+        "game.hero_control.wu_shen",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._offset = 0.0
+        self.sleep_count = 0
+        self._patched = {}
+
+    def now(self) -> float:
+        with self._lock:
+            return time.perf_counter() - self._start + self._offset
+
+    def sleep(self, seconds: float):
+        with self._lock:
+            self._offset += max(0.0, seconds)
+            self.sleep_count += 1
+
+    @property
+    def slept(self) -> float:
+        """
+        累计跳过的 sleep 秒数
+        """
+        return self._offset
+
+    def install(self, modules=MODULES):
+        """
+        替换指定模块中的 time 模块
+        :param modules: 模块名列表
+        :return:
+        """
+        proxy = _VirtualTime(self)
+        for name in modules:
+            module = importlib.import_module(name)
+            if name not in self._patched:
+                self._patched[name] = module.time
+            module.time = proxy
+
+    def uninstall(self):
+        for name, original in self._patched.items():
+            importlib.import_module(name).time = original
+        self._patched = {}
+
+
+class _VirtualTime:
+    """
+    time 模块的替身：sleep/time 走虚拟时钟，其余属性转发给真实的 time 模块
+    """
+
+    def __init__(self, clock: VirtualClock):
+        self._clock = clock
+        self._wall_start = time.time()
+
+    def sleep(self, seconds):
+        self._clock.sleep(seconds)
+
+    def time(self):
+        return self._wall_start + self._clock.now()
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+class RecordingControl:
+    """
+    记录触摸事件的控制端，可替代 scrcpy 的 control 传给 ScrcpyADB，不向设备发送任何操作
+    每个事件记录为一行：虚拟时间,动作,x,y,触点id
+    """
+
+    ACTION_NAMES = {
+        scrcpy.ACTION_DOWN: "d",
+        scrcpy.ACTION_MOVE: "m",
+        scrcpy.ACTION_UP: "u",
+    }
+
+    def __init__(self, path: str, clock: VirtualClock = None):
+        """
+        :param path: 事件文件路径
+        :param clock: 时间戳来源，默认新建一个虚拟时钟
+        """
+        self.path = path
+        self.clock = clock or VirtualClock()
+        self.event_count = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "w", encoding="utf-8")
+        self._real_start = time.perf_counter()
+
+    def touch(self, x: int, y: int, action: int = scrcpy.ACTION_DOWN, touch_id: int = -1):
+        """
+        与 scrcpy ControlSender.touch 参数一致
+        """
+        line = f"{self.clock.now():.3f},{self.ACTION_NAMES.get(action, action)},{x},{y},{touch_id}\n"
+        with self._lock:
+            self._file.write(line)
+            self.event_count += 1
+
+    def throughput(self) -> float:
+        """
+        每真实秒记录的事件数
+        :return:
+        """
+        elapsed = time.perf_counter() - self._real_start
+        return self.event_count / elapsed if elapsed > 0 else 0.0
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def load_events(path: str):
+    """
+    读取事件文件
+    :param path:
+    :return: [(时间, 动作, x, y, 触点id)]
+    """
+    events = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            t, action, x, y, touch_id = line.strip().split(",")
+            events.append((float(t), action, int(x), int(y), int(touch_id)))
+    return events
+
+
+def diff_events(path_a: str, path_b: str):
+    """
+    对比两次录制的动作序列（忽略时间戳）
+    :return: unified diff 文本行
+    """
+    a = [f"{action},{x},{y},{touch_id}" for _, action, x, y, touch_id in load_events(path_a)]
+    b = [f"{action},{x},{y},{touch_id}" for _, action, x, y, touch_id in load_events(path_b)]
+    return list(difflib.unified_diff(a, b, path_a, path_b, lineterm=""))
+
+
+if __name__ == "__main__":
+    import sys
+
+    from device_manager.frame_source import ReplayFrameSource
+    from device_manager.scrcpy_adb import ScrcpyADB
+    from game.dengeon.game_action import GameAction
+
+    # python -m device_manager.recording_control <回放目录或MP4> <英雄> <输出文件>
+    replay_path, hero_name, output_path = sys.argv[1:4]
+    clock = VirtualClock()
+    clock.install()
+    control = RecordingControl(output_path, clock)
+    source = ReplayFrameSource(replay_path, mode=ReplayFrameSource.MODE_FAST)
+    adb = ScrcpyADB(source=source, control=control)
+    action = GameAction(hero_name, adb, lambda: None)
+    source.wait()
+    time.sleep(1)
+    action.thread_run = False
+    control.close()
+    logger.info(
+        f"回放 {source.frame_count} 帧, 记录 {control.event_count} 个触摸事件, "
+        f"{control.throughput():.1f} 事件/s, 跳过 sleep {clock.slept:.1f}s"
+    )
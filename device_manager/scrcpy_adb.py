@@ -5,15 +5,25 @@ import time
 from typing import Tuple
 
 import scrcpy
-from adbutils import adb
 import cv2 as cv
 
 from utils.logger import logger
+from utils.latency_tracer import LatencyTracer
+from utils.frame_gate import FrameChangeGate
+from utils.transition_detector import TransitionDetector
 from utils.path_manager import PathManager
 
 # from utils.yolov5 import YoloV5s
+from utils.detector import backend_kwargs, create_detector
+from utils.fast_nms import FastNMS
+from utils.process_detector import ProcessDetector
 from utils.yolov5_onnx import YOLOv5
-from device_manager.auto_cleaning_queue import AutoCleaningQueue
+from utils.inference_server import InferenceServer
+from utils.ort_session import OrtSessionConfig
+from device_manager.latest_mailbox import LatestMailbox
+from device_manager.frame_pool import FramePool, release_frame
+from device_manager.frame_source import FrameSource, ScrcpyFrameSource, ReplayFrameSource
+from device_manager.adaptive_fps import AdaptiveFrameRate
 
 
 class ScrcpyADB:
@@ -21,52 +31,205 @@ class ScrcpyADB:
     连接设备，并启动 scrcpy
     """
 
-    def __init__(self, max_width=1168, max_fps=15):
-        devices = adb.device_list()[0]
-        if not devices:
-            raise Exception("No devices connected")
-        adb.connect("127.0.0.1:5555")
-
-        self.client = scrcpy.Client(
-            device=devices, max_width=max_width, max_fps=max_fps
-        )
-        self.client.add_listener(scrcpy.EVENT_FRAME, self.on_frame)
-        self.client.start(threaded=True)
+    def __init__(
+            self,
+            max_width=1168,
+            max_fps=15,
+            source: FrameSource = None,
+            control=None,
+            adaptive_fps=True,
+            inference_server: InferenceServer = None,
+            session_config: OrtSessionConfig = None,
+            input_size=None,
+            backend: str = "onnx",
+            pipelined: bool = False,
+            pipeline_depth: int = 2,
+            out_of_process: bool = False,
+            frame_reuse: bool = False,
+    ):
+        """
+        :param max_width: 画面最大宽度
+        :param max_fps: 最大帧率
+        :param source: 帧来源，默认通过 scrcpy 连接第一个设备；传入 ReplayFrameSource 可离线回放
+        :param control: 控制端，默认使用帧来源的控制端；传入 RecordingControl 可只记录触摸事件
+        :param adaptive_fps: 是否根据推理吞吐自动调整 scrcpy 帧率，仅对 scrcpy 来源生效
+        :param inference_server: 多设备共享的推理服务，默认每个设备单独加载模型
+        :param session_config: ONNX Runtime 会话配置（线程数、后端等），使用共享推理服务时由服务自己配置
+        :param input_size: 推理输入尺寸 (宽, 高)，动态尺寸的模型可用 (640, 384) 减少补边
+        :param backend: 检测后端 onnx / ncnn / opencv / auto，auto 启动时自测并选择最快的后端
+        :param pipelined: 预处理、推理、后处理分三个线程流水执行，适合多核机器
+        :param pipeline_depth: 流水线阶段之间最多排队的帧数
+        :param out_of_process: 检测后端在独立进程中运行，避免与控制线程争抢 GIL
+        :param frame_reuse: 画面未变化时始终复用上一次的推理结果；默认只在低功耗模式（城镇、菜单）下复用，
+                            战斗中每帧都推理
+        """
+        if source is None:
+            source = ScrcpyFrameSource(max_width=max_width, max_fps=max_fps)
+        self.source = source
+        self._control = control
 
         self.last_screen = None
-        self.image_queue = AutoCleaningQueue(maxsize=3)
-        self.infer_queue = AutoCleaningQueue(maxsize=3)
-        self.show_queue = AutoCleaningQueue(maxsize=3)
+        # 只保留最新一帧，消费方阻塞等待新帧，不再忙轮询
+        # 信箱需在 scrcpy 启动前创建，否则首帧回调可能访问不到
+        # 信箱中传递的是帧池槽位的引用，被覆盖的旧帧自动归还帧池
+        # 流水线模式下两个阶段队列与推理、后处理线程还会各自持有帧，按深度加大帧池，否则常态下就会丢帧
+        slots = 8 + 2 * (pipeline_depth + 1) if pipelined else 8
+        self.frame_pool = FramePool(slots=slots)
+        self.image_queue = LatestMailbox(on_drop=release_frame)
+        self.infer_queue = LatestMailbox(on_drop=release_frame)
+        self.show_queue = LatestMailbox(on_drop=release_frame)
+        # 帧延迟追踪，丢帧数随统计一起输出
+        self.tracer = LatencyTracer()
+        self.tracer.add_counter("pool_drop", lambda: self.frame_pool.drop_count)
+        self.tracer.add_counter("image_drop", lambda: self.image_queue.drop_count)
+        self.tracer.add_counter("infer_drop", lambda: self.infer_queue.drop_count)
+        self.tracer.add_counter("infer_reuse", lambda: self.yolo.frame_gate.reuse_count)
+        # 过图转场检测，解码线程上每帧都处理（包括随后被丢弃的帧），GameAction 与推理跳帧共用
+        self.transition = TransitionDetector()
+        self.tracer.add_counter("fade_out", lambda: self.transition.fade_count)
+        self.tracer.add_counter("transition_skip", lambda: self.yolo.frame_gate.transition_skip_count)
+
+        if isinstance(source, ReplayFrameSource):
+            # 尽快回放时等推理线程取走上一帧再送下一帧
+            source.backpressure = self.image_queue.wait_empty
+        self.frame_reuse = frame_reuse
+
+        # 先创建推理器再开始采集：上面的计数器读取 self.yolo，模型加载较慢时统计可能先于推理器就绪输出
         self.yolo = self.init_yolov5(
-            self.image_queue, self.infer_queue, self.show_queue
+            self.image_queue,
+            self.infer_queue,
+            self.show_queue,
+            self.tracer,
+            inference_server,
+            session_config,
+            input_size,
+            backend,
+            pipelined,
+            out_of_process,
+            self.transition,
+            frame_reuse,
+            pipeline_depth,
         )
+        self.source.start(self.on_frame)
+        self.fps_controller = None
+        if adaptive_fps and isinstance(source, ScrcpyFrameSource):
+            self.fps_controller = AdaptiveFrameRate(source, self.yolo)
 
         self.frame_queue = queue.Queue()
         self.stop_event = threading.Event()
 
+    @property
+    def client(self):
+        return getattr(self.source, "client", None)
+
+    @property
+    def control(self):
+        if self._control is not None:
+            return self._control
+        return self.source.control
+
+    def set_low_power(self, enabled: bool):
+        """
+        城镇等空闲场景降低采集帧率并复用未变化画面的推理结果，scrcpy 重启完成后才返回，之后的点击可以直接发送
+        :param enabled:
+        :return:
+        """
+        self.yolo.frame_gate.enabled = enabled or self.frame_reuse
+        if self.fps_controller is not None:
+            self.fps_controller.set_low_power(enabled)
+
     @staticmethod
-    def init_yolov5(image_queue, infer_queue, show_queue):
+    def init_yolov5(
+            image_queue,
+            infer_queue,
+            show_queue,
+            tracer=None,
+            server=None,
+            session_config=None,
+            input_size=None,
+            backend="onnx",
+            pipelined=False,
+            out_of_process=False,
+            transition=None,
+            frame_reuse=False,
+            pipeline_depth=2,
+    ):
         """
         初始化 yolo v5
         :return:
         """
+        # 主模型输入尺寸固定时，寻路阶段使用单独导出的低分辨率模型（存在时）
+        low_model_path = os.path.join(PathManager.MODEL_PATH, "best_320.onnx")
+        if not os.path.exists(low_model_path):
+            low_model_path = None
+        # 存在 tools/export_nms_onnx.py 导出的内置 NMS 模型时优先使用（仅 fp32）
+        model_path = os.path.join(PathManager.MODEL_PATH, "best.onnx")
+        nms_model_path = os.path.join(PathManager.MODEL_PATH, "best_nms.onnx")
+        if os.path.exists(nms_model_path) and (session_config is None or session_config.precision == "fp32"):
+            model_path = nms_model_path
+        fast_nms = FastNMS()
+        detector = None
+        if out_of_process or backend != "onnx":
+            # 检测后端（包括子进程中的）使用与进程内 ONNX 推理相同的模型、会话配置与 NMS 配置
+            kwargs = backend_kwargs(backend, model_path, session_config, input_size, fast_nms)
+            if out_of_process:
+                detector = ProcessDetector(backend, **kwargs)
+            else:
+                detector = create_detector(backend, **kwargs)
         return YOLOv5(
-            os.path.join(PathManager.MODEL_PATH, "best.onnx"),
+            model_path,
             image_queue,
             infer_queue,
             show_queue,
+            tracer,
+            FrameChangeGate(transition=transition, enabled=frame_reuse),
+            server,
+            session_config,
+            input_size,
+            low_model_path=low_model_path,
+            fast_nms=fast_nms,
+            detector=detector,
+            pipelined=pipelined,
+            pipeline_depth=pipeline_depth,
         )
 
+    def close(self):
+        """
+        结束会话：停止采集、关闭检测后端（释放检测子进程与共享内存）
+        :return:
+        """
+        if self.fps_controller is not None:
+            self.fps_controller.stop()
+        self.source.stop()
+        self.yolo.close()
+
     def on_frame(self, frame: cv.Mat):
         """
         获取当前帧进行渲染
         """
         if frame is not None:
             try:
-                self.image_queue.put(frame)
+                now = time.perf_counter()
+                thumb = self.transition.update(frame, now)
+                ref = self.frame_pool.put(frame, now)
+                if ref is not None:
+                    ref.thumb = thumb
+                    self.tracer.mark(ref, "decode")
+                    self.image_queue.put(ref)
             except Exception as e:
                 logger.error(e)
 
+    def _send_touch(self, x: int, y: int, action: int, id: int):
+        """
+        发送触摸事件，离线回放且没有控制端时忽略
+        """
+        control = self.control
+        if control is None:
+            return
+        control.touch(x, y, action, id)
+        if action != scrcpy.ACTION_UP:
+            self.tracer.mark_touch()
+
     def touch_start(self, coordinate: Tuple[int or float, int or float], id: int = -1):
         """
         触摸屏幕
@@ -77,9 +240,9 @@ class ScrcpyADB:
         # logger.info('moveV2 ACTION_DOWN')
         # logger.info(id)
         # logger.info(coordinate)
-        self.client.control.touch(int(x), int(y), scrcpy.ACTION_UP, id)
+        self._send_touch(int(x), int(y), scrcpy.ACTION_UP, id)
         time.sleep(0.1)
-        self.client.control.touch(int(x), int(y), scrcpy.ACTION_DOWN, id)
+        self._send_touch(int(x), int(y), scrcpy.ACTION_DOWN, id)
 
     def touch_move(self, coordinate: Tuple[int or float, int or float], id: int = -1):
         """
@@ -89,7 +252,7 @@ class ScrcpyADB:
         """
         # logger.info('moveV2 ACTION_MOVE')
         x, y = coordinate
-        self.client.control.touch(int(x), int(y), scrcpy.ACTION_MOVE, id)
+        self._send_touch(int(x), int(y), scrcpy.ACTION_MOVE, id)
 
     def touch_end(
         self, coordinate: Tuple[int or float, int or float] = (0, 0), id: int = -1
@@ -102,7 +265,7 @@ class ScrcpyADB:
         # logger.info('moveV2 ACTION_UP')
         # logger.info(id)
         x, y = coordinate
-        self.client.control.touch(int(x), int(y), scrcpy.ACTION_UP, id)
+        self._send_touch(int(x), int(y), scrcpy.ACTION_UP, id)
 
     def touch(
         self, coordinate: Tuple[int or float, int or float], t: int or float = 0.5, id: int = -1
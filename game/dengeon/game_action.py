@@ -2,23 +2,17 @@
 import random
 
 from utils.logger import logger
+from utils import geometry
+from utils.transition_detector import TransitionDetector
 from device_manager.scrcpy_adb import ScrcpyADB
 from game.hero_control.hero_control import get_hero_control
 import time
-import cv2 as cv
 import math
-import numpy as np
 import threading
 from collections import deque
 from data_const.coordinate import *
 
 
-def find_highest_confidence(box):
-    if len(box) == 0:
-        return None  # 如果列表为空，返回 None
-    return max(box, key=lambda item: item[4])
-
-
 def calculate_center(box):  # 计算矩形框的底边中心点坐标
     return ((box[0] + box[2]) / 2, box[3])
 
@@ -39,85 +33,6 @@ def calculate_distance(center1, center2):  # 计算两个底边中心点之间
     return math.sqrt((center1[0] - center2[0]) ** 2 + (center1[1] - center2[1]) ** 2)
 
 
-def find_closest_box(boxes, target_box):  # 计算目标框的中心点
-    target_center = calculate_center(target_box)  # 初始化最小距离和最近的box
-    min_distance = float("inf")
-    closest_box = None  # 遍历所有box，找出最近的box
-    for box in boxes:
-        center = calculate_center(box)
-        distance = calculate_distance(center, target_center)
-        if distance < min_distance:
-            min_distance = distance
-            closest_box = box
-    return closest_box, min_distance
-
-
-def find_farthest_box(boxes, target_box):
-    target_center = calculate_center(target_box)  # 计算目标框的中心点
-    max_distance = -float("inf")  # 初始化最大距离和最远的box
-    farthest_box = None
-    for box in boxes:  # 遍历所有box，找出最远的box
-        center = calculate_center(box)
-        distance = calculate_distance(center, target_center)
-        if distance > max_distance:
-            max_distance = distance
-            farthest_box = box
-    return farthest_box, max_distance
-
-
-def find_closest_or_second_closest_box(boxes, point):
-    """找到离目标框最近的框或第二近的框"""
-    if len(boxes) < 2:
-        # 如果框的数量少于两个，直接返回最近的框
-        target_center = point
-        closest_box = None
-        min_distance = float("inf")
-        for box in boxes:
-            center = calculate_center(box)
-            distance = calculate_distance(center, target_center)
-            if distance < min_distance:
-                min_distance = distance
-                closest_box = box
-        return closest_box, distance
-    # 如果框的数量不少于两个
-    target_center = point
-    # 初始化最小距离和最近的框
-    min_distance_1 = float("inf")
-    closest_box_1 = None
-    # 初始化第二近的框
-    min_distance_2 = float("inf")
-    closest_box_2 = None
-    for box in boxes:
-        center = calculate_center(box)
-        distance = calculate_distance(center, target_center)
-        if distance < min_distance_1:
-            # 更新第二近的框
-            min_distance_2 = min_distance_1
-            closest_box_2 = closest_box_1
-            # 更新最近的框
-            min_distance_1 = distance
-            closest_box_1 = box
-        elif distance < min_distance_2:
-            # 更新第二近的框
-            min_distance_2 = distance
-            closest_box_2 = box
-    # 返回第二近的框
-    return closest_box_2, min_distance_2
-
-
-def find_close_point_to_box(boxes, point):  # 找距离点最近的框
-    target_center = point  # 初始化最小距离和最近的box
-    min_distance = float("inf")
-    closest_box = None  # 遍历所有box，找出最近的box
-    for box in boxes:
-        center = calculate_center(box)
-        distance = calculate_distance(center, target_center)
-        if distance < min_distance:
-            min_distance = distance
-            closest_box = box
-    return closest_box, min_distance
-
-
 def calculate_point_to_box_angle(point, box):  # 计算点到框的角度
     center1 = point
     center2 = calculate_center(box)
@@ -206,27 +121,6 @@ def get_door_coordinate_by_direction(direction):
     return direction_to_direction.get(direction, "")
 
 
-# 判断图片是否接近黑色
-def is_image_almost_black(image, threshold=30):  # 读取图片
-    image = cv.cvtColor(image, cv.IMREAD_GRAYSCALE)  # 检查图片是否成功读取
-    num_black_pixels = np.sum(image < threshold)
-    total_pixels = image.size
-    black_pixel_ratio = (
-        num_black_pixels / total_pixels
-    )  # 定义一个比例阈值来判断图片是否接近黑色
-    return black_pixel_ratio > 0.6
-
-
-def annotate_output_with_labels(output, output_dict, labels):
-    filtered_output = output[output[:, 4] > 0.35, :6]
-    # 遍历输出并分类
-    for detection in filtered_output:
-        detection_list = detection[:5].tolist()  # 提取前5个数值（检测框坐标和置信度）
-        category_index = int(detection[5].item())  # 获取类别索引
-        label = labels[category_index]  # 获取对应的标签名称
-        output_dict[label].append(detection_list)  # 添加检测框到相应的标签下
-
-
 map_info = {
     "bwj": {
         "cn_name": "布万加",
@@ -282,10 +176,17 @@ class GameAction:
     游戏控制
     """
 
-    def __init__(self, hero_name: str, adb: ScrcpyADB, next):
+    def __init__(self, hero_name: str, adb: ScrcpyADB, next, hero_ctrl=None, start: bool = True):
+        """
+        :param hero_name: 英雄名称
+        :param adb: 设备链接实例
+        :param next: 一局结束后的回调
+        :param hero_ctrl: 英雄控制，默认按 hero_name 创建
+        :param start: 是否立即启动控制线程，为 False 时可直接调用 control（如测试）
+        """
         self.adb = adb
         self.next = next
-        self.hero_ctrl = get_hero_control(hero_name, adb)
+        self.hero_ctrl = hero_ctrl if hero_ctrl is not None else get_hero_control(hero_name, adb)
         self.map_path = map_info["bwj"]["boss_path"]
         self.map_gate = map_info["bwj"]["boss_gate"]
         self.room_index = 0  # 房间下标
@@ -295,28 +196,34 @@ class GameAction:
         self.next_room_direction = "down"  # 下一个房间的方向
         self.detect_retry = False
         self.kashi = 0
+        self.run_count = 0  # 已完成的局数
         self.thread_run = True  # 循环执行条件
         self.thread = threading.Thread(target=self.control)  # 创建线程，并指定目标函数
         self.thread.daemon = True  # 设置为守护线程（可选）
-        self.thread.start()
+        if start:
+            self.thread.start()
 
     def control(self):
         last_room_pos = []
         hero_track = deque()
         hero_track.appendleft([0, 0])
+        frame = None
+        transition_cursor = self.adb.transition.cursor
+        fade_in_time = None  # 本次过图淡入的时间
         # 执行游戏逻辑
         while self.thread_run:
-            queue = self.adb.infer_queue
-            if queue.empty():
-                time.sleep(0.001)
+            # 获取推理结果，没有新结果时阻塞等待（超时后重新检查循环条件）
+            infer = self.adb.infer_queue.get(timeout=0.5)
+            if infer is None:
                 continue
-            # 获取推理结果
-            image, result = queue.get()
-            # 初始化字典，键为标签名称，值为空列表
-            output_dict = {label: [] for label in self.adb.yolo.labels}
-            # 获取分类字典
-            annotate_output_with_labels(result, output_dict, self.adb.yolo.labels)
-            result = output_dict
+            # 上一帧处理完毕，归还帧池
+            if frame is not None:
+                frame.release()
+            frame, result = infer
+            image = frame.image
+            # 按类别取结果均为数组视图，不再逐行构造列表
+            result = result.above(0.35)
+            self.adb.tracer.mark(frame, "decision")
             hero = result["hero"]
             monster = result["monster"]
             # 获取当前房间下应该进入的门
@@ -331,19 +238,31 @@ class GameAction:
             comeback = result["comeback"]
             zeroPL = result["zeroPL"]
             repair = result["repair"]
-            if is_image_almost_black(image):
-                if self.pre_state == False:
-                    logger.info("过图了！")
-                    self.kashi = 0
-                    last_room_pos = hero_track[0]
-                    hero_track = deque()
-                    hero_track.appendleft([1 - last_room_pos[0], 1 - last_room_pos[1]])
-                    self.hero_ctrl.reset()
-                    self.pre_state = True
-                else:
-                    continue
+            # 战斗与拾取需要全分辨率，寻路和菜单用低分辨率即可
+            if len(monster) > 0 or len(item) > 0:
+                self.adb.yolo.set_resolution(self.adb.yolo.RESOLUTION_FULL)
+            else:
+                self.adb.yolo.set_resolution(self.adb.yolo.RESOLUTION_LOW)
+            # 过图：解码线程上的转场检测给出淡出事件，不依赖控制线程恰好拿到黑屏帧
+            # 事件由解码线程给出，早于推理结果，手上的结果可能还是上一个房间的
+            events, transition_cursor = self.adb.transition.events_since(transition_cursor)
+            for event in events:
+                if event.kind == TransitionDetector.FADE_OUT:
+                    if self.pre_state == False:
+                        logger.info("过图了！")
+                        self.kashi = 0
+                        last_room_pos = hero_track[0]
+                        hero_track = deque()
+                        hero_track.appendleft([1 - last_room_pos[0], 1 - last_room_pos[1]])
+                        self.hero_ctrl.reset()
+                        self.pre_state = True
+                    fade_in_time = None
+                elif self.pre_state == True:
+                    fade_in_time = event.timestamp
             if self.pre_state == True:
-                # 记录房间号
+                # 只用淡入之后采集的帧记录房间号
+                if fade_in_time is None or frame.timestamp <= fade_in_time:
+                    continue
                 if len(hero) > 0:
                     self.room_index += 1
                     self.pre_state = False
@@ -353,6 +272,7 @@ class GameAction:
             # 翻盘
             if len(card) >= 8:
                 logger.info("翻盘")
+                self.run_count += 1
                 self.hero_ctrl.reset()
                 time.sleep(1)
                 self.adb.touch([0.7 * image.shape[1], 0.25 * image.shape[0]])
@@ -364,9 +284,7 @@ class GameAction:
             # 如果有怪物
             if len(monster) > 0:
                 logger.info(f"有怪物")
-                close_monster, distance = find_close_point_to_box(
-                    monster, hero_track[0]
-                )
+                close_monster, distance = result.nearest("monster", hero_track[0])
                 angle = calculate_point_to_box_angle(hero_track[0], close_monster)
                 close_monster_point = calculate_center(close_monster)
                 self.hero_ctrl.killMonsters(angle, self.room_index, hero_track[0], close_monster_point)
@@ -374,11 +292,11 @@ class GameAction:
             elif len(item) > 0:
                 logger.info("有物品")
                 if len(gate) > 0:
-                    close_gate, distance = find_close_point_to_box(gate, hero_track[0])
-                    farthest_item, distance = find_farthest_box(item, close_gate)
+                    close_gate, distance = geometry.nearest(gate, hero_track[0])
+                    farthest_item, distance = result.farthest("item", calculate_center(close_gate))
                     angle = calculate_point_to_box_angle(hero_track[0], farthest_item)
                 else:
-                    close_item, distance = find_close_point_to_box(item, hero_track[0])
+                    close_item, distance = result.nearest("item", hero_track[0])
                     angle = calculate_point_to_box_angle(hero_track[0], close_item)
                 # self.hero_ctrl.attack(False)
                 self.hero_ctrl.moveV2(angle)
@@ -399,9 +317,7 @@ class GameAction:
             # 狮子头前一个房间先找引导位
             elif len(guide) > 0 and self.room_index == 4 and len(gate) < 1:
                 logger.info("找引导位")
-                close_guide, distance = find_closest_or_second_closest_box(
-                    guide, hero_track[0]
-                )
+                close_guide, distance = geometry.closest_or_second_closest(guide, hero_track[0])
                 angle = calculate_point_to_box_angle(hero_track[0], close_guide)
                 # time.sleep(0.1)
                 self.hero_ctrl.moveV2(angle, 0.2)
@@ -416,12 +332,12 @@ class GameAction:
                 #     self.hero_ctrl.move(180, 1.5)
                 #     continue
                 if self.next_room_direction == "left":  # 左门
-                    close_gate, distance = find_close_point_to_box(gate, hero_track[0])
+                    close_gate, distance = geometry.nearest(gate, hero_track[0])
                     angle = calculate_gate_angle(hero_track[0], close_gate)
                     # 如果在执行普通攻击 则结束普通攻击
                     # self.ctrl.attack(False)
                 else:
-                    close_gate, distance = find_close_point_to_box(gate, hero_track[0])
+                    close_gate, distance = geometry.nearest(gate, hero_track[0])
                     angle = calculate_point_to_box_angle(hero_track[0], close_gate)
                     # self.ctrl.attack(False)
                 self.hero_ctrl.moveV2(angle)
@@ -430,16 +346,14 @@ class GameAction:
                 len(go) > 0 and self.kashi > 300
             ):
                 logger.info("有箭头")
-                close_arrow, distance = find_closest_or_second_closest_box(
-                    go, hero_track[0]
-                )
+                close_arrow, distance = geometry.closest_or_second_closest(go, hero_track[0])
                 angle = calculate_point_to_box_angle(hero_track[0], close_arrow)
                 self.hero_ctrl.moveV2(angle)
             # pl已刷完 返回城镇
             elif len(comeback) > 0 and len(zeroPL) > 0 and zeroPL[0][4] > 0.9:
               logger.info("pl已刷完 返回城镇")
               self.thread_run = False
-              self.adb.touch(get_dom_xy_px(find_highest_confidence(comeback), image), 0.2)
+              self.adb.touch(get_dom_xy_px(result.best("comeback"), image), 0.2)
               time.sleep(10)
               self.next()
             # 重新挑战
@@ -452,7 +366,7 @@ class GameAction:
                     time.sleep(1)
                     # 重新挑战
                     self.adb.touch(
-                        get_dom_xy_px(find_highest_confidence(again), image), 0.2
+                        get_dom_xy_px(result.best("again"), image), 0.2
                     )
                     time.sleep(0.5)
                     self.adb.touch(again_start_confirm, 0.2)
@@ -474,6 +388,8 @@ class GameAction:
                         angle = calculate_angle_to_box(hero_track[0], [0.5, 0.75])
                     self.hero_ctrl.moveV2(0)
                     self.hero_ctrl.moveV2(angle, 0.2)
+        if frame is not None:
+            frame.release()
 
     def random_move(self):
         """
@@ -38,29 +38,59 @@ class Main:
     主程序
     """
 
-    def __init__(self, hero_name: str):
-      self.adb = ScrcpyADB()
-      self.roles = {
-        '武神': {'name': 'wu_shen', 'point': role_wu_shen, 'next_role': None, 'map': 'bwj'},
-        '红眼': {'name': 'hong_yan','point': role_hong_yan, 'next_role': '武神', 'map': 'bwj'},
-        '奶妈':  {'name': 'nai_ma','point': role_nai_ma, 'next_role': '红眼', 'map': 'bwj'},
-        '百花':  {'name': 'hua_hua','point': role_hua_hua, 'next_role': '奶妈', 'map': 'bwj'},
-        '剑宗':  {'name': 'jian_zong','point': role_jian_zong, 'next_role': '百花', 'map': 'bwj'},
-      }
+    # 角色轮换表，next_role 为空表示轮换结束
+    roles = {
+      '武神': {'name': 'wu_shen', 'point': role_wu_shen, 'next_role': None, 'map': 'bwj'},
+      '红眼': {'name': 'hong_yan','point': role_hong_yan, 'next_role': '武神', 'map': 'bwj'},
+      '奶妈':  {'name': 'nai_ma','point': role_nai_ma, 'next_role': '红眼', 'map': 'bwj'},
+      '百花':  {'name': 'hua_hua','point': role_hua_hua, 'next_role': '奶妈', 'map': 'bwj'},
+      '剑宗':  {'name': 'jian_zong','point': role_jian_zong, 'next_role': '百花', 'map': 'bwj'},
+    }
+
+    def __init__(self, hero_name: str, adb: ScrcpyADB = None, show: bool = True):
+      """
+      :param hero_name: 第一个角色
+      :param adb: 设备连接，默认连接第一个设备
+      :param show: 是否显示识别画面
+      """
+      self.owns_adb = adb is None  # 自己创建的连接在角色轮换结束后关闭
+      self.adb = adb or ScrcpyADB()
       self.role = self.roles[hero_name]
-      self.thread = threading.Thread(target=self.view)  # 创建线程，并指定目标函数
-      self.thread.daemon = True  # 设置为守护线程（可选）
-      self.thread.start()
+      self.action = None
+      self.finished = False  # 角色轮换已结束
+      self.finished_runs = 0  # 已切换掉的角色完成的局数
+      if show:
+        self.thread = threading.Thread(target=self.view)  # 创建线程，并指定目标函数
+        self.thread.daemon = True  # 设置为守护线程（可选）
+        self.thread.start()
       
     def start(self):
+      # 进入地下城，恢复正常采集帧率
+      self.adb.set_low_power(False)
       next = partial(self.select_next_role)
       # 初始化游戏脚本
       self.action = GameAction(self.role['name'], self.adb, next)
       # 开始战斗
       self.adb.touch(battle_start)
+
+    def run_count(self):
+      """
+      已完成的局数
+      :return:
+      """
+      current = self.action.run_count if self.action else 0
+      return self.finished_runs + current
       
     def select_next_role(self):
+      # 城镇中切换角色不需要高帧率
+      self.adb.set_low_power(True)
+      action, self.action = self.action, None
+      if action:
+        self.finished_runs += action.run_count
       if not self.role['next_role']:
+        self.finished = True
+        if self.owns_adb:
+          self.adb.close()
         return
       self.adb.touch(setting, 0.5)
       time.sleep(1)
@@ -74,6 +104,7 @@ class Main:
       self.start()
     
     def select_role(self):
+      self.adb.set_low_power(True)
       if self.role:
         self.adb.touch(self.role['point'])
         time.sleep(1)
@@ -86,10 +117,13 @@ class Main:
     # 播放游戏画面  
     def view(self):
         while True:
-          if self.adb.show_queue.empty():
-              time.sleep(0.001)
+          show = self.adb.show_queue.get()
+          if show is None:
               continue
-          image, result = self.adb.show_queue.get()
+          frame, result = show
+          # 先缩放出一份新图再画框，帧池里的只读帧不做修改，缩放后即可归还
+          image = cv.resize(frame.image, (1168, int(frame.image.shape[0] * 1168 / frame.image.shape[1])))
+          frame.release()
           for boxs in result:
               # 把坐标从 float 类型转换为 int 类型
               det_x1, det_y1, det_x2, det_y2, conf, labelIndex = boxs
@@ -118,8 +152,6 @@ class Main:
                   (0, 0, 255),
                   2,
               )
-          # image = cv.resize(image, (1168, int(image.shape[0] * 1168 / image.shape[1])))
-          image = cv.resize(image, (1168, int(image.shape[0] * 1168 / image.shape[1])))
           cv.imshow("Image", image)
           cv.waitKey(1)
 
@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+
+from adbutils import adb
+
+from device_manager.frame_source import ScrcpyFrameSource
+from device_manager.scrcpy_adb import ScrcpyADB
+from main import Main
+from utils.inference_server import InferenceServer
+from utils.logger import logger
+from utils.ort_session import OrtSessionConfig
+from utils.path_manager import PathManager
+
+
+class DevicePipeline:
+    """
+    单个设备的完整流水线：采集 -> 推理 -> 控制，按 Main.roles 轮换角色
+    """
+
+    def __init__(self, serial: str, hero_name: str, server: InferenceServer):
+        self.serial = serial
+        self.adb = ScrcpyADB(
+            source=ScrcpyFrameSource(device=serial), inference_server=server
+        )
+        self.adb.tracer.name = serial
+        self.main = Main(hero_name, adb=self.adb, show=False)
+        self.start_time = None
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+
+    def run(self):
+        try:
+            self.start_time = time.time()
+            self.main.select_role()
+            time.sleep(1)
+            self.main.start()
+        except Exception as e:
+            logger.error(f"{self.serial} 启动失败: {e}")
+
+    def runs_per_hour(self) -> float:
+        if self.start_time is None:
+            return 0.0
+        hours = (time.time() - self.start_time) / 3600
+        return self.main.run_count() / hours if hours > 0 else 0.0
+
+
+class Orchestrator:
+    """
+    单进程驱动多个模拟器：每个设备一条流水线，共享模型会话与日志
+    """
+
+    # 常见模拟器的 adb 端口
+    EMULATOR_PORTS = (5555, 5557, 5559, 5561, 16384, 16416, 16448, 16480, 62001, 62025)
+
+    def __init__(
+            self,
+            devices: dict = None,
+            ports=EMULATOR_PORTS,
+            max_batch: int = None,
+            report_interval: float = 600,
+            session_config: OrtSessionConfig = None,
+    ):
+        """
+        :param devices: {序列号: 第一个角色}，默认自动发现设备，全部从轮换表的第一个角色开始
+        :param ports: 自动发现时尝试 adb connect 的本机端口
+        :param max_batch: 共享推理的最大 batch，默认等于设备数
+        :param report_interval: 输出每小时局数的间隔秒数
+        :param session_config: 共享推理会话的 ONNX Runtime 配置
+        """
+        if devices is None:
+            first_role = self.first_role()
+            devices = {serial: first_role for serial in self.discover_devices(ports)}
+        if not devices:
+            raise Exception("No devices connected")
+        self.devices = devices
+        self.report_interval = report_interval
+        self.server = InferenceServer(
+            os.path.join(PathManager.MODEL_PATH, "best.onnx"),
+            max_batch=max_batch or len(devices),
+            session_config=session_config,
+        )
+        self.pipelines = []
+
+    @staticmethod
+    def first_role() -> str:
+        """
+        轮换表中不是任何角色 next_role 的那个角色
+        :return:
+        """
+        next_roles = {role["next_role"] for role in Main.roles.values()}
+        for name in Main.roles:
+            if name not in next_roles:
+                return name
+        return next(iter(Main.roles))
+
+    @staticmethod
+    def discover_devices(ports=EMULATOR_PORTS):
+        """
+        连接本机模拟器端口并列出所有在线设备
+        :param ports:
+        :return: 序列号列表
+        """
+        for port in ports:
+            try:
+                adb.connect(f"127.0.0.1:{port}", timeout=1)
+            except Exception:
+                pass
+        serials = []
+        keys = set()
+        for device in adb.device_list():
+            # 同一个模拟器可能同时以 emulator-xxxx 和 127.0.0.1:xxxx 出现，只保留先出现的一个
+            key = Orchestrator.device_key(device.serial)
+            if key in keys:
+                logger.info(f"跳过重复设备: {device.serial}")
+                continue
+            keys.add(key)
+            serials.append(device.serial)
+        logger.info(f"发现设备: {serials}")
+        return serials
+
+    @staticmethod
+    def device_key(serial: str) -> str:
+        """
+        同一个模拟器的唯一标识：emulator-5554 的控制台端口为 5554，对应的 adb 端口为 5555
+        :param serial: adb 序列号
+        :return: 本机模拟器返回 adb 端口，其他设备返回序列号本身
+        """
+        if serial.startswith("emulator-") and serial[len("emulator-"):].isdigit():
+            return str(int(serial[len("emulator-"):]) + 1)
+        host, _, port = serial.rpartition(":")
+        if host in ("127.0.0.1", "localhost") and port.isdigit():
+            return port
+        return serial
+
+    def start(self):
+        for serial, hero_name in self.devices.items():
+            pipeline = DevicePipeline(serial, hero_name, self.server)
+            self.pipelines.append(pipeline)
+            pipeline.thread.start()
+
+    def report(self):
+        lines = []
+        for pipeline in self.pipelines:
+            role = "已结束" if pipeline.main.finished else pipeline.main.role["name"]
+            lines.append(
+                f"{pipeline.serial}: {pipeline.main.run_count()} 局, "
+                f"{pipeline.runs_per_hour():.1f} 局/小时, 当前角色 {role}"
+            )
+        lines.append(f"共享推理平均 batch: {self.server.average_batch():.2f}")
+        logger.info("设备统计:\n" + "\n".join(lines))
+
+    def run_forever(self):
+        self.start()
+        while not all(pipeline.main.finished for pipeline in self.pipelines):
+            time.sleep(self.report_interval)
+            self.report()
+        self.report()
+        for pipeline in self.pipelines:
+            pipeline.adb.close()
+
+
+if __name__ == "__main__":
+    orchestrator = Orchestrator()
+    orchestrator.run_forever()
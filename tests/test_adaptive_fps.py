@@ -0,0 +1,50 @@
+import time
+
+from device_manager.adaptive_fps import AdaptiveFrameRate
+
+
+class SlowSource:
+    """
+    重启需要一段时间的帧来源
+    """
+
+    def __init__(self, restart_time: float = 0.3):
+        self.max_fps = 15
+        self.max_width = 1168
+        self.restart_time = restart_time
+        self.restarting = False
+
+    def reconfigure(self, max_fps=None, max_width=None):
+        self.restarting = True
+        time.sleep(self.restart_time)
+        self.max_fps = max_fps or self.max_fps
+        self.max_width = max_width or self.max_width
+        self.restarting = False
+        return True
+
+
+class FixedThroughput:
+    def throughput(self):
+        return 0.0
+
+
+def test_set_low_power_returns_after_restart():
+    source = SlowSource()
+    controller = AdaptiveFrameRate(source, FixedThroughput(), interval=60)
+    try:
+        assert controller.set_low_power(True)
+        assert not source.restarting
+        assert source.max_fps == controller.low_power_fps
+        # 模式未变化时直接返回
+        assert controller.set_low_power(True, timeout=0)
+    finally:
+        controller.stop()
+
+
+def test_set_low_power_times_out():
+    source = SlowSource(restart_time=0.5)
+    controller = AdaptiveFrameRate(source, FixedThroughput(), interval=60)
+    try:
+        assert not controller.set_low_power(True, timeout=0.05)
+    finally:
+        controller.stop()
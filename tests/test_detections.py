@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from utils.detections import Detections
+from utils.yolov5_onnx import LABELS
+
+
+def test_known_label_without_boxes_is_empty():
+    result = Detections(np.array([[0.1, 0.1, 0.2, 0.2, 0.9, LABELS.index("hero")]], dtype=np.float32), LABELS)
+    assert len(result["hero"]) == 1
+    assert result["monster"].shape == (0, 6)
+    assert result.count("monster") == 0
+    assert result.best("monster") is None
+    assert Detections.empty(LABELS)["hero"].shape == (0, 6)
+
+
+def test_unknown_label_raises_value_error():
+    result = Detections.empty(LABELS)
+    with pytest.raises(ValueError, match="gate"):
+        result["gate"]
+    with pytest.raises(ValueError):
+        result.count("gate")
+
+
+
+class OrderedInitDetections(Detections):
+    """
+    另一个线程看到 _order 不为空时就会读取 _index 与 _bounds，两者必须先于 _order 赋值
+    """
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        if name == "_order" and value is not None:
+            assert self._index is not None and self._bounds is not None
+        super().__setattr__(name, value)
+
+
+def test_lazy_index_ready_before_order_is_set():
+    result = OrderedInitDetections(
+        np.array([[0.1, 0.1, 0.2, 0.2, 0.9, LABELS.index("hero")]], dtype=np.float32), LABELS
+    )
+    assert len(result["hero"]) == 1
@@ -0,0 +1,25 @@
+from utils.detector import backend_kwargs
+from utils.fast_nms import FastNMS
+from utils.ort_session import OrtSessionConfig
+
+
+def test_backend_kwargs_forwards_model_and_nms_config():
+    session_config = OrtSessionConfig(precision="int8")
+    fast_nms = FastNMS(conf_thres=0.3)
+    assert backend_kwargs("onnx", "model/best.onnx", session_config, (640, 384), fast_nms) == {
+        "model_path": "model/best.onnx",
+        "session_config": session_config,
+        "input_size": (640, 384),
+        "fast_nms": fast_nms,
+    }
+    # OpenCV 不支持内置 NMS 的模型，不传模型路径
+    assert backend_kwargs("opencv", "model/best_nms.onnx", session_config, (640, 640), fast_nms) == {
+        "input_size": (640, 640),
+        "fast_nms": fast_nms,
+    }
+    assert backend_kwargs("ncnn", "model/best.onnx", session_config, None, fast_nms) == {"fast_nms": fast_nms}
+    assert backend_kwargs("auto", "model/best.onnx", session_config, None, fast_nms) == {}
+
+
+def test_backend_kwargs_omits_unset_values():
+    assert backend_kwargs("onnx") == {}
@@ -0,0 +1,38 @@
+import numpy as np
+
+from utils.fast_nms import FastNMS
+from utils.yolov5_onnx import NonMaximumSuppression
+
+
+def row(x, y, obj, cls_scores):
+    return [x, y, 20, 20, obj, *cls_scores]
+
+
+def test_top_k_keeps_highest_final_scores():
+    # 前两行 objectness 更高但最终得分 0.9 * 0.3 = 0.27，第三行 0.5 * 0.99 = 0.495
+    prediction = np.array(
+        [
+            row(100, 100, 0.9, (0.3, 0.0)),
+            row(200, 100, 0.9, (0.3, 0.0)),
+            row(300, 100, 0.5, (0.0, 0.99)),
+        ],
+        dtype=np.float32,
+    )
+    out = FastNMS(top_k=2)(prediction)
+    assert len(out) == 2
+    assert out[0, 5] == 1 and np.isclose(out[0, 4], 0.495)
+
+
+def test_matches_reference_nms_without_truncation():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        n, nc = 2000, 12
+        prediction = np.empty((1, n, 5 + nc), dtype=np.float32)
+        prediction[0, :, :2] = rng.random((n, 2)) * 640
+        prediction[0, :, 2:4] = rng.random((n, 2)) * 60 + 4
+        prediction[0, :, 4:] = rng.random((n, 1 + nc)) ** 4
+        expected = NonMaximumSuppression(prediction, 0.15, 0.45)[0]
+        actual = FastNMS(top_k=n)(prediction)
+        expected = np.asarray(expected, dtype=np.float32)
+        assert actual.shape == expected.shape
+        assert np.allclose(actual, expected, atol=1e-4)
@@ -0,0 +1,55 @@
+import numpy as np
+
+from device_manager.frame_pool import FramePool
+from device_manager.latest_mailbox import LatestMailbox
+from utils.frame_gate import FrameChangeGate
+from utils.yolov5_onnx import YOLOv5
+
+
+def create_yolo():
+    """
+    不启动推理线程（不加载模型），只测试复用逻辑
+    """
+    return YOLOv5(
+        "best.onnx", LatestMailbox(), LatestMailbox(), LatestMailbox(), frame_gate=FrameChangeGate(), start=False
+    )
+
+
+def test_no_reuse_while_frames_in_flight():
+    yolo = create_yolo()
+    pool = FramePool(slots=8)
+    image = np.zeros((540, 1168, 3), dtype=np.uint8)
+    empty = np.zeros((0, 6), dtype=np.float32)
+
+    # 还没有结果时必定推理；第二帧成为变化判断的参照帧
+    for now in (0.0, 0.05):
+        ref = pool.put(image)
+        assert not yolo.reuse_last_output(ref, now)
+        yolo.publish(ref, empty)
+    # 画面未变化，参照帧的结果已发布，可以复用
+    ref = pool.put(image)
+    assert yolo.reuse_last_output(ref, 0.1)
+    assert yolo.infer_queue.get_nowait()[0] is ref
+
+    # 强制推理一帧，结果尚未发布时后续帧不能复用更早的结果
+    yolo.frame_gate.reset()
+    in_flight = pool.put(image)
+    assert not yolo.reuse_last_output(in_flight, 0.2)
+    waiting = pool.put(image)
+    assert not yolo.reuse_last_output(waiting, 0.25)
+    yolo.publish(in_flight, empty)
+    yolo.publish(waiting, empty)
+    # 在途的帧都已发布，恢复复用
+    assert yolo.reuse_last_output(pool.put(image), 0.3)
+
+
+def test_disabled_gate_always_infers():
+    yolo = create_yolo()
+    yolo.frame_gate.enabled = False
+    pool = FramePool(slots=8)
+    image = np.zeros((540, 1168, 3), dtype=np.uint8)
+    for now in (0.0, 0.05, 0.1, 0.15):
+        ref = pool.put(image)
+        assert not yolo.reuse_last_output(ref, now)
+        yolo.publish(ref, np.zeros((0, 6), dtype=np.float32))
+    assert yolo.frame_gate.reuse_count == 0
@@ -0,0 +1,29 @@
+import time
+
+import cv2 as cv
+import numpy as np
+import pytest
+
+pytest.importorskip("scrcpy")
+pytest.importorskip("adbutils")
+
+from device_manager.frame_source import ReplayFrameSource
+
+
+def test_fixed_mode_loop_does_not_delay_later_passes(tmp_path):
+    for i in range(3):
+        cv.imwrite(str(tmp_path / f"{i}.png"), np.zeros((8, 8, 3), dtype=np.uint8))
+    source = ReplayFrameSource(str(tmp_path), mode=ReplayFrameSource.MODE_FIXED, fps=10, loop=True)
+    times = []
+
+    def on_frame(frame):
+        times.append(time.perf_counter())
+        if len(times) == 6:
+            source._stop_event.set()
+
+    source.start(on_frame)
+    assert source.wait(timeout=5)
+    source.stop()
+    assert len(times) == 6
+    # 每轮 3 帧按 0.1s 间隔输出，第二轮从头开始计时，两轮共约 0.4s
+    assert times[-1] - times[0] < 0.45
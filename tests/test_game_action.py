@@ -0,0 +1,151 @@
+from collections import deque
+
+import numpy as np
+import pytest
+
+pytest.importorskip("scrcpy")
+pytest.importorskip("adbutils")
+
+from device_manager.frame_pool import FramePool
+from game.dengeon.game_action import GameAction
+from utils.detections import Detections
+from utils.latency_tracer import LatencyTracer
+from utils.transition_detector import TransitionDetector
+from utils.yolov5_onnx import LABELS
+
+
+class FakeYolo:
+    RESOLUTION_FULL = "full"
+    RESOLUTION_LOW = "low"
+
+    def set_resolution(self, resolution):
+        self.resolution = resolution
+
+
+class FakeHeroControl:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args))
+
+
+class FakeQueue:
+    """
+    依次返回给定的推理结果，取完后结束控制循环；可调用的项在取到时执行（如送入转场画面）
+    """
+
+    def __init__(self, action, items):
+        self.action = action
+        self.items = deque(items)
+
+    def get(self, timeout=None):
+        while self.items and callable(self.items[0]):
+            self.items.popleft()()
+        if not self.items:
+            self.action.thread_run = False
+            return None
+        return self.items.popleft()
+
+
+class FakeADB:
+    def __init__(self):
+        self.tracer = LatencyTracer(enabled=False)
+        self.transition = TransitionDetector()
+        self.yolo = FakeYolo()
+        self.touches = []
+
+    def touch(self, *args):
+        self.touches.append(args)
+
+
+def create_action(adb):
+    """
+    不启动控制线程，测试中直接调用 control
+    """
+    return GameAction("", adb, lambda: None, hero_ctrl=FakeHeroControl(), start=False)
+
+
+def detections(*rows):
+    return Detections(
+        np.array([[*box, conf, LABELS.index(label)] for label, box, conf in rows], dtype=np.float32), LABELS
+    )
+
+
+def run_control(action, *messages):
+    """
+    :param messages: Detections、(帧采集时间, Detections) 或在控制线程取结果时执行的函数
+    """
+    pool = FramePool(slots=len(messages) + 1)
+    image = np.zeros((540, 1168, 3), dtype=np.uint8)
+    items = []
+    for message in messages:
+        if callable(message):
+            items.append(message)
+            continue
+        timestamp, result = message if isinstance(message, tuple) else (None, message)
+        items.append([pool.put(image, timestamp), result])
+    action.adb.infer_queue = FakeQueue(action, items)
+    action.control()
+    return action.hero_ctrl.calls
+
+
+def feed_transition(detector, levels, start: float):
+    for i, level in enumerate(levels):
+        detector.feed(np.full((18, 32), level, dtype=np.uint8), start + i / 15)
+
+
+def test_door_in_view_moves_towards_door():
+    action = create_action(FakeADB())
+    calls = run_control(
+        action,
+        detections(("hero", (0.4, 0.3, 0.5, 0.5), 0.9), ("opendoor_d", (0.45, 0.8, 0.55, 0.95), 0.8)),
+    )
+    (name, (angle,)), = calls
+    assert name == "moveV2"
+    assert -100 < angle < -80  # 门在英雄正下方
+
+
+def test_item_with_door_in_view_picks_item_farthest_from_door():
+    action = create_action(FakeADB())
+    calls = run_control(
+        action,
+        detections(
+            ("hero", (0.4, 0.3, 0.5, 0.5), 0.9),
+            ("opendoor_d", (0.45, 0.8, 0.55, 0.95), 0.8),
+            ("item", (0.1, 0.1, 0.15, 0.15), 0.7),
+            ("item", (0.5, 0.8, 0.55, 0.85), 0.7),
+        ),
+    )
+    (name, (angle,)), = calls
+    assert name == "moveV2"
+    assert angle > 90  # 左上方的物品离门更远
+
+
+def test_room_counted_only_on_frames_after_fade_in():
+    adb = FakeADB()
+    action = create_action(adb)
+    old_room = detections(("hero", (0.4, 0.3, 0.5, 0.5), 0.9), ("opendoor_d", (0.45, 0.8, 0.55, 0.95), 0.8))
+    # 第二个房间的门在右边
+    new_room = detections(("hero", (0.1, 0.3, 0.2, 0.5), 0.9), ("opendoor_r", (0.8, 0.3, 0.9, 0.5), 0.8))
+    room_indexes = []
+    feed_transition(adb.transition, [120] * 8, start=0.0)
+    calls = run_control(
+        action,
+        lambda: feed_transition(adb.transition, [0, 0], start=8 / 15),
+        # 淡出后推理线程才交出的上一个房间的结果
+        (0.4, old_room),
+        lambda: room_indexes.append(action.room_index),
+        lambda: feed_transition(adb.transition, [120], start=10 / 15),
+        (0.5, old_room),
+        lambda: room_indexes.append(action.room_index),
+        (0.8, new_room),
+        (0.9, new_room),
+    )
+    assert room_indexes == [0, 0]
+    assert action.room_index == 1
+    assert not action.pre_state
+    # 过图时 reset 一次，之后只按新房间的结果移动
+    (reset, _), (move, (angle,)) = calls
+    assert (reset, move) == ("reset", "moveV2")
+    assert -10 < angle < 10
@@ -0,0 +1,135 @@
+import math
+
+import numpy as np
+import pytest
+
+from utils import geometry
+
+
+@pytest.fixture(scope="module")
+def ref():
+    """
+    game_action 中逐个计算角度的原函数，作为批量版本的参照
+    """
+    pytest.importorskip("scrcpy")
+    pytest.importorskip("adbutils")
+    from game.dengeon import game_action
+
+    return game_action
+
+
+def bottom_center(box):
+    return (box[0] + box[2]) / 2, box[3]
+
+
+def find_close_point_to_box(boxes, point):
+    """
+    game_action 中原先逐框循环查找的实现，作为批量版本的参照
+    """
+    closest_box, min_distance = None, float("inf")
+    for box in boxes:
+        distance = math.dist(bottom_center(box), point)
+        if distance < min_distance:
+            closest_box, min_distance = box, distance
+    return closest_box, min_distance
+
+
+def find_farthest_box(boxes, target_box):
+    farthest_box, max_distance = None, -float("inf")
+    for box in boxes:
+        distance = math.dist(bottom_center(box), bottom_center(target_box))
+        if distance > max_distance:
+            farthest_box, max_distance = box, distance
+    return farthest_box, max_distance
+
+
+def find_closest_or_second_closest_box(boxes, point):
+    if len(boxes) < 2:
+        return find_close_point_to_box(boxes, point)
+    closest = second = (None, float("inf"))
+    for box in boxes:
+        distance = math.dist(bottom_center(box), point)
+        if distance < closest[1]:
+            closest, second = (box, distance), closest
+        elif distance < second[1]:
+            second = (box, distance)
+    return second
+
+
+def random_cases(count: int = 500, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        n = int(rng.integers(1, 40))
+        xy = rng.random((n, 2))
+        boxes = np.concatenate((xy, xy + rng.random((n, 2)) * 0.3, rng.random((n, 2))), axis=1)
+        yield boxes, [list(box) for box in boxes], list(rng.random(2)), list(rng.random(6)), rng
+
+
+def assert_same_box(result, expected):
+    box, distance = result
+    ref_box, ref_distance = expected
+    assert np.allclose(box, ref_box)
+    assert np.isclose(distance, ref_distance)
+
+
+def test_nearest_matches_reference():
+    for boxes, box_list, point, target, _ in random_cases():
+        assert_same_box(geometry.nearest(boxes, point), find_close_point_to_box(box_list, point))
+        assert_same_box(
+            geometry.nearest(boxes, bottom_center(target)), find_close_point_to_box(box_list, bottom_center(target))
+        )
+
+
+def test_farthest_matches_reference():
+    for boxes, box_list, _, target, _ in random_cases():
+        assert_same_box(geometry.farthest(boxes, bottom_center(target)), find_farthest_box(box_list, target))
+
+
+def test_closest_or_second_closest_matches_reference():
+    for boxes, box_list, point, _, _ in random_cases():
+        assert_same_box(
+            geometry.closest_or_second_closest(boxes, point), find_closest_or_second_closest_box(box_list, point)
+        )
+
+
+def test_angles_match_reference(ref):
+    for boxes, box_list, point, target, _ in random_cases():
+        assert np.allclose(
+            geometry.point_to_box_angles(point, boxes),
+            [ref.calculate_point_to_box_angle(point, box) for box in box_list],
+        )
+        assert np.allclose(
+            geometry.gate_angles(point, boxes), [ref.calculate_gate_angle(point, box) for box in box_list]
+        )
+        assert np.allclose(
+            geometry.angles(point, boxes[:, :2]), [ref.calculate_angle_to_box(point, box[:2]) for box in box_list]
+        )
+        assert np.allclose(
+            geometry.point_to_box_angles(ref.calculate_center(target), boxes),
+            [ref.calculate_angle(target, box) for box in box_list],
+        )
+
+
+def test_k_nearest_matches_sorted_distances():
+    for boxes, _, point, _, rng in random_cases():
+        k = int(rng.integers(1, len(boxes) + 1))
+        index, distances = geometry.k_nearest(boxes, point, k)
+        expected = np.sort(geometry.distances(geometry.bottom_centers(boxes), point))[:k]
+        assert np.allclose(distances, expected)
+        assert np.allclose(geometry.distances(geometry.bottom_centers(boxes[index]), point), distances)
+
+
+def test_k_nearest_breaks_ties_by_index():
+    boxes = np.array([[0.0, 0.0, 0.2, 0.2], [0.2, 0.0, 0.4, 0.2], [0.0, 0.0, 0.2, 0.2]])
+    index, _ = geometry.k_nearest(boxes, (0.1, 0.2), 3)
+    assert index.tolist() == [0, 2, 1]
+
+
+def test_empty_boxes():
+    empty = np.zeros((0, 6), dtype=np.float32)
+    assert geometry.nearest(empty, (0, 0)) == (None, float("inf"))
+    assert geometry.farthest(empty, (0, 0)) == (None, -float("inf"))
+    assert geometry.closest_or_second_closest(empty, (0, 0)) == (None, float("inf"))
+    index, distances = geometry.k_nearest(empty, (0, 0), 3)
+    assert len(index) == 0 and len(distances) == 0
+    assert geometry.bottom_centers(empty).shape == (0, 2)
@@ -0,0 +1,94 @@
+import threading
+
+import numpy as np
+
+from device_manager.frame_pool import FramePool
+from device_manager.latest_mailbox import LatestMailbox
+from utils.inference_pipeline import InferencePipeline
+from utils.latency_tracer import LatencyTracer
+
+
+class FakeYolo:
+    """
+    只记录发布了哪些帧的推理器，postprocess 对 fail 中的帧号抛出异常
+    """
+
+    def __init__(self, fail=()):
+        self.image_queue = LatestMailbox()
+        self.tracer = LatencyTracer(enabled=False)
+        self.detector = None
+        self.fail = set(fail)
+        self.last_output_frame = 0
+        self.published = []
+        self.done = threading.Semaphore(0)
+
+    def postprocess(self, output, meta, resolution):
+        if output in self.fail:
+            raise ValueError(f"bad output {output}")
+        return output
+
+    def publish(self, ref, output):
+        self.last_output_frame = ref.frame_id
+        self.published.append(ref.frame_id)
+        ref.release()
+        self.done.release()
+
+    def update_busy_time(self, elapsed):
+        pass
+
+
+def start_postprocess(pipeline):
+    thread = threading.Thread(target=pipeline.postprocess_loop, daemon=True)
+    thread.start()
+
+
+def put_frames(pool, count):
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+    return [pool.put(image) for _ in range(count)]
+
+
+def test_results_older_than_published_are_dropped():
+    yolo = FakeYolo()
+    pipeline = InferencePipeline(yolo, depth=4)
+    pool = FramePool(slots=4)
+    first, second, third = put_frames(pool, 3)
+    # 异步推理时第二帧先于第一帧完成
+    for ref in (second, first, third):
+        pipeline.post_queue.put((ref, ref.frame_id, None, "full", 0.0))
+    start_postprocess(pipeline)
+    assert yolo.done.acquire(timeout=1) and yolo.done.acquire(timeout=1)
+    assert yolo.published == [second.frame_id, third.frame_id]
+    assert pool.in_use() == 0
+
+
+def test_stage_error_releases_frame_and_keeps_running():
+    pool = FramePool(slots=4)
+    first, second = put_frames(pool, 2)
+    yolo = FakeYolo(fail={first.frame_id})
+    pipeline = InferencePipeline(yolo, depth=4)
+    start_postprocess(pipeline)
+    for ref in (first, second):
+        pipeline.post_queue.put((ref, ref.frame_id, None, "full", 0.0))
+    assert yolo.done.acquire(timeout=1)
+    assert yolo.published == [second.frame_id]
+    assert pool.in_use() == 0
+
+
+def test_async_callback_drops_frame_when_postprocess_is_behind():
+    yolo = FakeYolo()
+    pipeline = InferencePipeline(yolo, depth=1)
+    pool = FramePool(slots=4)
+    waiting, late = put_frames(pool, 2)
+    pipeline.post_queue.put((waiting, waiting.frame_id, None, "full", 0.0))
+    pipeline.inflight.acquire()
+    # 后处理队列已满时回调立即返回，不阻塞 ORT 线程
+    callback = threading.Thread(
+        target=pipeline.on_infer_done,
+        args=([late.frame_id], (late, None, None, "full", 0.0, 0.0), None),
+        daemon=True,
+    )
+    callback.start()
+    callback.join(timeout=1)
+    assert not callback.is_alive()
+    assert pipeline.post_queue.qsize() == 1
+    assert pool.in_use() == 1
@@ -0,0 +1,28 @@
+from types import SimpleNamespace
+
+from utils.ort_session import OrtSessionConfig
+from utils.yolov5_onnx import YOLOv5
+
+
+class FixedInputSession:
+    def get_inputs(self):
+        return [SimpleNamespace(name="images", shape=[1, 3, 640, 640])]
+
+
+def test_missing_int8_low_model_falls_back_to_full(tmp_path):
+    # 只有 fp32 的 best_320.onnx，int8 精度下找不到 best_320_int8.onnx
+    low_model_path = tmp_path / "best_320.onnx"
+    low_model_path.write_bytes(b"")
+    yolo = YOLOv5(
+        str(tmp_path / "best.onnx"),
+        None,
+        None,
+        None,
+        session_config=OrtSessionConfig(precision="int8"),
+        low_model_path=str(low_model_path),
+        start=False,
+    )
+
+    yolo.init_low_resolution(FixedInputSession())
+    yolo.set_resolution(YOLOv5.RESOLUTION_LOW)
+    assert yolo.next_resolution() == YOLOv5.RESOLUTION_FULL
@@ -0,0 +1,21 @@
+from tools.ncnn_replace_focus import has_focus, replace_focus
+
+PARAM = """7767517
+3 3
+Input            images 0 1 images
+YoloV5Focus      focus 1 1 images 122
+Convolution      Conv_41 1 1 122 128 0=32 1=3 4=1 5=1 6=3456
+"""
+
+
+def test_replaced_param_has_no_focus_layer(tmp_path):
+    original = tmp_path / "model.param"
+    original.write_text(PARAM)
+    assert has_focus(str(original))
+
+    text, replaced = replace_focus(PARAM)
+    assert replaced == 1
+    converted = tmp_path / "converted.param"
+    converted.write_text(text)
+    assert not has_focus(str(converted))
+    assert text.splitlines()[1] == "5 8"
@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("scrcpy")
+adbutils = pytest.importorskip("adbutils")
+
+import orchestrator
+from orchestrator import Orchestrator
+
+
+def test_device_key_matches_emulator_and_tcp_serials():
+    assert Orchestrator.device_key("emulator-5554") == Orchestrator.device_key("127.0.0.1:5555")
+    assert Orchestrator.device_key("emulator-5556") == Orchestrator.device_key("localhost:5557")
+    assert Orchestrator.device_key("emulator-5554") != Orchestrator.device_key("127.0.0.1:5557")
+    assert Orchestrator.device_key("R58M12345") == "R58M12345"
+
+
+def test_discover_devices_skips_duplicates(monkeypatch):
+    serials = ["emulator-5554", "127.0.0.1:5555", "127.0.0.1:5557", "R58M12345"]
+    fake_adb = SimpleNamespace(
+        connect=lambda *args, **kwargs: None,
+        device_list=lambda: [SimpleNamespace(serial=serial) for serial in serials],
+    )
+    monkeypatch.setattr(orchestrator, "adb", fake_adb)
+    assert Orchestrator.discover_devices(ports=()) == ["emulator-5554", "127.0.0.1:5557", "R58M12345"]
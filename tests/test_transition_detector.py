@@ -0,0 +1,91 @@
+import numpy as np
+
+from utils.frame_gate import FrameChangeGate
+from utils.transition_detector import TransitionDetector
+
+FRAME_INTERVAL = 1 / 15
+
+
+def feed(detector, levels, start: float = 0.0):
+    """
+    按 15fps 依次送入亮度均匀的缩略图
+    :return: 各帧触发的事件类型（没有事件为 None）
+    """
+    kinds = []
+    for i, level in enumerate(levels):
+        event = detector.feed(np.full((18, 32), level, dtype=np.uint8), start + i * FRAME_INTERVAL)
+        kinds.append(event and event.kind)
+    return kinds
+
+
+def event_kinds(detector):
+    events, _ = detector.events_since(0)
+    return [event.kind for event in events]
+
+
+def test_full_fade():
+    detector = TransitionDetector()
+    feed(detector, [120] * 8 + [90, 50, 20, 0, 0, 0, 20, 60, 110] + [130] * 4)
+    assert event_kinds(detector) == [TransitionDetector.FADE_OUT, TransitionDetector.FADE_IN]
+    assert not detector.dark
+
+
+def test_fade_with_black_frames_dropped():
+    detector = TransitionDetector()
+    feed(detector, [120] * 8 + [80, 45, 40, 70, 125] + [130] * 4)
+    assert event_kinds(detector) == [TransitionDetector.FADE_OUT, TransitionDetector.FADE_IN]
+
+
+def test_flash_then_steady_scene():
+    detector = TransitionDetector()
+    feed(detector, [90] * 8 + [200, 90] + [90] * 90)
+    assert event_kinds(detector) == []
+    assert not detector.dark
+
+
+def test_long_flash_then_steady_scene_recovers():
+    detector = TransitionDetector()
+    feed(detector, [90] * 3 + [200] * 10 + [90] * 90)
+    assert not detector.dark
+    assert event_kinds(detector) in ([], [TransitionDetector.FADE_OUT, TransitionDetector.FADE_IN])
+
+
+def test_fade_into_dark_room():
+    detector = TransitionDetector()
+    kinds = feed(detector, [120] * 8 + [60, 20, 5, 5, 5, 20, 35] + [40] * 10)
+    assert event_kinds(detector) == [TransitionDetector.FADE_OUT, TransitionDetector.FADE_IN]
+    # 画面稳定几帧后即结束转场，不必等到超时
+    assert kinds.index(TransitionDetector.FADE_IN) < 8 + 7 + 5
+    assert not detector.dark
+
+
+def test_long_black_screen_times_out_once():
+    detector = TransitionDetector(max_duration=1.0)
+    feed(detector, [120] * 8 + [0] * 60)
+    assert event_kinds(detector) == [TransitionDetector.FADE_OUT, TransitionDetector.FADE_IN]
+    assert not detector.dark
+
+
+def test_events_since_cursor():
+    detector = TransitionDetector()
+    feed(detector, [120] * 8 + [0, 0])
+    cursor = detector.cursor
+    feed(detector, [120] * 3, start=10 * FRAME_INTERVAL)
+    events, new_cursor = detector.events_since(cursor)
+    assert [event.kind for event in events] == [TransitionDetector.FADE_IN]
+    assert detector.events_since(new_cursor) == ([], new_cursor)
+
+
+def test_frame_gate_skips_during_transition_and_infers_after():
+    detector = TransitionDetector()
+    gate = FrameChangeGate(transition=detector)
+    image = np.full((18, 32, 3), 120, dtype=np.uint8)
+    feed(detector, [120] * 8)
+    assert gate.should_infer(image, 0.0)
+    assert not gate.should_infer(image, 0.1)
+    feed(detector, [0, 0], start=8 * FRAME_INTERVAL)
+    assert not gate.should_infer(image, 0.7)
+    assert gate.transition_skip_count == 1
+    feed(detector, [120], start=10 * FRAME_INTERVAL)
+    # 转场结束后的第一帧必定推理，即使与转场前的画面相同
+    assert gate.should_infer(image, 0.75)
@@ -0,0 +1,128 @@
+"""
+ncnn 后端基准：在同一批图片上对比原先的逐帧实现与 YoloV5s 当前实现的耗时
+原先的实现每帧新建输入 Mat 与 extractor，用 np.array 拷贝三个检测头的输出，sigmoid 分配新数组，每个检测头重新生成网格
+在项目根目录执行:
+    python -m tools.bench_ncnn --images create_img/img/waitTrain
+    python -m tools.bench_ncnn --threads 4 --powersave 2 --extractor-pool 2
+"""
+import argparse
+import os
+
+import cv2 as cv
+import numpy as np
+import ncnn
+from ncnn.utils.functional import make_grid, sigmoid
+
+from tools.bench_nms import bench, compare
+from utils.logger import logger
+from utils.path_manager import PathManager
+from utils.yolov5 import YoloV5s
+
+# 三个检测头的输出 blob，顺序与 YoloV5s.stride 一致（stride 32, 16, 8）
+HEADS = ("381", "364", "output")
+
+
+def load_images(image_dir: str, limit: int):
+    files = sorted(
+        os.path.join(image_dir, name) for name in os.listdir(image_dir)
+        if name.lower().endswith((".png", ".jpg", ".jpeg", ".bmp"))
+    )[:limit]
+    images = [image for image in (cv.imread(file_path) for file_path in files) if image is not None]
+    if not images:
+        raise FileNotFoundError(f"{image_dir} 中没有图片")
+    return images
+
+
+def reference_preprocess(model: YoloV5s, img):
+    """
+    原先的预处理：每帧新建缩放后的 Mat 与补边后的 Mat
+    """
+    img_h, img_w = img.shape[:2]
+    if img_w > img_h:
+        w, h = model.target_size, int(img_h * model.target_size / img_w)
+    else:
+        w, h = int(img_w * model.target_size / img_h), model.target_size
+    mat_in = ncnn.Mat.from_pixels_resize(img, ncnn.Mat.PixelType.PIXEL_BGR2RGB, img_w, img_h, w, h)
+    wpad = (w + 31) // 32 * 32 - w
+    hpad = (h + 31) // 32 * 32 - h
+    mat_in_pad = ncnn.copy_make_border(
+        mat_in, hpad // 2, hpad - hpad // 2, wpad // 2, wpad - wpad // 2, ncnn.BorderType.BORDER_CONSTANT, 114.0
+    )
+    mat_in_pad.substract_mean_normalize(model.mean_vals, model.norm_vals)
+    return mat_in_pad
+
+
+def extract_heads(model: YoloV5s, mat_in_pad):
+    """
+    原先的推理：每帧新建 extractor
+    :return: ([三个检测头的输出], [(列数, 行数)])
+    """
+    ex = model.net.create_extractor()
+    ex.input("images", mat_in_pad)
+    pred = [np.asarray(ex.extract(name)[1]) for name in HEADS]
+    sizes = []
+    for i, head in enumerate(pred):
+        if mat_in_pad.w > mat_in_pad.h:
+            num_grid_x = mat_in_pad.w // model.stride[i]
+            sizes.append((num_grid_x, head.shape[1] // num_grid_x))
+        else:
+            num_grid_y = mat_in_pad.h // model.stride[i]
+            sizes.append((head.shape[1] // num_grid_y, num_grid_y))
+    return pred, sizes
+
+
+def reference_decode(model: YoloV5s, pred, sizes):
+    """
+    原先的解码：每个检测头拷贝一次、sigmoid 分配新数组、重新生成网格
+    """
+    z = []
+    for i, (head, (num_grid_x, num_grid_y)) in enumerate(zip(pred, sizes)):
+        y = sigmoid(np.array(head))
+        y = y.reshape(head.shape[0], num_grid_y, num_grid_x, head.shape[2])
+        y[..., 0:2] = (y[..., 0:2] * 2.0 - 0.5 + make_grid(num_grid_x, num_grid_y)) * model.stride[i]
+        y[..., 2:4] = (y[..., 2:4] * 2) ** 2 * model.anchor_grid[i]
+        z.append(y.reshape(1, -1, y.shape[-1]))
+    return np.concatenate(z, 1)
+
+
+def current_decode(model: YoloV5s, pred, sizes):
+    return np.concatenate([model.decode(head, i, *size) for i, (head, size) in enumerate(zip(pred, sizes))], 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ncnn 后端基准")
+    parser.add_argument("--images", default=os.path.join(PathManager.ROOT_OATH, "create_img/img/waitTrain"))
+    parser.add_argument("--limit", type=int, default=50, help="最多使用的图片数")
+    parser.add_argument("--repeat", type=int, default=5, help="每帧重复次数")
+    parser.add_argument("--threads", type=int, default=None, help="默认为大核数量")
+    parser.add_argument("--powersave", type=int, default=0)
+    parser.add_argument("--extractor-pool", type=int, default=1)
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.limit)
+    model = YoloV5s(num_threads=args.threads, powersave=args.powersave, extractor_pool=args.extractor_pool)
+    logger.info(f"{len(images)} 帧，{model.num_threads} 线程")
+
+    # 解码单独对比：在同一份检测头输出上计算，结果应完全一致
+    heads = [extract_heads(model, reference_preprocess(model, image)) for image in images]
+    decode = {
+        "decode_reference": lambda item: reference_decode(model, *item),
+        "decode_current": lambda item: current_decode(model, *item),
+    }
+    results = {name: bench(name, fn, heads, args.repeat * 10) for name, fn in decode.items()}
+    same, total = compare(results["decode_reference"][0], results["decode_current"][0])
+    speedup = results["decode_reference"][1].mean() / results["decode_current"][1].mean()
+    logger.info(f"解码: {speedup:.2f}x，结果一致 {same}/{total} 帧")
+
+    # 预处理 + 推理 + 解码整体对比；两种实现的缩放插值不同，只比较耗时
+    end_to_end = {
+        "reference": lambda image: reference_decode(model, *extract_heads(model, reference_preprocess(model, image))),
+        "current": lambda image: model.infer(model.preprocess(image)[0]),
+    }
+    results = {name: bench(name, fn, images, args.repeat) for name, fn in end_to_end.items()}
+    speedup = results["reference"][1].mean() / results["current"][1].mean()
+    logger.info(f"预处理 + 推理 + 解码: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
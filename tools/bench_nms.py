@@ -0,0 +1,136 @@
+"""
+NMS 微基准：在录制的模型原始输出上对比 torchvision、NumPy 逐行实现与 FastNMS 的耗时与结果
+在项目根目录执行:
+    python -m tools.bench_nms --images create_img/img/waitTrain   # 先录制原始输出再对比
+    python -m tools.bench_nms --raw model/raw_outputs.npz         # 直接使用已录制的输出
+"""
+import argparse
+import os
+import time
+
+import cv2 as cv
+import numpy as np
+
+from utils.fast_nms import FastNMS
+from utils.letterbox import Letterbox
+from utils.logger import logger
+from utils.ort_session import OrtSessionConfig, create_session, model_input_size
+from utils.path_manager import PathManager
+from utils.yolov5_onnx import NonMaximumSuppression, xywh2xyxy
+
+
+def record_outputs(model_path: str, image_dir: str, raw_path: str, limit: int = 200):
+    """
+    用模型跑一遍图片，保存原始输出 (1, N, 5 + nc)
+    """
+    session = create_session(model_path, OrtSessionConfig(providers=["CPUExecutionProvider"]))
+    letterbox = Letterbox(model_input_size(session, (640, 640)))
+    input_name = session.get_inputs()[0].name
+    files = sorted(
+        os.path.join(image_dir, name) for name in os.listdir(image_dir)
+        if name.lower().endswith((".png", ".jpg", ".jpeg", ".bmp"))
+    )[:limit]
+    outputs = []
+    for file_path in files:
+        image = cv.imread(file_path)
+        if image is None:
+            continue
+        tensor, _, _ = letterbox(image)
+        outputs.append(session.run(None, {input_name: tensor})[0])
+    if not outputs:
+        raise FileNotFoundError(f"{image_dir} 中没有图片")
+    np.savez_compressed(raw_path, *outputs)
+    logger.info(f"已录制 {len(outputs)} 帧原始输出: {raw_path}")
+    return outputs
+
+
+def load_outputs(raw_path: str):
+    with np.load(raw_path) as data:
+        return [data[key] for key in data.files]
+
+
+def torchvision_nms(prediction, conf_thres=0.15, iou_thres=0.45, max_det=300, max_wh=7680):
+    """
+    原先的 torch 实现（单帧、best class、类别偏移），作为基准
+    """
+    import torch
+    from torchvision.ops import nms
+
+    x = torch.from_numpy(prediction[0])
+    x = x[x[:, 4] > conf_thres]
+    if not x.shape[0]:
+        return np.zeros((0, 6), dtype=np.float32)
+    x[:, 5:] *= x[:, 4:5]
+    box = torch.from_numpy(xywh2xyxy(x[:, :4].numpy()))
+    conf, j = x[:, 5:].max(1, keepdim=True)
+    x = torch.cat((box, conf, j.float()), 1)[conf.view(-1) > conf_thres]
+    x = x[x[:, 4].argsort(descending=True)[:30000]]
+    c = x[:, 5:6] * max_wh
+    i = nms(x[:, :4] + c, x[:, 4], iou_thres)[:max_det]
+    return x[i].numpy()
+
+
+def bench(name, fn, outputs, repeat: int):
+    """
+    :return: (每帧结果, 每帧耗时毫秒)
+    """
+    results = [fn(output) for output in outputs]  # 预热，同时收集结果
+    latencies = []
+    for output in outputs:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(output)
+        latencies.append((time.perf_counter() - start) / repeat * 1000)
+    latencies = np.asarray(latencies)
+    p50, p95 = np.percentile(latencies, (50, 95))
+    logger.info(f"{name}: mean={latencies.mean():.3f}ms p50={p50:.3f}ms p95={p95:.3f}ms")
+    return results, latencies
+
+
+def compare(reference, candidate, atol: float = 1e-4):
+    """
+    :return: (结果完全一致的帧数, 总帧数)
+    """
+    same = sum(
+        a.shape == b.shape and np.allclose(a, b, atol=atol)
+        for a, b in zip(reference, candidate)
+    )
+    return same, len(reference)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NMS 微基准")
+    parser.add_argument("--model", default=os.path.join(PathManager.MODEL_PATH, "best.onnx"))
+    parser.add_argument("--images", default=os.path.join(PathManager.ROOT_OATH, "create_img/img/waitTrain"))
+    parser.add_argument("--raw", default=os.path.join(PathManager.MODEL_PATH, "raw_outputs.npz"))
+    parser.add_argument("--limit", type=int, default=200, help="最多录制的帧数")
+    parser.add_argument("--repeat", type=int, default=20, help="每帧重复次数")
+    parser.add_argument("--top-k", type=int, default=1000)
+    args = parser.parse_args()
+
+    if os.path.exists(args.raw):
+        outputs = load_outputs(args.raw)
+    else:
+        outputs = record_outputs(args.model, args.images, args.raw, args.limit)
+    logger.info(f"{len(outputs)} 帧，单帧候选 {outputs[0].shape[1]}")
+
+    methods = {
+        "numpy": lambda output: NonMaximumSuppression(output)[0],
+        "fast": FastNMS(top_k=args.top_k),
+    }
+    try:
+        import torchvision  # noqa: F401
+        methods = {"torchvision": torchvision_nms, **methods}
+    except ImportError:
+        logger.warning("未安装 torchvision，以 NumPy 实现为基准")
+
+    results = {name: bench(name, fn, outputs, args.repeat) for name, fn in methods.items()}
+    base = next(iter(results))
+    base_mean = results[base][1].mean()
+    for name, (detections, latencies) in results.items():
+        same, total = compare(results[base][0], detections)
+        logger.info(f"{name}: {base_mean / latencies.mean():.2f}x，与 {base} 一致 {same}/{total} 帧")
+
+
+if __name__ == "__main__":
+    main()
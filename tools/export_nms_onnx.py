@@ -0,0 +1,125 @@
+"""
+在 best.onnx 末尾追加解码与 NonMaxSuppression，导出直接输出 [x1, y1, x2, y2, conf, cls] 的模型
+NMS 由 ONNX Runtime 原生实现，Python 端不再做后处理循环
+在项目根目录执行: python -m tools.export_nms_onnx --conf 0.15 --iou 0.45
+"""
+import argparse
+import os
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+
+from utils.logger import logger
+from utils.path_manager import PathManager
+
+# 写入模型元数据，YOLOv5 据此识别已内置 NMS 的模型
+NMS_METADATA_KEY = "nms"
+MAX_WH = 7680  # 类别偏移量，与 FastNMS 一致
+
+
+def _const(graph, name: str, value, dtype=np.int64):
+    graph.initializer.append(numpy_helper.from_array(np.asarray(value, dtype=dtype), name))
+    return name
+
+
+def _fix_batch(model):
+    """
+    内置 NMS 的输出按单帧展开，batch 维固定为 1（共享推理服务会逐帧调用）
+    """
+    dim = model.graph.input[0].type.tensor_type.shape.dim[0]
+    if dim.dim_value != 1:
+        logger.warning(f"输入 batch 维 {dim.dim_param or dim.dim_value} 固定为 1")
+        dim.Clear()
+        dim.dim_value = 1
+
+
+def append_nms(model, conf_thres: float, iou_thres: float, max_det: int):
+    """
+    原始输出 (1, N, 5 + nc) -> detections (1, K, 6)，按得分降序
+    与 NonMaximumSuppression 相同：得分 = obj * cls，取最优类别，按类别偏移做 NMS
+    """
+    opset = max(op.version for op in model.opset_import if op.domain in ("", "ai.onnx"))
+    if opset < 11:
+        raise ValueError(f"opset {opset} 过低，至少需要 11")
+    _fix_batch(model)
+    graph = model.graph
+    raw = graph.output[0].name
+    nodes = [
+        # 拆分 xywh / obj / cls
+        helper.make_node("Slice", [raw, _const(graph, "nms_s0", [0]), _const(graph, "nms_s2", [2]),
+                                   _const(graph, "nms_axis2", [2])], ["nms_xy"]),
+        helper.make_node("Slice", [raw, "nms_s2", _const(graph, "nms_s4", [4]), "nms_axis2"], ["nms_wh"]),
+        helper.make_node("Slice", [raw, "nms_s4", _const(graph, "nms_s5", [5]), "nms_axis2"], ["nms_obj"]),
+        helper.make_node("Slice", [raw, "nms_s5", _const(graph, "nms_end", [2 ** 62]), "nms_axis2"],
+                         ["nms_cls_conf"]),
+        # 得分与最优类别
+        helper.make_node("Mul", ["nms_cls_conf", "nms_obj"], ["nms_scores"]),
+        helper.make_node("ArgMax", ["nms_scores"], ["nms_cls"], axis=2, keepdims=1),
+        helper.make_node("GatherElements", ["nms_scores", "nms_cls"], ["nms_conf"], axis=2),
+        helper.make_node("Cast", ["nms_cls"], ["nms_cls_f"], to=TensorProto.FLOAT),
+        # 中心点宽高 -> 左上右下
+        helper.make_node("Div", ["nms_wh", _const(graph, "nms_two", 2.0, np.float32)], ["nms_half"]),
+        helper.make_node("Sub", ["nms_xy", "nms_half"], ["nms_xy1"]),
+        helper.make_node("Add", ["nms_xy", "nms_half"], ["nms_xy2"]),
+        helper.make_node("Concat", ["nms_xy1", "nms_xy2"], ["nms_boxes"], axis=2),
+        # 类别偏移后只需一个类别的 NMS
+        helper.make_node("Mul", ["nms_cls_f", _const(graph, "nms_max_wh", MAX_WH, np.float32)], ["nms_offset"]),
+        helper.make_node("Add", ["nms_boxes", "nms_offset"], ["nms_boxes_offset"]),
+        helper.make_node("Transpose", ["nms_conf"], ["nms_conf_t"], perm=[0, 2, 1]),
+        helper.make_node(
+            "NonMaxSuppression",
+            [
+                "nms_boxes_offset",
+                "nms_conf_t",
+                _const(graph, "nms_max_det", [max_det]),
+                _const(graph, "nms_iou", [iou_thres], np.float32),
+                _const(graph, "nms_score", [conf_thres], np.float32),
+            ],
+            ["nms_selected"],
+            center_point_box=0,
+        ),
+        # selected: (K, 3) [batch, class, box]，取第 3 列作为行号
+        helper.make_node("Gather", ["nms_selected", _const(graph, "nms_col", 2)], ["nms_index"], axis=1),
+        helper.make_node("Concat", ["nms_boxes", "nms_conf", "nms_cls_f"], ["nms_rows"], axis=2),
+        helper.make_node("Reshape", ["nms_rows", _const(graph, "nms_shape_rows", [-1, 6])], ["nms_rows_2d"]),
+        helper.make_node("Gather", ["nms_rows_2d", "nms_index"], ["nms_det"], axis=0),
+        helper.make_node("Reshape", ["nms_det", _const(graph, "nms_shape_out", [1, -1, 6])], ["detections"]),
+    ]
+    graph.node.extend(nodes)
+    while len(graph.output):
+        graph.output.pop()
+    graph.output.append(helper.make_tensor_value_info("detections", TensorProto.FLOAT, [1, "num_det", 6]))
+    for key, value in (
+            (NMS_METADATA_KEY, "1"),
+            ("nms_conf_thres", str(conf_thres)),
+            ("nms_iou_thres", str(iou_thres)),
+            ("nms_max_det", str(max_det)),
+    ):
+        model.metadata_props.append(onnx.StringStringEntryProto(key=key, value=value))
+    return model
+
+
+def export(model_path: str, output_path: str, conf_thres: float, iou_thres: float, max_det: int):
+    model = onnx.load(model_path)
+    if any(prop.key == NMS_METADATA_KEY for prop in model.metadata_props):
+        raise ValueError(f"{model_path} 已内置 NMS")
+    model = append_nms(model, conf_thres, iou_thres, max_det)
+    onnx.checker.check_model(model)
+    onnx.save(model, output_path)
+    logger.info(f"内置 NMS 的模型已保存: {output_path} (conf={conf_thres}, iou={iou_thres}, max_det={max_det})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出内置 NMS 的 ONNX 模型")
+    parser.add_argument("--model", default=os.path.join(PathManager.MODEL_PATH, "best.onnx"))
+    parser.add_argument("--output", default=os.path.join(PathManager.MODEL_PATH, "best_nms.onnx"))
+    parser.add_argument("--conf", type=float, default=0.15, help="得分阈值")
+    parser.add_argument("--iou", type=float, default=0.45, help="IoU 阈值")
+    parser.add_argument("--max-det", type=int, default=300, help="单帧最大检测数")
+    args = parser.parse_args()
+    export(args.model, args.output, args.conf, args.iou, args.max_det)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+把 ncnn param 中的 YoloV5Focus 自定义层替换为内置的 Reorg + Slice + Concat，推理时不再回调 Python
+在项目根目录执行: python -m tools.ncnn_replace_focus --param model/new2.param
+"""
+import argparse
+import os
+import shutil
+
+from utils.logger import logger
+from utils.path_manager import PathManager
+
+FOCUS_LAYER = "YoloV5Focus"
+
+# Reorg(mode=1) 的输出通道按 (行偏移, 列偏移) = (0,0) (0,1) (1,0) (1,1) 分组，
+# Focus 的拼接顺序是 (0,0) (1,0) (0,1) (1,1)，切成四组后按此顺序重新拼接
+FOCUS_ORDER = (0, 2, 1, 3)
+
+
+def focus_layers(name: str, bottom: str, top: str):
+    """
+    :return: 替换一个 Focus 层所需的三行 param，以及新增的 blob 数
+    """
+    reorg = f"{name}_reorg"
+    slices = [f"{name}_slice_{i}" for i in range(4)]
+    lines = [
+        f"Reorg            {name}_reorg 1 1 {bottom} {reorg} 0=2 1=1",
+        f"Slice            {name}_slice 1 4 {reorg} {' '.join(slices)} -23300=4,-233,-233,-233,-233 1=0",
+        f"Concat           {name} 4 1 {' '.join(slices[i] for i in FOCUS_ORDER)} {top} 0=0",
+    ]
+    return lines, 1 + len(slices)
+
+
+def replace_focus(text: str):
+    """
+    :param text: param 文件内容
+    :return: (新的 param 内容, 替换的层数)
+    """
+    lines = text.splitlines()
+    magic, header, body = lines[0], lines[1], lines[2:]
+    layer_count, blob_count = (int(value) for value in header.split())
+    output = []
+    replaced = 0
+    for line in body:
+        fields = line.split()
+        if not fields or fields[0] != FOCUS_LAYER:
+            output.append(line)
+            continue
+        # 类型 名称 输入数 输出数 输入... 输出... 参数...
+        name, bottom_count, top_count = fields[1], int(fields[2]), int(fields[3])
+        if bottom_count != 1 or top_count != 1:
+            raise ValueError(f"{name}: Focus 层应为单输入单输出")
+        new_lines, new_blobs = focus_layers(name, fields[4], fields[5])
+        output.extend(new_lines)
+        layer_count += len(new_lines) - 1
+        blob_count += new_blobs
+        replaced += 1
+    return "\n".join([magic, f"{layer_count} {blob_count}"] + output) + "\n", replaced
+
+
+def has_focus(param_path: str) -> bool:
+    """
+    param 文件中是否还有 YoloV5Focus 自定义层，utils/yolov5.py 加载模型时据此决定是否注册 Python 层
+    """
+    with open(param_path) as f:
+        return any(line.split()[:1] == [FOCUS_LAYER] for line in f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="替换 ncnn 模型中的 YoloV5Focus 自定义层")
+    parser.add_argument("--param", default=os.path.join(PathManager.MODEL_PATH, "new2.param"))
+    parser.add_argument("--output", default=None, help="默认覆盖原文件，原文件备份为 .bak")
+    args = parser.parse_args()
+
+    with open(args.param) as f:
+        text, replaced = replace_focus(f.read())
+    if not replaced:
+        logger.info(f"{args.param} 中没有 {FOCUS_LAYER} 层，无需处理")
+        return
+    output = args.output or args.param
+    if output == args.param:
+        shutil.copyfile(args.param, args.param + ".bak")
+    with open(output, "w") as f:
+        f.write(text)
+    logger.info(f"已替换 {replaced} 个 {FOCUS_LAYER} 层: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+生成 INT8 静态量化模型，并在留出的帧上与 FP32 模型对比延迟与检测一致性
+在项目根目录执行: python -m tools.quantize_int8 --images create_img/img/waitTrain
+"""
+import argparse
+import os
+import time
+
+import cv2 as cv
+import numpy as np
+import onnxruntime as ort
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    CalibrationMethod,
+    QuantFormat,
+    QuantType,
+    quantize_static,
+)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from utils.letterbox import Letterbox
+from utils.logger import logger
+from utils.ort_session import OrtSessionConfig, create_session, model_input_size
+from utils.path_manager import PathManager
+from utils.yolov5_onnx import LABELS, postprocess
+
+
+class FrameCalibrationReader(CalibrationDataReader):
+    """
+    用与线上相同的 letterbox 预处理提供校准数据
+    """
+
+    def __init__(self, files, input_name: str, input_size=(640, 640)):
+        self.files = iter(files)
+        self.input_name = input_name
+        self.letterbox = Letterbox(input_size)
+
+    def get_next(self):
+        for file_path in self.files:
+            image = cv.imread(file_path)
+            if image is None:
+                continue
+            tensor, _, _ = self.letterbox(image)
+            # letterbox 复用缓冲区，校准器可能缓存输入，这里必须拷贝
+            return {self.input_name: tensor.copy()}
+        return None
+
+
+def list_images(image_dir: str):
+    return sorted(
+        os.path.join(image_dir, name) for name in os.listdir(image_dir)
+        if name.lower().endswith((".png", ".jpg", ".jpeg", ".bmp"))
+    )
+
+
+def split_holdout(files, holdout_ratio: float):
+    """
+    按间隔抽取留出集，校准集与留出集覆盖同样的场景但不重叠
+    :return: (校准集, 留出集)
+    """
+    if holdout_ratio <= 0:
+        return files, []
+    step = max(2, int(round(1 / holdout_ratio)))
+    holdout = files[::step]
+    calibration = [file_path for i, file_path in enumerate(files) if i % step]
+    return calibration, holdout
+
+
+def quantize(fp32_path: str, int8_path: str, calibration_files, per_channel: bool = True):
+    """
+    QDQ 格式静态量化：权重 int8，激活 uint8
+    """
+    preprocessed_path = fp32_path.replace(".onnx", "_prep.onnx")
+    quant_pre_process(fp32_path, preprocessed_path)
+    session = ort.InferenceSession(preprocessed_path, providers=["CPUExecutionProvider"])
+    input_name = session.get_inputs()[0].name
+    input_size = model_input_size(session, (640, 640))
+    quantize_static(
+        preprocessed_path,
+        int8_path,
+        FrameCalibrationReader(calibration_files, input_name, input_size),
+        quant_format=QuantFormat.QDQ,
+        per_channel=per_channel,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=CalibrationMethod.MinMax,
+    )
+    os.remove(preprocessed_path)
+    logger.info(f"INT8 模型已保存: {int8_path}")
+
+
+def detect_all(session: ort.InferenceSession, files, input_size=(640, 640)):
+    """
+    :return: (每帧检测结果列表, 每帧 session.run 耗时毫秒)
+    """
+    letterbox = Letterbox(model_input_size(session, input_size))
+    input_name = session.get_inputs()[0].name
+    detections = []
+    latencies = []
+    for file_path in files:
+        image = cv.imread(file_path)
+        if image is None:
+            continue
+        tensor, pad, size = letterbox(image)
+        start = time.perf_counter()
+        output = session.run(None, {input_name: tensor})[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        detections.append(np.asarray(postprocess(output, pad, size)))
+    return detections, np.asarray(latencies)
+
+
+def pairwise_iou(a, b):
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:4], b[None, :, 2:4])
+    inter = np.clip(rb - lt, 0, None).prod(2)
+    area_a = (a[:, 2:4] - a[:, :2]).prod(1)
+    area_b = (b[:, 2:4] - b[:, :2]).prod(1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-7)
+
+
+def agreement(reference, candidate, iou_thres: float = 0.5):
+    """
+    以 FP32 结果为基准，按同类别、IoU 贪心匹配
+    :return: (召回率, 精确率, 匹配框平均 IoU, 每类召回率)
+    """
+    matched_ious = []
+    ref_total = cand_total = 0
+    class_hits = np.zeros(len(LABELS))
+    class_total = np.zeros(len(LABELS))
+    for ref, cand in zip(reference, candidate):
+        ref_total += len(ref)
+        cand_total += len(cand)
+        for cls in ref[:, 5].astype(int):
+            class_total[cls] += 1
+        if not len(ref) or not len(cand):
+            continue
+        iou = pairwise_iou(ref, cand)
+        iou[ref[:, 5][:, None] != cand[:, 5][None, :]] = 0
+        available = np.ones(len(cand), dtype=bool)
+        for i in np.argsort(-ref[:, 4]):
+            scores = np.where(available, iou[i], 0)
+            j = int(np.argmax(scores))
+            if scores[j] >= iou_thres:
+                available[j] = False
+                matched_ious.append(scores[j])
+                class_hits[int(ref[i, 5])] += 1
+    matched = len(matched_ious)
+    recall = matched / ref_total if ref_total else 1.0
+    precision = matched / cand_total if cand_total else 1.0
+    mean_iou = float(np.mean(matched_ious)) if matched_ious else 0.0
+    per_class = {
+        LABELS[i]: class_hits[i] / class_total[i] for i in range(len(LABELS)) if class_total[i]
+    }
+    return recall, precision, mean_iou, per_class
+
+
+def main():
+    parser = argparse.ArgumentParser(description="INT8 静态量化与对比")
+    parser.add_argument("--model", default=os.path.join(PathManager.MODEL_PATH, "best.onnx"))
+    parser.add_argument("--images", default=os.path.join(PathManager.ROOT_OATH, "create_img/img/waitTrain"))
+    parser.add_argument("--holdout", type=float, default=0.2, help="留出集比例")
+    parser.add_argument("--max-calibration", type=int, default=300, help="最多使用的校准帧数")
+    parser.add_argument("--threads", type=int, default=0, help="对比时 ORT intra_op 线程数")
+    parser.add_argument("--skip-quantize", action="store_true", help="只对比已有的 INT8 模型")
+    args = parser.parse_args()
+
+    files = list_images(args.images)
+    if not files:
+        raise FileNotFoundError(f"{args.images} 中没有图片")
+    calibration, holdout = split_holdout(files, args.holdout)
+    calibration = calibration[:args.max_calibration]
+    root, ext = os.path.splitext(args.model)
+    int8_path = root + OrtSessionConfig.PRECISIONS["int8"] + ext
+    if not args.skip_quantize:
+        logger.info(f"校准帧 {len(calibration)}，留出帧 {len(holdout)}")
+        quantize(args.model, int8_path, calibration)
+    if not holdout:
+        return
+
+    results = {}
+    for precision in ("fp32", "int8"):
+        config = OrtSessionConfig(
+            providers=["CPUExecutionProvider"],
+            intra_op_num_threads=args.threads,
+            precision=precision,
+            warmup_runs=3,
+        )
+        session = create_session(args.model, config)
+        results[precision] = detect_all(session, holdout)
+
+    lines = []
+    for precision, (_, latencies) in results.items():
+        p50, p95 = np.percentile(latencies, (50, 95))
+        lines.append(
+            f"{precision}: mean={latencies.mean():.1f}ms p50={p50:.1f}ms p95={p95:.1f}ms "
+            f"fps={1000 / latencies.mean():.1f}"
+        )
+    recall, precision, mean_iou, per_class = agreement(results["fp32"][0], results["int8"][0])
+    lines.append(f"INT8 相对 FP32: 召回率={recall:.3f} 精确率={precision:.3f} 平均IoU={mean_iou:.3f}")
+    lines.extend(f"  {label}: 召回率={value:.3f}" for label, value in per_class.items())
+    logger.info(f"留出集 {len(holdout)} 帧对比:\n" + "\n".join(lines))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import numpy as np
+
+from utils import geometry
+
+
+class Detections:
+    """
+    单帧检测结果：一个 (n, 6) float32 数组 [x1, y1, x2, y2, conf, cls]，坐标为相对原图的 0-1 比例
+    按类别取结果时返回数组切片（视图），第一次按类别访问时才按类别排序一次
+    同一行的顺序与检测器输出一致（按置信度降序）
+    """
+
+    __slots__ = ("data", "cls", "labels", "_index", "_order", "_bounds")
+
+    def __init__(self, data: np.ndarray, labels):
+        """
+        :param data: (n, 6) 检测结果
+        :param labels: 类别标签列表，下标即类别编号
+        """
+        self.data = np.asarray(data, dtype=np.float32).reshape(-1, 6)
+        self.cls = self.data[:, 5].astype(np.int64)
+        self.labels = labels
+        self._index = None  # 标签 -> 类别编号
+        self._order = None  # 按类别排序后的数据
+        self._bounds = None  # 每个类别在 _order 中的起止位置
+
+    @classmethod
+    def empty(cls, labels):
+        return cls(np.zeros((0, 6), dtype=np.float32), labels)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __getitem__(self, label: str) -> np.ndarray:
+        """
+        某个类别的全部检测框
+        :param label: 类别标签
+        :return: (m, 6) 视图，不要原地修改；已知类别没有检测到时为空
+        """
+        if self._order is None:
+            # 同一对象会同时交给控制线程与显示线程，先在局部变量中算好，最后赋值 _order 作为就绪标志
+            index = {name: i for i, name in enumerate(self.labels)}
+            # 稳定排序保持同类别内的置信度顺序
+            order = np.argsort(self.cls, kind="stable")
+            bounds = np.searchsorted(self.cls[order], np.arange(len(self.labels) + 1))
+            self._index = index
+            self._bounds = bounds
+            self._order = self.data[order]
+        i = self._index.get(label)
+        if i is None:
+            # 标签拼错时不能当作没检测到，否则对应逻辑会静默失效
+            raise ValueError(f"unknown label {label!r}, expected one of {self.labels}")
+        return self._order[self._bounds[i]:self._bounds[i + 1]]
+
+    def count(self, label: str) -> int:
+        return len(self[label])
+
+    def above(self, conf: float) -> "Detections":
+        """
+        :param conf: 置信度阈值
+        :return: 置信度大于阈值的检测结果
+        """
+        keep = self.data[:, 4] > conf
+        if keep.all():
+            return self
+        return Detections(self.data[keep], self.labels)
+
+    def best(self, label: str):
+        """
+        :return: 该类别置信度最高的框，没有时返回 None
+        """
+        boxes = self[label]
+        if not len(boxes):
+            return None
+        return boxes[int(np.argmax(boxes[:, 4]))]
+
+    def bottom_centers(self, label: str) -> np.ndarray:
+        """
+        :return: (m, 2) 各框底边中心点
+        """
+        return geometry.bottom_centers(self[label])
+
+    def distances(self, label: str, point) -> np.ndarray:
+        """
+        :return: (m,) 各框底边中心点到 point 的距离
+        """
+        return geometry.distances(self.bottom_centers(label), point)
+
+    def nearest(self, label: str, point):
+        """
+        底边中心点离 point 最近的框
+        :return: (框, 距离)，没有时返回 (None, inf)
+        """
+        return geometry.nearest(self[label], point)
+
+    def farthest(self, label: str, point):
+        """
+        底边中心点离 point 最远的框
+        :return: (框, 距离)，没有时返回 (None, -inf)
+        """
+        return geometry.farthest(self[label], point)
+
+    def k_nearest(self, label: str, point, k: int):
+        """
+        底边中心点离 point 最近的 k 个框
+        :return: ((k, 6) 按距离升序的框, (k,) 距离)
+        """
+        boxes = self[label]
+        index, distances = geometry.k_nearest(boxes, point, k)
+        return boxes[index], distances
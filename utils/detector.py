@@ -0,0 +1,226 @@
+import os
+import time
+
+import numpy as np
+
+from utils.fast_nms import FastNMS
+from utils.letterbox import Letterbox
+from utils.logger import logger
+from utils.ort_session import OrtSessionConfig, create_session, model_input_size
+from utils.path_manager import PathManager
+from utils.yolov5_onnx import has_embedded_nms, postprocess
+
+
+class Detector:
+    """
+    检测后端统一接口：preprocess -> infer -> postprocess
+    输出统一为 (n, 6) float32 [x1, y1, x2, y2, conf, cls]，坐标为相对原图的 0-1 比例
+    """
+
+    name = ""
+    # preprocess 返回的输入是否为复用的缓冲区（下一次 preprocess 会覆盖）
+    shared_input_buffer = True
+
+    def preprocess(self, image):
+        """
+        :param image: BGR 图像
+        :return: (模型输入, 还原坐标所需的参数)
+        """
+        raise NotImplementedError
+
+    def infer(self, inputs):
+        """
+        :param inputs: preprocess 返回的模型输入
+        :return: 模型原始输出
+        """
+        raise NotImplementedError
+
+    def postprocess(self, output, meta) -> np.ndarray:
+        """
+        :param output: infer 的返回值
+        :param meta: preprocess 返回的参数
+        :return: (n, 6)
+        """
+        raise NotImplementedError
+
+    def detect(self, image) -> np.ndarray:
+        inputs, meta = self.preprocess(image)
+        return self.postprocess(self.infer(inputs), meta)
+
+
+class OnnxDetector(Detector):
+    """
+    ONNX Runtime 后端，支持内置 NMS 的模型
+    """
+
+    name = "onnx"
+
+    def __init__(
+            self,
+            model_path: str = None,
+            session_config: OrtSessionConfig = None,
+            input_size=None,
+            fast_nms: FastNMS = None,
+    ):
+        self.path = model_path or os.path.join(PathManager.MODEL_PATH, "best.onnx")
+        self.session = create_session(self.path, session_config, input_size or (640, 640))
+        self.input_name = self.session.get_inputs()[0].name
+        self.letterbox = Letterbox(model_input_size(self.session, input_size or (640, 640)))
+        self.embedded_nms = has_embedded_nms(self.session)
+        self.fast_nms = fast_nms or FastNMS()
+
+    def preprocess(self, image):
+        # letterbox 复用缓冲区，下一帧预处理前必须完成本帧推理
+        inputs, pad, size = self.letterbox(image)
+        return inputs, (pad, size)
+
+    def infer(self, inputs):
+        return self.session.run(None, {self.input_name: inputs})[0]
+
+    def postprocess(self, output, meta) -> np.ndarray:
+        pad, size = meta
+        return postprocess(output, pad, size, self.fast_nms, self.embedded_nms)
+
+
+class OpenCVDetector(Detector):
+    """
+    OpenCV DNN 后端，读取同一个 best.onnx（模型输入尺寸需固定）
+    """
+
+    name = "opencv"
+
+    def __init__(self, model_path: str = None, input_size=(640, 640), fast_nms: FastNMS = None):
+        import cv2
+
+        self.path = model_path or os.path.join(PathManager.MODEL_PATH, "best.onnx")
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"{self.path} not found")
+        self.net = cv2.dnn.readNetFromONNX(self.path)
+        self.letterbox = Letterbox(input_size)
+        self.fast_nms = fast_nms or FastNMS()
+
+    def preprocess(self, image):
+        inputs, pad, size = self.letterbox(image)
+        return inputs, (pad, size)
+
+    def infer(self, inputs):
+        self.net.setInput(inputs)
+        return self.net.forward()
+
+    def postprocess(self, output, meta) -> np.ndarray:
+        pad, size = meta
+        return postprocess(output, pad, size, self.fast_nms)
+
+
+class NcnnDetector(Detector):
+    """
+    ncnn 后端，封装 utils.yolov5.YoloV5s
+    """
+
+    name = "ncnn"
+
+    def __init__(
+            self,
+            target_size: int = 640,
+            num_threads: int = None,
+            use_gpu: bool = False,
+            powersave: int = 0,
+            extractor_pool: int = 1,
+            fast_nms: FastNMS = None,
+    ):
+        from utils.yolov5 import YoloV5s
+
+        self.yolo = YoloV5s(
+            target_size=target_size,
+            num_threads=num_threads,
+            use_gpu=use_gpu,
+            powersave=powersave,
+            extractor_pool=extractor_pool,
+        )
+        self.fast_nms = fast_nms or FastNMS(conf_thres=self.yolo.prob_threshold, iou_thres=self.yolo.nms_threshold)
+
+    def preprocess(self, image):
+        mat_in_pad, pad, size, _ = self.yolo.preprocess(image)
+        return mat_in_pad, (pad, size)
+
+    def infer(self, inputs):
+        return self.yolo.infer(inputs)
+
+    def postprocess(self, output, meta) -> np.ndarray:
+        pad, size = meta
+        return postprocess(output, pad, size, self.fast_nms)
+
+
+BACKENDS = {
+    OnnxDetector.name: OnnxDetector,
+    NcnnDetector.name: NcnnDetector,
+    OpenCVDetector.name: OpenCVDetector,
+}
+
+
+def benchmark(detector: Detector, image, runs: int = 10) -> float:
+    """
+    :return: 单帧 detect 平均耗时（秒），首帧作为预热不计入
+    """
+    detector.detect(image)
+    start = time.perf_counter()
+    for _ in range(runs):
+        detector.detect(image)
+    return (time.perf_counter() - start) / runs
+
+
+def backend_kwargs(
+        backend: str,
+        model_path: str = None,
+        session_config: OrtSessionConfig = None,
+        input_size=None,
+        fast_nms: FastNMS = None,
+) -> dict:
+    """
+    把 YOLOv5 的模型与推理配置转换为指定检测后端的构造参数，各后端只取自己支持的部分
+    :param backend: onnx / ncnn / opencv / auto（auto 逐个自测，不传参数）
+    :return:
+    """
+    if backend == OnnxDetector.name:
+        kwargs = {"model_path": model_path, "session_config": session_config, "input_size": input_size}
+    elif backend == OpenCVDetector.name:
+        # OpenCV 后端不支持内置 NMS 的模型，沿用默认的 best.onnx
+        kwargs = {"input_size": input_size}
+    elif backend == NcnnDetector.name:
+        kwargs = {}
+    else:
+        return {}
+    kwargs["fast_nms"] = fast_nms
+    return {key: value for key, value in kwargs.items() if value is not None}
+
+
+def create_detector(backend: str = "auto", image=None, runs: int = 10, **kwargs) -> Detector:
+    """
+    创建检测后端，auto 时依次尝试所有可用后端并选出当前机器上最快的一个
+    :param backend: auto / onnx / ncnn / opencv
+    :param image: 自测使用的画面，默认 1168x540 的灰图
+    :param runs: 每个后端的自测次数
+    :param kwargs: 传给后端构造函数的参数（仅指定单个后端时生效）
+    :return:
+    """
+    if backend != "auto":
+        return BACKENDS[backend](**kwargs)
+    if image is None:
+        image = np.full((540, 1168, 3), 114, dtype=np.uint8)
+    timings = {}
+    detectors = {}
+    for name, backend_class in BACKENDS.items():
+        try:
+            detector = backend_class()
+            timings[name] = benchmark(detector, image, runs)
+            detectors[name] = detector
+        except Exception as e:
+            logger.warning(f"检测后端 {name} 不可用: {e}")
+    if not detectors:
+        raise Exception("No detector backend available")
+    fastest = min(timings, key=timings.get)
+    logger.info(
+        "检测后端自测: " + ", ".join(f"{name}={timing * 1000:.1f}ms" for name, timing in timings.items())
+        + f"，使用 {fastest}"
+    )
+    return detectors[fastest]
@@ -0,0 +1,146 @@
+import numpy as np
+
+
+class FastNMS:
+    """
+    YOLOv5 原始输出的快速 NMS：
+    1. 先按目标置信度（objectness）过滤，只对留下的行计算类别得分
+    2. 用 argpartition 按最终得分只保留前 top_k 个候选，不做全量排序，之后只对它们解码坐标
+    3. 类别偏移后一次算出 IoU 矩阵，贪心抑制只在布尔矩阵上进行
+    支持按类别设置置信度阈值与最大检测数
+    """
+
+    MAX_WH = 7680  # 类别偏移量，大于任何坐标即可
+
+    def __init__(
+            self,
+            conf_thres: float = 0.15,
+            iou_thres: float = 0.45,
+            top_k: int = 1000,
+            max_det: int = 300,
+            class_conf_thres: dict = None,
+            class_max_det: dict = None,
+            agnostic: bool = False,
+    ):
+        """
+        :param conf_thres: 置信度阈值（objectness 与最终得分都需大于该值）
+        :param iou_thres: IoU 阈值，大于该值的框被抑制
+        :param top_k: 进入 NMS 的最大候选数，按最终得分 obj * cls 截取
+        :param max_det: 单帧最多输出的检测数
+        :param class_conf_thres: {类别编号: 阈值}，未列出的类别使用 conf_thres
+        :param class_max_det: {类别编号: 最大检测数}，未列出的类别只受 max_det 限制
+        :param agnostic: 是否跨类别做 NMS
+        """
+        assert 0 <= conf_thres <= 1, f"Invalid Confidence threshold {conf_thres}"
+        assert 0 <= iou_thres <= 1, f"Invalid IoU {iou_thres}"
+        self.conf_thres = conf_thres
+        self.iou_thres = iou_thres
+        self.top_k = top_k
+        self.max_det = max_det
+        self.class_conf_thres = class_conf_thres or {}
+        self.class_max_det = class_max_det or {}
+        self.agnostic = agnostic
+        self._thresholds = {}  # 类别数 -> 每类阈值数组
+        self._limits = {}  # 类别数 -> 每类最大检测数数组
+
+    def thresholds(self, nc: int) -> np.ndarray:
+        """
+        每个类别的置信度阈值
+        :param nc: 类别数
+        :return: (nc,) float32
+        """
+        thresholds = self._thresholds.get(nc)
+        if thresholds is None:
+            thresholds = np.full(nc, self.conf_thres, dtype=np.float32)
+            for cls, value in self.class_conf_thres.items():
+                if cls < nc:
+                    thresholds[cls] = value
+            self._thresholds[nc] = thresholds
+        return thresholds
+
+    def candidates(self, prediction: np.ndarray):
+        """
+        objectness 过滤 + 最优类别得分 + 按得分 top-k
+        :param prediction: (N, 5 + nc)
+        :return: (候选行, 得分, 类别)，按得分降序
+        """
+        obj = prediction[:, 4]
+        # 阈值取所有类别中最小的一个，避免单独调低阈值的类别在第一步就被过滤
+        min_thres = min(self.conf_thres, *self.class_conf_thres.values()) if self.class_conf_thres else self.conf_thres
+        # 得分 = obj * cls <= obj，obj 不超过阈值的行得分也不会超过
+        x = prediction[obj > min_thres]
+        cls_scores = x[:, 5:]
+        cls = cls_scores.argmax(1)
+        scores = cls_scores[np.arange(len(x)), cls] * x[:, 4]
+        keep = scores > self.thresholds(cls_scores.shape[1])[cls]
+        x, scores, cls = x[keep], scores[keep], cls[keep]
+        if len(scores) > self.top_k:
+            # 按最终得分截取，只按 obj 截取会漏掉 obj 较低但类别得分很高的框
+            top = np.argpartition(-scores, self.top_k)[:self.top_k]
+            x, scores, cls = x[top], scores[top], cls[top]
+        order = np.argsort(-scores, kind="stable")
+        return x[order], scores[order], cls[order]
+
+    def class_limits(self, nc: int) -> np.ndarray:
+        """
+        每个类别的最大检测数
+        :param nc: 类别数
+        :return: (nc,) int64
+        """
+        limits = self._limits.get(nc)
+        if limits is None:
+            limits = np.full(nc, self.max_det, dtype=np.int64)
+            for cls, value in self.class_max_det.items():
+                if cls < nc:
+                    limits[cls] = value
+            self._limits[nc] = limits
+        return limits
+
+    def suppress(self, boxes: np.ndarray, cls: np.ndarray, nc: int) -> np.ndarray:
+        """
+        贪心 NMS，输入已按得分降序
+        :param boxes: (n, 4) xyxy
+        :param cls: (n,) 类别
+        :param nc: 类别数
+        :return: 保留的下标
+        """
+        if not self.agnostic:
+            boxes = boxes + (cls * self.MAX_WH)[:, None].astype(boxes.dtype)
+        lt = np.maximum(boxes[:, None, :2], boxes[None, :, :2])
+        rb = np.minimum(boxes[:, None, 2:], boxes[None, :, 2:])
+        inter = (rb - lt).clip(0).prod(2)
+        area = (boxes[:, 2:] - boxes[:, :2]).prod(1)
+        overlap = inter > self.iou_thres * (area[:, None] + area[None, :] - inter)
+        limits = self.class_limits(nc)
+        counts = np.zeros(nc, dtype=np.int64)
+        suppressed = np.zeros(len(boxes), dtype=bool)
+        keep = []
+        for i in range(len(boxes)):
+            c = cls[i]
+            if suppressed[i] or counts[c] >= limits[c]:
+                continue
+            keep.append(i)
+            if len(keep) >= self.max_det:
+                break
+            counts[c] += 1
+            suppressed |= overlap[i]
+        return np.asarray(keep, dtype=np.int64)
+
+    def __call__(self, prediction: np.ndarray) -> np.ndarray:
+        """
+        :param prediction: 单帧原始输出 (N, 5 + nc) 或 (1, N, 5 + nc)，中心点宽高格式
+        :return: (n, 6) float32 [x1, y1, x2, y2, conf, cls]，按得分降序
+        """
+        if prediction.ndim == 3:
+            prediction = prediction[0]
+        x, scores, cls = self.candidates(prediction)
+        if not len(x):
+            return np.zeros((0, 6), dtype=np.float32)
+        # 只解码留下的候选
+        out = np.empty((len(x), 6), dtype=np.float32)
+        half_wh = x[:, 2:4] / 2
+        out[:, :2] = x[:, :2] - half_wh
+        out[:, 2:4] = x[:, :2] + half_wh
+        out[:, 4] = scores
+        out[:, 5] = cls
+        return out[self.suppress(out[:, :4], cls, prediction.shape[1] - 5)]
@@ -0,0 +1,102 @@
+import time
+
+import cv2 as cv
+import numpy as np
+
+
+class FrameChangeGate:
+    """
+    推理前的廉价画面变化判断：把画面缩成很小的灰度缩略图，与上次推理时的缩略图比较平均差值
+    菜单、加载、翻牌、再次挑战弹窗等静止画面可直接复用上一次的推理结果
+    过图转场期间不推理，转场结束后的第一帧必定推理
+    战斗中小怪物、英雄在纯色地面上移动时平均差值也可能很小，复用只在 enabled 时进行（城镇、菜单等空闲场景）
+    """
+
+    def __init__(
+            self,
+            threshold: float = 3.0,
+            max_reuse_age: float = 0.5,
+            size=(32, 18),
+            transition=None,
+            enabled: bool = True,
+    ):
+        """
+        :param threshold: 缩略图平均灰度差（0-255）低于该值视为画面未变化
+        :param max_reuse_age: 推理结果最多复用的秒数，超过后强制推理
+        :param size: 缩略图尺寸 (宽, 高)
+        :param transition: utils.transition_detector.TransitionDetector，为空时不做转场判断
+        :param enabled: 是否复用未变化画面的结果，关闭时只保留转场跳帧
+        """
+        self.threshold = threshold
+        self.max_reuse_age = max_reuse_age
+        self.size = size
+        self._reference = None  # 上次推理时的缩略图
+        self._reference_time = 0.0
+        self._thumb = np.empty((size[1], size[0]), dtype=np.uint8)
+        self._diff = np.empty((size[1], size[0]), dtype=np.uint8)
+        self.transition = transition
+        self.enabled = enabled
+        self._transition_cursor = transition.cursor if transition is not None else 0
+        self.infer_count = 0
+        self.reuse_count = 0
+        self.transition_skip_count = 0  # 转场期间跳过的帧数
+
+    def thumbnail(self, image):
+        """
+        计算灰度缩略图，先缩小再转灰度，避免整帧转换
+        :param image: BGR 图像
+        :return: 复用的缓冲区，下次调用会被覆盖
+        """
+        small = cv.resize(image, self.size, interpolation=cv.INTER_AREA)
+        cv.cvtColor(small, cv.COLOR_BGR2GRAY, dst=self._thumb)
+        return self._thumb
+
+    @property
+    def in_transition(self) -> bool:
+        return self.transition is not None and self.transition.dark
+
+    def should_infer(self, image, now: float = None, thumb=None) -> bool:
+        """
+        判断这一帧是否需要推理，需要推理时把它记为新的参照帧
+        :param image: BGR 图像
+        :param now: 当前时间，默认 time.perf_counter()
+        :param thumb: 上游已算好的同尺寸灰度缩略图，为空时自己计算
+        :return:
+        """
+        if now is None:
+            now = time.perf_counter()
+        if self.transition is not None:
+            events, self._transition_cursor = self.transition.events_since(self._transition_cursor)
+            if events:
+                # 转场前后的画面不可比较
+                self.reset()
+            if self.transition.dark:
+                self.transition_skip_count += 1
+                return False
+        if not self.enabled:
+            self.infer_count += 1
+            return True
+        if thumb is None or thumb.shape != self._thumb.shape:
+            thumb = self.thumbnail(image)
+        if (
+                self._reference is not None
+                and now - self._reference_time < self.max_reuse_age
+        ):
+            cv.absdiff(thumb, self._reference, dst=self._diff)
+            if float(self._diff.mean()) < self.threshold:
+                self.reuse_count += 1
+                return False
+        if self._reference is None:
+            self._reference = thumb.copy()
+        else:
+            np.copyto(self._reference, thumb)
+        self._reference_time = now
+        self.infer_count += 1
+        return True
+
+    def reset(self):
+        """
+        丢弃参照帧，下一帧必定推理
+        :return:
+        """
+        self._reference = None
@@ -0,0 +1,104 @@
+"""
+检测框几何计算的批量版本，与 game/dengeon/game_action.py 中逐框循环的函数结果一致
+boxes 均为 (n, 4+) 数组 [x1, y1, x2, y2, ...]，点为 (x, y)
+"""
+import numpy as np
+
+
+def _as_boxes(boxes) -> np.ndarray:
+    boxes = np.asarray(boxes, dtype=np.float64)
+    return boxes.reshape(-1, boxes.shape[-1]) if boxes.size else boxes.reshape(0, 4)
+
+
+def bottom_centers(boxes) -> np.ndarray:
+    """
+    :return: (n, 2) 底边中心点，对应 calculate_center
+    """
+    boxes = _as_boxes(boxes)
+    return np.stack(((boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]), axis=1)
+
+
+def gate_points(boxes) -> np.ndarray:
+    """
+    :return: (n, 2) 门的目标点（水平中心、自上而下 65% 高度处），对应 calculate_gate_angle
+    """
+    boxes = _as_boxes(boxes)
+    return np.stack(((boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 3] - boxes[:, 1]) * 0.65 + boxes[:, 1]), axis=1)
+
+
+def distances(points, point) -> np.ndarray:
+    """
+    :return: (n,) 各点到 point 的欧几里得距离
+    """
+    delta = np.asarray(points, dtype=np.float64) - np.asarray(point, dtype=np.float64)
+    return np.hypot(delta[:, 0], delta[:, 1])
+
+
+def angles(point, points) -> np.ndarray:
+    """
+    :return: (n,) 从 point 指向各点的角度（度，y 轴向下所以取反），对应 calculate_angle_to_box
+    """
+    delta = np.asarray(points, dtype=np.float64) - np.asarray(point, dtype=np.float64)
+    return -np.degrees(np.arctan2(delta[:, 1], delta[:, 0]))
+
+
+def point_to_box_angles(point, boxes) -> np.ndarray:
+    """
+    :return: (n,) 点到各框底边中心点的角度，对应 calculate_point_to_box_angle
+    """
+    return angles(point, bottom_centers(boxes))
+
+
+def gate_angles(point, boxes) -> np.ndarray:
+    """
+    :return: (n,) 点到各门目标点的角度，对应 calculate_gate_angle
+    """
+    return angles(point, gate_points(boxes))
+
+
+def k_nearest(boxes, point, k: int):
+    """
+    底边中心点离 point 最近的 k 个框，argpartition 选出后只对这 k 个排序
+    :return: (下标, 距离)，按距离升序，距离相同时下标小的在前
+    """
+    d = distances(bottom_centers(boxes), point)
+    k = min(k, len(d))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    index = np.argpartition(d, k - 1)[:k] if k < len(d) else np.arange(len(d))
+    index = index[np.lexsort((index, d[index]))]
+    return index, d[index]
+
+
+def nearest(boxes, point):
+    """
+    :return: (最近的框, 距离)，没有框时返回 (None, inf)
+    """
+    if not len(boxes):
+        return None, float("inf")
+    d = distances(bottom_centers(boxes), point)
+    i = int(np.argmin(d))
+    return boxes[i], float(d[i])
+
+
+def farthest(boxes, point):
+    """
+    :return: (最远的框, 距离)，没有框时返回 (None, -inf)
+    """
+    if not len(boxes):
+        return None, -float("inf")
+    d = distances(bottom_centers(boxes), point)
+    i = int(np.argmax(d))
+    return boxes[i], float(d[i])
+
+
+def closest_or_second_closest(boxes, point):
+    """
+    少于两个框时返回最近的框，否则返回第二近的框
+    :return: (框, 距离)
+    """
+    if len(boxes) < 2:
+        return nearest(boxes, point)
+    index, d = k_nearest(boxes, point, 2)
+    return boxes[index[1]], float(d[1])
+
@@ -0,0 +1,180 @@
+import queue
+import threading
+import time
+
+from utils.logger import logger
+
+
+class StageStats:
+    """
+    单个流水线阶段的忙碌时间统计
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.busy = 0.0
+        self.count = 0
+        self.start_time = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, elapsed: float):
+        with self._lock:
+            self.busy += elapsed
+            self.count += 1
+
+    def utilization(self) -> float:
+        """
+        自启动起处于忙碌状态的时间占比，异步推理时多帧重叠可能超过 1
+        :return:
+        """
+        elapsed = time.perf_counter() - self.start_time
+        return self.busy / elapsed if elapsed > 0 else 0.0
+
+    def average(self) -> float:
+        return self.busy / self.count if self.count else 0.0
+
+    def __str__(self):
+        return f"{self.name} {self.utilization() * 100:.0f}% ({self.average() * 1000:.1f}ms x {self.count})"
+
+
+class InferencePipeline:
+    """
+    把 YOLOv5 的单线程循环拆成 预处理 -> 推理 -> 后处理 三个线程，阶段之间用有界队列衔接
+    推理第 N 帧的同时预处理第 N+1 帧、后处理第 N-1 帧，吞吐接近最慢的单个阶段
+    """
+
+    def __init__(self, yolo, depth: int = 2, use_async: bool = False):
+        """
+        :param yolo: YOLOv5 实例，使用它的 preprocess / infer / postprocess / publish
+        :param depth: 阶段之间最多排队的帧数
+        :param use_async: 使用 ORT 的 run_async，推理线程只负责提交，不阻塞在 session.run 上
+        """
+        self.yolo = yolo
+        self.depth = depth
+        self.use_async = use_async
+        self.infer_queue = queue.Queue(maxsize=depth)
+        self.post_queue = queue.Queue(maxsize=depth)
+        # 异步推理时限制同时在途的帧数
+        self.inflight = threading.Semaphore(depth)
+        self.stats = {name: StageStats(name) for name in ("preprocess", "infer", "postprocess")}
+        self.threads = [
+            threading.Thread(target=target, daemon=True)
+            for target in (self.preprocess_loop, self.infer_loop, self.postprocess_loop)
+        ]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def utilization(self) -> str:
+        return ", ".join(str(stats) for stats in self.stats.values())
+
+    def preprocess_loop(self):
+        yolo = self.yolo
+        while True:
+            ref = yolo.image_queue.get()
+            if ref is None:
+                continue
+            try:
+                start = time.perf_counter()
+                if yolo.reuse_last_output(ref, start):
+                    continue
+                yolo.tracer.mark(ref, "preprocess_start", start)
+                resolution = yolo.next_resolution()
+                inputs, meta = yolo.preprocess(ref.image, resolution)
+                # 预处理复用缓冲区，下一帧会覆盖，交给其他阶段前拷贝一份
+                if yolo.detector is None or yolo.detector.shared_input_buffer:
+                    inputs = inputs.clone() if hasattr(inputs, "clone") else inputs.copy()
+                yolo.tracer.mark(ref, "preprocess_end")
+                self.stats["preprocess"].add(time.perf_counter() - start)
+            except Exception as e:
+                # 单帧出错不能让阶段线程退出，否则之后再也没有检测结果
+                logger.error(e)
+                ref.release()
+                continue
+            self.infer_queue.put((ref, inputs, meta, resolution, start))
+
+    def async_session(self, resolution: str):
+        """
+        支持 run_async 的本地会话，共享推理服务与其他检测后端返回 None
+        """
+        yolo = self.yolo
+        if not self.use_async or yolo.detector is not None:
+            return None
+        session = yolo.sessions.get(resolution) or yolo.session
+        if session is None or not hasattr(session, "run_async"):
+            return None
+        return session
+
+    def infer_loop(self):
+        while True:
+            ref, inputs, meta, resolution, start = self.infer_queue.get()
+            try:
+                session = self.async_session(resolution)
+                if session is not None and self.submit(session, ref, inputs, meta, resolution, start):
+                    continue
+                infer_start = time.perf_counter()
+                output = self.yolo.infer(inputs, resolution)
+                self.yolo.tracer.mark(ref, "infer")
+                self.stats["infer"].add(time.perf_counter() - infer_start)
+            except Exception as e:
+                logger.error(e)
+                ref.release()
+                continue
+            self.post_queue.put((ref, output, meta, resolution, start))
+
+    def submit(self, session, ref, inputs, meta, resolution, start) -> bool:
+        """
+        异步提交推理，结果在 on_infer_done 中交给后处理阶段
+        :return: 是否已提交，失败时回退为同步推理
+        """
+        self.inflight.acquire()
+        # inputs 放进 user_data，保证推理完成前缓冲区不被回收
+        user_data = (ref, inputs, meta, resolution, start, time.perf_counter())
+        try:
+            session.run_async(None, {session.get_inputs()[0].name: inputs}, self.on_infer_done, user_data)
+            return True
+        except Exception as e:
+            # 如 intra_op 线程数为 1 时 ORT 不支持 run_async
+            logger.warning(f"ORT run_async 不可用，回退为同步推理: {e}")
+            self.use_async = False
+            self.inflight.release()
+            return False
+
+    def on_infer_done(self, outputs, user_data, error):
+        """
+        ORT 线程池中回调
+        """
+        ref, _, meta, resolution, start, infer_start = user_data
+        self.inflight.release()
+        if error:
+            logger.error(error)
+            ref.release()
+            return
+        self.yolo.tracer.mark(ref, "infer")
+        self.stats["infer"].add(time.perf_counter() - infer_start)
+        try:
+            # 不能阻塞 ORT 线程池，后处理跟不上时丢弃这一帧
+            self.post_queue.put_nowait((ref, outputs[0], meta, resolution, start))
+        except queue.Full:
+            ref.release()
+
+    def postprocess_loop(self):
+        yolo = self.yolo
+        while True:
+            ref, output, meta, resolution, start = self.post_queue.get()
+            try:
+                if ref.frame_id < yolo.last_output_frame:
+                    # 异步推理的完成顺序不固定，比已发布结果更旧的帧不再发布，避免结果倒退
+                    ref.release()
+                    continue
+                post_start = time.perf_counter()
+                output = yolo.postprocess(output, meta, resolution)
+                yolo.tracer.mark(ref, "nms")
+                self.stats["postprocess"].add(time.perf_counter() - post_start)
+                yolo.publish(ref, output)
+            except Exception as e:
+                logger.error(e)
+                ref.release()
+                continue
+            yolo.update_busy_time(max(stats.average() for stats in self.stats.values()))
@@ -0,0 +1,120 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+from utils.logger import logger
+from utils.ort_session import OrtSessionConfig, create_session
+
+
+class _InferRequest:
+    __slots__ = ("inputs", "outputs", "error", "done")
+
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.outputs = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class InferenceServer:
+    """
+    多设备共享的推理服务：所有设备共用一个 ONNX 会话，把同时到达的帧拼成一个动态 batch 推理
+    各设备的 YOLOv5 线程仍负责自己的预处理与后处理，只把 session.run 交给这里
+    """
+
+    def __init__(
+            self,
+            model_path: str,
+            max_batch: int = 4,
+            max_latency: float = 0.01,
+            session_config: OrtSessionConfig = None,
+            input_size=(640, 640),
+    ):
+        """
+        :param model_path: 模型路径
+        :param max_batch: 单次推理最多拼接的帧数
+        :param max_latency: 第一帧到达后最多等待其他帧的秒数
+        :param session_config: ONNX Runtime 会话配置
+        :param input_size: 动态输入尺寸的模型预热时使用的 (宽, 高)
+        """
+        self.path = model_path
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.session = create_session(self.path, session_config, input_size)
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_names = [output.name for output in self.session.get_outputs()]
+        # 导出时 batch 维固定为 1 的模型只能逐帧推理，但仍共享同一个会话
+        batch_dim = self.session.get_inputs()[0].shape[0]
+        self.dynamic_batch = not isinstance(batch_dim, int)
+        if not self.dynamic_batch and self.max_batch > 1:
+            logger.warning(f"{self.path} batch 维固定为 {batch_dim}，共享会话逐帧推理")
+        self.batch_count = 0
+        self.frame_count = 0
+        self._requests = queue.Queue()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def infer(self, inputs: np.ndarray):
+        """
+        提交一帧输入并等待结果，可被多个线程同时调用
+        :param inputs: (1, C, H, W) float32
+        :return: 与 session.run 相同格式的输出列表
+        """
+        request = _InferRequest(inputs)
+        self._requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.outputs
+
+    def average_batch(self) -> float:
+        return self.frame_count / self.batch_count if self.batch_count else 0.0
+
+    def _collect(self):
+        """
+        阻塞等待第一帧，然后在截止时间内尽量凑满一个 batch
+        :return:
+        """
+        batch = [self._requests.get()]
+        deadline = time.perf_counter() + self.max_latency
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self._collect() if self.dynamic_batch else [self._requests.get()]
+            # 不同分辨率的输入不能拼在一起
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.inputs.shape, []).append(request)
+            for requests in groups.values():
+                self._run_group(requests)
+
+    def _run_group(self, requests):
+        try:
+            if len(requests) == 1:
+                inputs = requests[0].inputs
+            else:
+                inputs = np.concatenate([request.inputs for request in requests], axis=0)
+            outputs = self.session.run(self.output_names, {self.input_name: inputs})
+            for i, request in enumerate(requests):
+                request.outputs = [output[i:i + 1] for output in outputs]
+            self.batch_count += 1
+            self.frame_count += len(requests)
+        except Exception as e:
+            logger.error(e)
+            for request in requests:
+                request.error = e
+        finally:
+            for request in requests:
+                request.done.set()
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from utils.logger import logger
+
+
+class LatencyTracer:
+    """
+    帧延迟追踪：记录每帧从采集到各阶段的耗时，定期输出滚动 p50/p95/p99
+    阶段依次为 decode -> preprocess_start -> preprocess_end -> infer -> nms -> decision -> touch
+    """
+
+    STAGES = (
+        "decode",
+        "preprocess_start",
+        "preprocess_end",
+        "infer",
+        "nms",
+        "decision",
+        "touch",
+    )
+
+    def __init__(self, window: int = 300, report_interval: float = 10.0, enabled: bool = True, name: str = ""):
+        """
+        :param window: 每个阶段保留的最近样本数
+        :param report_interval: 输出统计的间隔秒数，<=0 时不自动输出
+        :param enabled: 是否启用
+        :param name: 输出日志时的前缀，多设备时用于区分
+        """
+        self.enabled = enabled
+        self.name = name
+        self.report_interval = report_interval
+        self._lock = threading.Lock()
+        self._samples = {stage: deque(maxlen=window) for stage in self.STAGES}
+        self._counters = {}
+        self._decision_frame = None
+        self._last_report = time.perf_counter()
+
+    def mark(self, frame, stage: str, t: float = None):
+        """
+        记录某帧到达某阶段的时间
+        :param frame: FrameRef
+        :param stage: 阶段名称
+        :param t: 时间戳，默认当前 time.perf_counter()
+        :return:
+        """
+        if not self.enabled or frame is None:
+            return
+        if t is None:
+            t = time.perf_counter()
+        frame.trace[stage] = t
+        with self._lock:
+            self._samples[stage].append(t - frame.timestamp)
+            if stage == "decision":
+                self._decision_frame = frame
+        self._maybe_report(t)
+
+    def mark_touch(self):
+        """
+        记录最近一次决策帧触发的第一次触摸
+        :return:
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            frame = self._decision_frame
+            self._decision_frame = None
+        if frame is not None:
+            self.mark(frame, "touch")
+
+    def add_counter(self, name: str, fn):
+        """
+        注册随统计一起输出的计数器（如信箱丢帧数）
+        :param name:
+        :param fn: 无参函数，返回当前计数
+        :return:
+        """
+        self._counters[name] = fn
+
+    def percentiles(self):
+        """
+        各阶段自采集起的耗时分位数（毫秒）
+        :return: {stage: (p50, p95, p99, count)}
+        """
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+        stats = {}
+        for stage in self.STAGES:
+            values = samples[stage]
+            if not values:
+                continue
+            p50, p95, p99 = np.percentile(np.asarray(values) * 1000.0, (50, 95, 99))
+            stats[stage] = (p50, p95, p99, len(values))
+        return stats
+
+    def report(self):
+        """
+        输出当前统计
+        :return:
+        """
+        lines = []
+        for stage, (p50, p95, p99, count) in self.percentiles().items():
+            lines.append(f"{stage:<17} p50={p50:7.1f}ms p95={p95:7.1f}ms p99={p99:7.1f}ms n={count}")
+        for name, fn in self._counters.items():
+            lines.append(f"{name}: {fn()}")
+        if lines:
+            logger.info(f"{self.name} 帧延迟统计(自采集起):\n" + "\n".join(lines))
+
+    def _maybe_report(self, now: float):
+        if self.report_interval <= 0 or now - self._last_report < self.report_interval:
+            return
+        with self._lock:
+            if now - self._last_report < self.report_interval:
+                return
+            self._last_report = now
+        self.report()
@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+
+
+class _LetterboxLayout:
+    """
+    某个源分辨率下的缩放与补边参数，以及预分配的缓冲区
+    """
+
+    __slots__ = ("scale", "new_w", "new_h", "left", "top", "canvas", "roi", "tensor")
+
+    def __init__(self, src_w, src_h, dst_w, dst_h, color, stride=None):
+        self.scale = min(dst_w / src_w, dst_h / src_h)
+        self.new_w = int(round(src_w * self.scale))
+        self.new_h = int(round(src_h * self.scale))
+        if stride:
+            # 最小补边：只补到 stride 的整数倍（需要动态输入尺寸的模型）
+            dst_w = (self.new_w + stride - 1) // stride * stride
+            dst_h = (self.new_h + stride - 1) // stride * stride
+        self.left = (dst_w - self.new_w) // 2
+        self.top = (dst_h - self.new_h) // 2
+        # 补边区域只需填充一次，之后每帧只写中间的缩放区域
+        self.canvas = np.full((dst_h, dst_w, 3), color, dtype=np.uint8)
+        self.roi = self.canvas[self.top:self.top + self.new_h, self.left:self.left + self.new_w]
+        self.tensor = np.empty((1, 3, dst_h, dst_w), dtype=np.float32)
+
+
+class Letterbox:
+    """
+    等比缩放并补灰边，直接输出模型需要的 (1, 3, H, W) RGB float32 张量
+    缩放参数与缓冲区按源分辨率缓存，每帧只有一次 resize 和一次归一化写入
+    """
+
+    def __init__(self, target_size=640, color: int = 114, stride: int = None):
+        """
+        :param target_size: 目标尺寸，整数表示正方形，(宽, 高) 表示矩形（如 (640, 384)）
+        :param color: 补边颜色
+        :param stride: 设置后只补边到 stride 的整数倍，输出尺寸随源分辨率变化
+        """
+        if isinstance(target_size, int):
+            target_size = (target_size, target_size)
+        self.target_size = tuple(target_size)
+        self.color = color
+        self.stride = stride
+        self._layouts = {}
+
+    def layout(self, width: int, height: int) -> _LetterboxLayout:
+        """
+        获取（必要时创建）源分辨率对应的缩放参数
+        :param width: 源图宽
+        :param height: 源图高
+        :return:
+        """
+        key = (width, height)
+        layout = self._layouts.get(key)
+        if layout is None:
+            dst_w, dst_h = self.target_size
+            layout = _LetterboxLayout(width, height, dst_w, dst_h, self.color, self.stride)
+            self._layouts[key] = layout
+        return layout
+
+    def __call__(self, img):
+        """
+        :param img: BGR 图像
+        :return: (张量, (左侧补边, 顶部补边), (缩放后宽, 缩放后高))
+                 张量是复用的缓冲区，下次调用同分辨率图像时会被覆盖
+        """
+        height, width = img.shape[:2]
+        layout = self.layout(width, height)
+        cv2.resize(img, (layout.new_w, layout.new_h), dst=layout.roi, interpolation=cv2.INTER_LINEAR)
+        # BGR -> RGB、HWC -> CHW、/255 在一次写入中完成
+        np.multiply(
+            layout.canvas[..., ::-1].transpose(2, 0, 1),
+            np.float32(1 / 255.0),
+            out=layout.tensor[0],
+            dtype=np.float32,
+        )
+        return layout.tensor, (layout.left, layout.top), (layout.new_w, layout.new_h)
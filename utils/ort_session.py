@@ -0,0 +1,180 @@
+import os
+import time
+
+import numpy as np
+import onnxruntime as ort
+
+from utils.logger import logger
+
+
+class OrtSessionConfig:
+    """
+    ONNX Runtime 会话配置
+    """
+
+    GRAPH_OPTIMIZATION_LEVELS = {
+        "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+        "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+        "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+        "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+    }
+
+    EXECUTION_MODES = {
+        "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+        "parallel": ort.ExecutionMode.ORT_PARALLEL,
+    }
+
+    # 精度 -> 模型文件名后缀
+    PRECISIONS = {
+        "fp32": "",
+        "int8": "_int8",
+    }
+
+    def __init__(
+            self,
+            providers=None,
+            intra_op_num_threads: int = 0,
+            inter_op_num_threads: int = 0,
+            graph_optimization_level: str = "all",
+            execution_mode: str = "sequential",
+            enable_cpu_mem_arena: bool = True,
+            enable_mem_pattern: bool = True,
+            warmup_runs: int = 1,
+            precision: str = "fp32",
+    ):
+        """
+        :param providers: 执行后端优先级列表，默认 CUDA 优先、CPU 兜底，只保留当前环境可用的
+        :param intra_op_num_threads: 单个算子内的线程数，0 表示由 ORT 决定（通常为全部物理核）
+        :param inter_op_num_threads: 算子间并行的线程数，仅 parallel 模式有效
+        :param graph_optimization_level: disable / basic / extended / all
+        :param execution_mode: sequential / parallel
+        :param enable_cpu_mem_arena: 是否启用 CPU 内存池
+        :param enable_mem_pattern: 是否启用内存复用规划
+        :param warmup_runs: 创建会话后用全零输入预热的次数
+        :param precision: fp32 / int8，int8 加载 tools/quantize_int8.py 生成的 *_int8.onnx
+        """
+        if graph_optimization_level not in self.GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(f"{graph_optimization_level} is not support")
+        if execution_mode not in self.EXECUTION_MODES:
+            raise ValueError(f"{execution_mode} is not support")
+        self.providers = providers or ["CUDAExecutionProvider", "CPUExecutionProvider"]
+        self.intra_op_num_threads = intra_op_num_threads
+        self.inter_op_num_threads = inter_op_num_threads
+        self.graph_optimization_level = graph_optimization_level
+        self.execution_mode = execution_mode
+        self.enable_cpu_mem_arena = enable_cpu_mem_arena
+        self.enable_mem_pattern = enable_mem_pattern
+        self.warmup_runs = warmup_runs
+        if precision not in self.PRECISIONS:
+            raise ValueError(f"{precision} is not support")
+        self.precision = precision
+
+    @classmethod
+    def from_dict(cls, config: dict):
+        return cls(**config)
+
+    def session_options(self) -> ort.SessionOptions:
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_num_threads
+        options.inter_op_num_threads = self.inter_op_num_threads
+        options.graph_optimization_level = self.GRAPH_OPTIMIZATION_LEVELS[self.graph_optimization_level]
+        options.execution_mode = self.EXECUTION_MODES[self.execution_mode]
+        options.enable_cpu_mem_arena = self.enable_cpu_mem_arena
+        options.enable_mem_pattern = self.enable_mem_pattern
+        return options
+
+    def resolve_model_path(self, model_path: str) -> str:
+        """
+        按精度选择模型文件，如 best.onnx -> best_int8.onnx
+        :param model_path: fp32 模型路径
+        :return:
+        """
+        suffix = self.PRECISIONS[self.precision]
+        if not suffix:
+            return model_path
+        root, ext = os.path.splitext(model_path)
+        path = root + suffix + ext
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found, run tools/quantize_int8.py first")
+        return path
+
+    def available_providers(self):
+        """
+        过滤掉当前环境不可用的后端，避免 ORT 静默回退
+        :return:
+        """
+        available = ort.get_available_providers()
+        providers = [provider for provider in self.providers if provider in available]
+        missing = [provider for provider in self.providers if provider not in available]
+        if missing:
+            logger.warning(f"ONNX Runtime 不可用的后端: {missing}")
+        return providers or ["CPUExecutionProvider"]
+
+
+def create_session(model_path: str, config: OrtSessionConfig = None, input_size=(640, 640)) -> ort.InferenceSession:
+    """
+    按配置创建会话，输出实际生效的配置并预热
+    :param model_path: 模型路径
+    :param config: 会话配置，默认 OrtSessionConfig()
+    :param input_size: 动态输入尺寸的模型预热时使用的 (宽, 高)
+    :return:
+    """
+    config = config or OrtSessionConfig()
+    model_path = config.resolve_model_path(model_path)
+    options = config.session_options()
+    session = ort.InferenceSession(
+        model_path, sess_options=options, providers=config.available_providers()
+    )
+    logger.info(
+        f"ONNX 会话 {model_path}: precision={config.precision}, providers={session.get_providers()}, "
+        f"intra_op={options.intra_op_num_threads}, inter_op={options.inter_op_num_threads}, "
+        f"graph_opt={config.graph_optimization_level}, mode={config.execution_mode}, "
+        f"mem_arena={options.enable_cpu_mem_arena}, mem_pattern={options.enable_mem_pattern}, "
+        f"input={session.get_inputs()[0].shape}"
+    )
+    warmup(session, config.warmup_runs, input_size)
+    return session
+
+
+def model_input_size(session: ort.InferenceSession, default=None):
+    """
+    模型的固定输入尺寸
+    :param session:
+    :param default: 输入尺寸为动态时的返回值
+    :return: (宽, 高)
+    """
+    shape = session.get_inputs()[0].shape
+    height, width = shape[2], shape[3]
+    if isinstance(width, int) and isinstance(height, int) and width > 0 and height > 0:
+        return width, height
+    return default
+
+
+def input_shape(session: ort.InferenceSession, input_size=(640, 640)):
+    """
+    模型输入形状，动态维度按 batch=1 和 input_size 补全
+    :param session:
+    :param input_size: (宽, 高)
+    :return: (N, C, H, W)
+    """
+    shape = session.get_inputs()[0].shape
+    defaults = (1, 3, input_size[1], input_size[0])
+    return tuple(dim if isinstance(dim, int) and dim > 0 else defaults[i] for i, dim in enumerate(shape))
+
+
+def warmup(session: ort.InferenceSession, runs: int = 1, input_size=(640, 640)):
+    """
+    用全零输入预热，让首帧不再承担内存分配与内核选择的开销
+    :param session:
+    :param runs:
+    :param input_size: 动态输入尺寸时使用的 (宽, 高)
+    :return:
+    """
+    if runs <= 0:
+        return
+    inputs = np.zeros(input_shape(session, input_size), dtype=np.float32)
+    input_name = session.get_inputs()[0].name
+    start = time.perf_counter()
+    for _ in range(runs):
+        session.run(None, {input_name: inputs})
+    logger.info(f"ONNX 会话预热 {runs} 次, 平均 {(time.perf_counter() - start) / runs * 1000:.1f}ms")
@@ -0,0 +1,166 @@
+import atexit
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from utils.detector import Detector, create_detector
+from utils.logger import logger
+
+
+def _worker(conn, backend: str, kwargs: dict):
+    """
+    子进程：从共享内存读取画面，检测后把 (n, 6) float32 结果原样发回
+    """
+    detector = create_detector(backend, **kwargs)
+    conn.send(detector.name)
+    shm = None
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        name, shape = message
+        if shm is None or shm.name != name:
+            if shm is not None:
+                shm.close()
+            # spawn 的子进程与父进程共用 resource_tracker，由父进程负责 unlink
+            shm = shared_memory.SharedMemory(name=name)
+        image = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        detections = np.ascontiguousarray(detector.detect(image), dtype=np.float32)
+        conn.send_bytes(detections.tobytes())
+    if shm is not None:
+        shm.close()
+
+
+class ProcessDetector(Detector):
+    """
+    在独立进程中运行检测后端，预处理、推理与 NMS 都不再占用主进程的 GIL
+    画面经 multiprocessing.shared_memory 传入，检测结果以 (n, 6) float32 字节返回
+    子进程崩溃或超时无响应时自动重启，期间的帧返回空结果
+    """
+
+    def __init__(
+            self,
+            backend: str = "onnx",
+            timeout: float = 5.0,
+            min_restart_interval: float = 1.0,
+            **kwargs,
+    ):
+        """
+        :param backend: 子进程中使用的检测后端 onnx / ncnn / opencv / auto
+        :param timeout: 单帧最长等待时间，超时视为子进程卡死
+        :param min_restart_interval: 两次重启之间的最短间隔，避免启动即崩溃时反复拉起
+        :param kwargs: 传给检测后端的参数
+        """
+        self.backend = backend
+        self.kwargs = kwargs
+        self.timeout = timeout
+        self.min_restart_interval = min_restart_interval
+        self.name = f"process:{backend}"
+        self.shared_input_buffer = False
+        # spawn：父进程已有 scrcpy、推理等线程，fork 可能复制到被持有的锁
+        self._context = mp.get_context("spawn")
+        self.process = None
+        self.conn = None
+        self.shm = None
+        self.restart_count = 0
+        self.closed = False
+        self._last_start = float("-inf")
+        self.start()
+        # 兜底：进程退出前仍未 close 时释放共享内存
+        atexit.register(self.close)
+
+    def start(self):
+        wait = self._last_start + self.min_restart_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_start = time.monotonic()
+        parent_conn, child_conn = self._context.Pipe()
+        self.process = self._context.Process(
+            target=_worker, args=(child_conn, self.backend, self.kwargs), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        # 等子进程加载完模型，加载失败时直接抛出
+        if not self.conn.poll(60):
+            self.stop()
+            raise TimeoutError(f"检测子进程 {self.backend} 启动超时")
+        try:
+            backend_name = self.conn.recv()
+        except EOFError:
+            self.process.join(1)
+            exitcode = self.process.exitcode
+            self.stop()
+            raise Exception(f"检测子进程 {self.backend} 启动失败，exitcode={exitcode}")
+        logger.info(f"检测子进程已启动: pid={self.process.pid}, 后端 {backend_name}")
+
+    def stop(self):
+        if self.conn is not None:
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self.conn.close()
+            self.conn = None
+        if self.process is not None:
+            self.process.join(1)
+            if self.process.is_alive():
+                self.process.kill()
+            self.process = None
+
+    def restart(self, reason: str):
+        self.restart_count += 1
+        logger.error(f"检测子进程{reason}，第 {self.restart_count} 次重启")
+        self.stop()
+        try:
+            self.start()
+        except Exception as e:
+            logger.error(e)
+
+    def close(self):
+        self.closed = True
+        self.stop()
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def preprocess(self, image):
+        # 画面在 infer 中才写入共享内存，流水线模式下预处理与推理不在同一线程
+        return image, None
+
+    def write_frame(self, image):
+        """
+        把画面写入共享内存，容量不足时重新分配
+        :return: (共享内存名, 画面形状)
+        """
+        if self.shm is None or self.shm.size < image.nbytes:
+            if self.shm is not None:
+                self.shm.close()
+                self.shm.unlink()
+            self.shm = shared_memory.SharedMemory(create=True, size=image.nbytes)
+        np.ndarray(image.shape, dtype=np.uint8, buffer=self.shm.buf)[:] = image
+        return self.shm.name, image.shape
+
+    def infer(self, inputs):
+        empty = np.zeros((0, 6), dtype=np.float32)
+        if self.closed:
+            return empty
+        if self.process is None or not self.process.is_alive():
+            self.restart("已退出")
+            return empty
+        try:
+            self.conn.send(self.write_frame(inputs))
+            if not self.conn.poll(self.timeout):
+                self.restart("无响应")
+                return empty
+            return np.frombuffer(self.conn.recv_bytes(), dtype=np.float32).reshape(-1, 6).copy()
+        except (EOFError, BrokenPipeError, OSError):
+            self.restart("崩溃")
+            return empty
+
+    def postprocess(self, output, meta) -> np.ndarray:
+        # 子进程已完成后处理
+        return output
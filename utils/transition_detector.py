@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+import cv2 as cv
+import numpy as np
+
+# kind: fade_out / fade_in，timestamp: 触发该事件的帧的采集时间，luminance: 该帧缩略图的平均亮度
+TransitionEvent = namedtuple("TransitionEvent", ["kind", "timestamp", "luminance"])
+
+
+class TransitionDetector:
+    """
+    过图转场检测：每帧在解码线程上算一次很小的灰度缩略图，根据一段时间窗口内的亮度变化给出淡出 / 淡入事件
+    不要求恰好拿到一帧全黑画面，过图黑屏帧被丢弃时，仍能从窗口内前后几帧的骤暗 / 回亮识别出转场
+    转场一定会结束：亮度回到淡出前的水平、明显回亮、画面稳定下来或超过最长时长时都给出淡入事件
+    """
+
+    FADE_OUT = "fade_out"
+    FADE_IN = "fade_in"
+
+    def __init__(
+            self,
+            dark_threshold: int = 30,
+            dark_ratio: float = 0.6,
+            fade_ratio: float = 0.5,
+            min_change: float = 40.0,
+            window: float = 0.5,
+            confirm_frames: int = 2,
+            settle_frames: int = 3,
+            settle_tolerance: float = 2.0,
+            max_duration: float = 3.0,
+            size=(32, 18),
+            max_events: int = 32,
+    ):
+        """
+        :param dark_threshold: 灰度低于该值的像素视为黑色
+        :param dark_ratio: 黑色像素占比超过该值的帧视为黑屏
+        :param fade_ratio: 亮度降到窗口内亮度中位数的该比例以下视为淡出，回到淡出前亮度的该比例以上视为淡入
+        :param min_change: 淡出 / 淡入要求的最小平均亮度变化（0-255），避免暗场景中的小幅波动误判
+        :param window: 淡出时与之比较的历史帧时间窗口（秒），取中位数，一两帧技能闪光不影响
+        :param confirm_frames: 未整帧变黑时，骤暗需连续持续的帧数
+        :param settle_frames: 转场中画面不再是黑屏且亮度连续这么多帧基本不变时，视为已进入新画面（如较暗的房间）
+        :param settle_tolerance: 判断亮度不变的容差
+        :param max_duration: 转场最长持续时间（秒），超过后强制结束
+        :param size: 缩略图尺寸 (宽, 高)，与 FrameChangeGate 一致时推理前可直接复用
+        :param max_events: 最多保留的事件数
+        """
+        self.dark_threshold = dark_threshold
+        self.dark_ratio = dark_ratio
+        self.fade_ratio = fade_ratio
+        self.min_change = min_change
+        self.window = window
+        self.confirm_frames = confirm_frames
+        self.settle_frames = settle_frames
+        self.settle_tolerance = settle_tolerance
+        self.max_duration = max_duration
+        self.size = size
+        self.dark = False  # 当前是否处于转场（淡出后尚未淡入）
+        self.fade_count = 0  # 检测到的淡出次数
+        self._history = deque()  # (采集时间, 平均亮度)
+        self._drop_frames = 0  # 连续骤暗的帧数
+        self._baseline = 0.0  # 淡出前的亮度
+        self._dark_since = 0.0  # 淡出时间
+        self._dark_min = 0.0  # 转场期间的最低亮度
+        self._settled = 0  # 转场中亮度连续不变的帧数
+        self._last_luminance = 0.0
+        self._events = deque(maxlen=max_events)  # (序号, TransitionEvent)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def update(self, image, timestamp: float = None):
+        """
+        处理一帧画面
+        :param image: BGR 图像
+        :param timestamp: 采集时间，默认 time.perf_counter()
+        :return: 该帧的灰度缩略图（新分配，可挂在帧上供下游复用）
+        """
+        small = cv.resize(image, self.size, interpolation=cv.INTER_AREA)
+        thumb = cv.cvtColor(small, cv.COLOR_BGR2GRAY)
+        self.feed(thumb, timestamp)
+        return thumb
+
+    def feed(self, thumb: np.ndarray, timestamp: float = None):
+        """
+        处理一帧灰度缩略图
+        :param thumb: 灰度缩略图
+        :param timestamp: 采集时间，默认 time.perf_counter()
+        :return: 本帧触发的事件，没有时返回 None
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        luminance = float(thumb.mean())
+        black = np.count_nonzero(thumb < self.dark_threshold) / thumb.size > self.dark_ratio
+        history = self._history
+        while history and timestamp - history[0][0] > self.window:
+            history.popleft()
+        event = None
+        if not self.dark:
+            baseline = float(np.median([value for _, value in history])) if history else luminance
+            # 与窗口内的一般亮度相比变暗，长时间黑屏（如超时结束的转场）不会反复触发
+            drop = baseline - luminance >= self.min_change
+            # 未整帧变黑时需连续几帧骤暗，黑屏帧本身被丢弃时靠这一条识别
+            if drop and luminance <= baseline * self.fade_ratio:
+                self._drop_frames += 1
+            else:
+                self._drop_frames = 0
+            if drop and black or self._drop_frames >= self.confirm_frames:
+                self.dark = True
+                self._baseline = baseline
+                self._dark_since = timestamp
+                self._dark_min = luminance
+                self._settled = 0
+                self._drop_frames = 0
+                self.fade_count += 1
+                event = self._emit(self.FADE_OUT, timestamp, luminance)
+        else:
+            self._dark_min = min(self._dark_min, luminance)
+            if not black and abs(luminance - self._last_luminance) <= self.settle_tolerance:
+                self._settled += 1
+            else:
+                self._settled = 0
+            if (
+                    timestamp - self._dark_since >= self.max_duration
+                    or not black and (
+                        luminance >= self._baseline * self.fade_ratio
+                        or luminance - self._dark_min >= self.min_change
+                        or self._settled >= self.settle_frames
+                    )
+            ):
+                self.dark = False
+                event = self._emit(self.FADE_IN, timestamp, luminance)
+        self._last_luminance = luminance
+        history.append((timestamp, luminance))
+        return event
+
+    def _emit(self, kind: str, timestamp: float, luminance: float) -> TransitionEvent:
+        event = TransitionEvent(kind, timestamp, luminance)
+        with self._lock:
+            self._seq += 1
+            self._events.append((self._seq, event))
+        return event
+
+    @property
+    def cursor(self) -> int:
+        """
+        最新事件的序号，消费方从这里开始读取即可忽略之前的事件
+        """
+        with self._lock:
+            return self._seq
+
+    def events_since(self, cursor: int):
+        """
+        读取序号大于 cursor 的事件，每个消费方各自保存游标，互不影响
+        :param cursor: 上次读取返回的游标
+        :return: (事件列表, 新游标)
+        """
+        with self._lock:
+            return [event for seq, event in self._events if seq > cursor], self._seq
@@ -12,12 +12,16 @@
 # CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 import os.path
+import queue
+import threading
 import time
 import numpy as np
 import ncnn
 from ncnn.model_zoo.model_store import get_model_file
 from ncnn.utils.objects import Detect_Object
 from ncnn.utils.functional import *
+from tools.ncnn_replace_focus import FOCUS_LAYER, has_focus
+from utils.letterbox import Letterbox
 from utils.path_manager import PathManager
 
 
@@ -65,14 +69,22 @@ class YoloV5s:
             target_size=640,
             prob_threshold=0.25,
             nms_threshold=0.45,
-            num_threads=1,
+            num_threads=None,
             use_gpu=False,
+            powersave=0,
+            extractor_pool=1,
     ):
+        """
+        :param num_threads: 每个 extractor 的线程数，默认为大核数量
+        :param powersave: ncnn 绑核模式，0 全部核心，1 只用小核，2 只用大核
+        :param extractor_pool: extractor 池大小，大于 1 时可由多个线程同时调用 infer
+        """
         self.target_size = target_size
         self.prob_threshold = prob_threshold
         self.nms_threshold = nms_threshold
-        self.num_threads = num_threads
+        self.num_threads = num_threads or ncnn.get_big_cpu_count()
         self.use_gpu = use_gpu
+        ncnn.set_cpu_powersave(powersave)
 
         self.mean_vals = []
         self.norm_vals = [1 / 255.0, 1 / 255.0, 1 / 255.0]
@@ -80,10 +92,7 @@ class YoloV5s:
         self.net = ncnn.Net()
         self.net.opt.use_vulkan_compute = self.use_gpu
         self.net.opt.num_threads = self.num_threads
-
-        self.net.register_custom_layer(
-            "YoloV5Focus", YoloV5Focus_layer_creator, YoloV5Focus_layer_destroyer
-        )
+        self.net.opt.lightmode = True  # 推理过程中及时回收中间 blob
 
         # original pretrained model from https://github.com/ultralytics/yolov5
         # the ncnn model https://github.com/nihui/ncnn-assets/tree/master/models
@@ -96,12 +105,17 @@ class YoloV5s:
             raise FileNotFoundError(f"{param_path} not found")
         if not os.path.exists(bin_path):
             raise FileNotFoundError(f"{bin_path} not found")
+        # 经 tools/ncnn_replace_focus.py 处理过的模型全部是内置层，不再注册 Python 回调
+        if has_focus(param_path):
+            self.net.register_custom_layer(
+                FOCUS_LAYER, YoloV5Focus_layer_creator, YoloV5Focus_layer_destroyer
+            )
         # original pretrained model from https://github.com/ultralytics/yolov5
         # the ncnn model https://github.com/nihui/ncnn-assets/tree/master/models
         self.net.load_param(param_path)
         self.net.load_model(bin_path)
 
-        self.grid = [make_grid(10, 6), make_grid(20, 12), make_grid(40, 24)]
+        self.grids = {}  # (列数, 行数) -> make_grid 结果，按输入尺寸缓存
         self.stride = np.array([32, 16, 8])
         self.anchor_grid = np.array(
             [
@@ -115,54 +129,110 @@ class YoloV5s:
             line.strip() for line in open(classes_path).readlines()
         ]
 
-    def __del__(self):
-        self.net = None
-
-    def __call__(self, img):
-        img_w = img.shape[1]
-        img_h = img.shape[0]
-
-        w = img_w
-        h = img_h
-        scale = 1.0
-        if w > h:
-            scale = float(self.target_size) / w
-            w = self.target_size
-            h = int(h * scale)
+        # 预处理缓冲区按线程复用；extractor 支持 clear 时循环复用，否则每次新建
+        self._local = threading.local()
+        self.reuse_extractor = hasattr(ncnn.Extractor, "clear")
+        self.extractors = queue.Queue()
+        for _ in range(extractor_pool):
+            self.extractors.put(self.net.create_extractor() if self.reuse_extractor else None)
+
+    def grid(self, num_grid_x, num_grid_y):
+        key = (num_grid_x, num_grid_y)
+        grid = self.grids.get(key)
+        if grid is None:
+            # (ny, nx, 2)，与 (3, ny, nx, 2) 的坐标列相加时不再广播出多余的维度
+            grid = make_grid(num_grid_x, num_grid_y).reshape(num_grid_y, num_grid_x, 2)
+            self.grids[key] = grid
+        return grid
+
+    def decode_buffer(self, shape):
+        """
+        当前线程解码检测头用的缓冲区，按形状复用
+        """
+        buffers = getattr(self._local, "decode_buffers", None)
+        if buffers is None:
+            buffers = self._local.decode_buffers = {}
+        buffer = buffers.get(shape)
+        if buffer is None:
+            buffer = buffers[shape] = np.empty(shape, dtype=np.float32)
+        return buffer
+
+    def decode(self, pred, i, num_grid_x, num_grid_y):
+        """
+        解码一个检测头：整个检测头的 sigmoid 原地写入复用的缓冲区，不再每帧分配
+        坐标只有 4 列，在这几列的跨步视图上逐步原地运算反而比生成小的临时数组慢，仍按原写法计算
+        :param pred: (3, ny * nx, 5 + nc) 检测头原始输出
+        :param i: 检测头下标，对应 stride 与 anchor_grid
+        :return: (1, 3 * ny * nx, 5 + nc) 缓冲区视图，同一线程下一帧会覆盖，调用方需先拷贝（如 np.concatenate）
+        """
+        y = self.decode_buffer(pred.shape)
+        # sigmoid
+        np.negative(pred, out=y)
+        np.exp(y, out=y)
+        y += 1
+        np.reciprocal(y, out=y)
+        y = y.reshape(pred.shape[0], num_grid_y, num_grid_x, pred.shape[2])
+        y[..., 0:2] = (y[..., 0:2] * 2.0 - 0.5 + self.grid(num_grid_x, num_grid_y)) * self.stride[i]  # xy
+        y[..., 2:4] = (y[..., 2:4] * 2) ** 2 * self.anchor_grid[i][0]  # wh
+        return y.reshape(1, -1, y.shape[-1])
+
+    @property
+    def letterbox(self) -> Letterbox:
+        letterbox = getattr(self._local, "letterbox", None)
+        if letterbox is None:
+            # 与 yolov5 letterbox 相同：长边缩放到 target_size，只补边到 32 的整数倍
+            letterbox = Letterbox(self.target_size, stride=32)
+            self._local.letterbox = letterbox
+        return letterbox
+
+    def acquire_extractor(self):
+        ex = self.extractors.get()
+        if ex is None:
+            ex = self.net.create_extractor()
+        ex.set_num_threads(self.num_threads)
+        return ex
+
+    def release_extractor(self, ex):
+        if self.reuse_extractor:
+            ex.clear()
+            self.extractors.put(ex)
         else:
-            scale = float(self.target_size) / h
-            h = self.target_size
-            w = int(w * scale)
+            self.extractors.put(None)
 
-        mat_in = ncnn.Mat.from_pixels_resize(
-            img, ncnn.Mat.PixelType.PIXEL_BGR2RGB, img_w, img_h, w, h
-        )
-        # pad to target_size rectangle
-        # yolov5/utils/datasets.py letterbox
-        wpad = (w + 31) // 32 * 32 - w
-        hpad = (h + 31) // 32 * 32 - h
-        mat_in_pad = ncnn.copy_make_border(
-            mat_in,
-            hpad // 2,
-            hpad - hpad // 2,
-            wpad // 2,
-            wpad - wpad // 2,
-            ncnn.BorderType.BORDER_CONSTANT,
-            114.0,
-        )
-
-        mat_in_pad.substract_mean_normalize(self.mean_vals, self.norm_vals)
-
-        ex = self.net.create_extractor()
-        ex.input("images", mat_in_pad)
+    def __del__(self):
+        self.net = None
 
-        # 改动部分 Permute
-        # anchor setting from yolov5/models/yolov5s.yaml
-        ret1, mat_out1 = ex.extract("output")  # stride 8
-        ret2, mat_out2 = ex.extract("364")  # stride 16
-        ret3, mat_out3 = ex.extract("381")  # stride 32
+    def preprocess(self, img):
+        """
+        等比缩放到 target_size 并补边到 32 的整数倍，缩放、补边、BGR->RGB 与归一化写入复用的缓冲区
+        :param img: BGR 图像
+        :return: (输入 Mat, (左侧补边, 顶部补边), (缩放后宽, 缩放后高), 缩放比例)
+                 输入 Mat 与缓冲区共享内存，同一线程下一次调用前需完成推理
+        """
+        tensor, pad, size = self.letterbox(img)
+        scale = size[0] / img.shape[1]
+        return ncnn.Mat(tensor[0]), pad, size, scale
 
-        pred = [np.array(mat_out3), np.array(mat_out2), np.array(mat_out1)]
+    def infer(self, mat_in_pad):
+        """
+        执行推理并解码三个检测头
+        :param mat_in_pad: preprocess 的输出
+        :return: (1, N, 5 + nc)，补边后输入图上的中心点宽高坐标
+        """
+        ex = self.acquire_extractor()
+        try:
+            ex.input("images", mat_in_pad)
+
+            # 改动部分 Permute
+            # anchor setting from yolov5/models/yolov5s.yaml
+            ret1, mat_out1 = ex.extract("output")  # stride 8
+            ret2, mat_out2 = ex.extract("364")  # stride 16
+            ret3, mat_out3 = ex.extract("381")  # stride 32
+        finally:
+            self.release_extractor(ex)
+
+        # pyncnn 的 extract 每次返回一个新的 Mat，无法跨帧复用；这里只取视图，不再用 np.array 多拷贝一次
+        pred = [np.asarray(mat_out3), np.asarray(mat_out2), np.asarray(mat_out1)]
         z = []
         for i in range(len(pred)):
             num_grid = pred[i].shape[1]
@@ -172,20 +242,13 @@ class YoloV5s:
             else:
                 num_grid_y = mat_in_pad.h // self.stride[i]
                 num_grid_x = num_grid // num_grid_y
-            if (
-                    self.grid[i].shape[0] != num_grid_x
-                    or self.grid[i].shape[1] != num_grid_y
-            ):
-                self.grid[i] = make_grid(num_grid_x, num_grid_y)
-
-            y = sigmoid(pred[i])
-            y = y.reshape(pred[i].shape[0], num_grid_y, num_grid_x, pred[i].shape[2])
-            y[..., 0:2] = (y[..., 0:2] * 2.0 - 0.5 + self.grid[i]) * self.stride[
-                i
-            ]  # xy
-            y[..., 2:4] = (y[..., 2:4] * 2) ** 2 * self.anchor_grid[i]  # wh
-            z.append(y.reshape(1, -1, y.shape[-1]))
-        pred = np.concatenate(z, 1)
+            z.append(self.decode(pred[i], i, num_grid_x, num_grid_y))
+        # 拼接结果是新数组，会交给其他线程做 NMS，不能复用
+        return np.concatenate(z, 1)
+
+    def __call__(self, img):
+        mat_in_pad, (left, top), _, scale = self.preprocess(img)
+        pred = self.infer(mat_in_pad)
 
         result = self.non_max_suppression(
             pred, self.prob_threshold, self.nms_threshold
@@ -198,8 +261,8 @@ class YoloV5s:
             Detect_Object(
                 obj[5],
                 obj[4],
-                (obj[0] - (wpad / 2)) / scale,
-                (obj[1] - (hpad / 2)) / scale,
+                (obj[0] - left) / scale,
+                (obj[1] - top) / scale,
                 (obj[2] - obj[0]) / scale,
                 (obj[3] - obj[1]) / scale,
             )
@@ -256,9 +319,10 @@ class YoloV5s:
                     (box[i], x[i, j + 5, None], j[:, None].astype(np.float32)), axis=1
                 )
             else:  # best class only
-                conf, j = x[:, 5:].max(1, keepdim=True)
-                x = np.concatenate((box, conf, j.float()), axis=1)[
-                    conf.view(-1) > conf_thres
+                j = x[:, 5:].argmax(1)[:, None]
+                conf = np.take_along_axis(x[:, 5:], j, 1)
+                x = np.concatenate((box, conf, j.astype(np.float32)), axis=1)[
+                    conf[:, 0] > conf_thres
                     ]
 
             # Filter by class
@@ -287,8 +351,8 @@ class YoloV5s:
                 try:  # update boxes as boxes(i,4) = weights(i,n) * boxes(n,4)
                     iou = box_iou(boxes[i], boxes) > iou_thres  # iou matrix
                     weights = iou * scores[None]  # box weights
-                    x[i, :4] = torch.mm(weights, x[:, :4]).float() / weights.sum(
-                        1, keepdim=True
+                    x[i, :4] = (weights @ x[:, :4]) / weights.sum(
+                        1, keepdims=True
                     )  # merged boxes
                     if redundant:
                         i = i[iou.sum(1) > 1]  # require redundancy
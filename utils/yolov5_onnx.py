@@ -1,48 +1,25 @@
-import cv2
 import numpy as np
-import torch
-from torchvision.ops import nms
-from PIL import Image, ImageOps
-import torch
 import threading
 import time
-import onnxruntime as ort
-import json
 from utils.logger import logger
+from utils.detections import Detections
+from utils.fast_nms import FastNMS
+from utils.inference_pipeline import InferencePipeline
+from utils.latency_tracer import LatencyTracer
+from utils.letterbox import Letterbox
+from utils.ort_session import OrtSessionConfig, create_session, model_input_size
 
+try:
+    import torch
+except ImportError:  # torch 为可选依赖，后处理只使用 NumPy
+    torch = None
 
-def resize_img(im):
-    target_size = 640  # 目标尺寸
-    width, height = im.size
-    if width < height:
-        new_height = target_size
-        new_width = int(new_height / height * width)
-    else:
-        new_width = target_size
-        new_height = int(new_width / width * height)
-    resized_im = im.resize((new_width, new_height), Image.Resampling.LANCZOS)
-    pad_width = target_size - new_width
-    pad_height = target_size - new_height
-
-    # 计算每边需要补的像素数
-    left_pad = pad_width // 2
-    right_pad = pad_width - left_pad
-    top_pad = pad_height // 2
-    bottom_pad = pad_height - top_pad
-    # print(top_pad,top_pad)
-    # 补hui色边
-    new_im = ImageOps.expand(
-        resized_im,
-        border=(left_pad, top_pad, right_pad, bottom_pad),
-        fill=(114, 114, 114),
-    )
-
-    return new_im, top_pad
 
-
-def from_numpy(x):
-    """Converts a NumPy array to a torch tensor, maintaining device compatibility."""
-    return torch.from_numpy(x) if isinstance(x, np.ndarray) else x
+def to_numpy(x):
+    """Converts a torch tensor to a NumPy array, other inputs are passed to np.asarray."""
+    if torch is not None and isinstance(x, torch.Tensor):
+        return x.detach().cpu().numpy()
+    return np.asarray(x)
 
 
 def box_iou(box1, box2, eps=1e-7):
@@ -52,24 +29,52 @@ def box_iou(box1, box2, eps=1e-7):
 
     Both sets of boxes are expected to be in (x1, y1, x2, y2) format.
     Arguments:
-        box1 (Tensor[N, 4])
-        box2 (Tensor[M, 4])
+        box1 (ndarray[N, 4])
+        box2 (ndarray[M, 4])
     Returns:
-        iou (Tensor[N, M]): the NxM matrix containing the pairwise
+        iou (ndarray[N, M]): the NxM matrix containing the pairwise
             IoU values for every element in boxes1 and boxes2
     """
 
-    # inter(N,M) = (rb(N,M,2) - lt(N,M,2)).clamp(0).prod(2)
-    (a1, a2), (b1, b2) = box1.unsqueeze(1).chunk(2, 2), box2.unsqueeze(0).chunk(2, 2)
-    inter = (torch.min(a2, b2) - torch.max(a1, b1)).clamp(0).prod(2)
+    # inter(N,M) = (rb(N,M,2) - lt(N,M,2)).clip(0).prod(2)
+    a1, a2 = box1[:, None, :2], box1[:, None, 2:4]
+    b1, b2 = box2[None, :, :2], box2[None, :, 2:4]
+    inter = (np.minimum(a2, b2) - np.maximum(a1, b1)).clip(0).prod(2)
 
     # IoU = inter / (area1 + area2 - inter)
     return inter / ((a2 - a1).prod(2) + (b2 - b1).prod(2) - inter + eps)
 
 
+def nms(boxes, scores, iou_threshold):
+    """
+    Greedy NMS with the same semantics as torchvision.ops.nms.
+
+    Arguments:
+        boxes (ndarray[N, 4]): boxes in (x1, y1, x2, y2) format
+        scores (ndarray[N])
+        iou_threshold (float): discards boxes with IoU > iou_threshold
+    Returns:
+        keep (ndarray[K]): indices of the kept boxes, sorted by decreasing score
+    """
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = (np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])).clip(0)
+        h = (np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])).clip(0)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
 def xywh2xyxy(x):
     """Convert nx4 boxes from [x, y, w, h] to [x1, y1, x2, y2] where xy1=top-left, xy2=bottom-right."""
-    y = x.clone() if isinstance(x, torch.Tensor) else np.copy(x)
+    y = np.copy(x)
     y[..., 0] = x[..., 0] - x[..., 2] / 2  # top left x
     y[..., 1] = x[..., 1] - x[..., 3] / 2  # top left y
     y[..., 2] = x[..., 0] + x[..., 2] / 2  # bottom right x
@@ -79,12 +84,35 @@ def xywh2xyxy(x):
 
 def xyxy2xywh(x):
     """Convert nx4 boxes from [x, y, w, h] to [x1, y1, x2, y2] where xy1=top-left, xy2=bottom-right."""
-    y = x.clone() if isinstance(x, torch.Tensor) else np.copy(x)
+    y = np.copy(x)
     y[..., 2] = x[..., 2] - x[..., 0] / 2  # bottom right x
     y[..., 3] = x[..., 3] - x[..., 1] / 2  # bottom right y
     return y
 
 
+def _batched_nms(x, iou_thres, agnostic, max_nms, max_det, merge, redundant, max_wh=7680):
+    """
+    Sort by confidence, run class-offset NMS and optionally merge boxes.
+    x: (n, 6 + nm) [xyxy, conf, cls, masks]
+    """
+    n = x.shape[0]  # number of boxes
+    x = x[np.argsort(-x[:, 4], kind="stable")[:max_nms]]  # sort by confidence and remove excess boxes
+
+    # Batched NMS
+    c = x[:, 5:6] * (0 if agnostic else max_wh)  # classes
+    boxes, scores = x[:, :4] + c, x[:, 4]  # boxes (offset by class), scores
+    i = nms(boxes, scores, iou_thres)  # NMS
+    i = i[:max_det]  # limit detections
+    if merge and (1 < n < 3e3):  # Merge NMS (boxes merged using weighted mean)
+        # update boxes as boxes(i,4) = weights(i,n) * boxes(n,4)
+        iou = box_iou(boxes[i], boxes) > iou_thres  # iou matrix
+        weights = iou * scores[None]  # box weights
+        x[i, :4] = (weights @ x[:, :4]) / weights.sum(1, keepdims=True)  # merged boxes
+        if redundant:
+            i = i[iou.sum(1) > 1]  # require redundancy
+    return x[i]
+
+
 def NonMaximumSuppression(
     prediction,
     conf_thres=0.15,
@@ -100,7 +128,7 @@ def NonMaximumSuppression(
     Non-Maximum Suppression (NMS) on inference results to reject overlapping detections.
 
     Returns:
-         list of detections, on (n,6) tensor per image [xyxy, conf, cls]
+         list of detections, on (n,6) float32 ndarray per image [xyxy, conf, cls]
     """
 
     # Checks
@@ -115,38 +143,30 @@ def NonMaximumSuppression(
     ):  # YOLOv5 model in validation model, output = (inference_out, loss_out)
         prediction = prediction[0]  # select only inference output
 
-    device = prediction.device
-    mps = "mps" in device.type  # Apple MPS
-    if mps:  # MPS not fully supported yet, convert tensors to CPU before NMS
-        prediction = prediction.cpu()
+    prediction = to_numpy(prediction).astype(np.float32, copy=False)
     bs = prediction.shape[0]  # batch size
     nc = prediction.shape[2] - nm - 5  # number of classes
     xc = prediction[..., 4] > conf_thres  # candidates
 
     # Settings
-    # min_wh = 2  # (pixels) minimum box width and height
-    max_wh = 7680  # (pixels) maximum box width and height
-    max_nms = 30000  # maximum number of boxes into torchvision.ops.nms()
-    time_limit = 0.5 + 0.05 * bs  # seconds to quit after
+    max_nms = 30000  # maximum number of boxes into nms()
     redundant = True  # require redundant detections
     multi_label &= nc > 1  # multiple labels per box (adds 0.5ms/img)
     merge = False  # use merge-NMS
 
     mi = 5 + nc  # mask start index
-    output = [torch.zeros((0, 6 + nm), device=prediction.device)] * bs
+    output = [np.zeros((0, 6 + nm), dtype=np.float32)] * bs
     for xi, x in enumerate(prediction):  # image index, image inference
-        # Apply constraints
-        # x[((x[..., 2:4] < min_wh) | (x[..., 2:4] > max_wh)).any(1), 4] = 0  # width-height
-        x = x[xc[xi]]  # confidence
+        x = x[xc[xi]]  # confidence, boolean indexing copies so the model output is untouched
 
         # Cat apriori labels if autolabelling
         if labels and len(labels[xi]):
-            lb = labels[xi]
-            v = torch.zeros((len(lb), nc + nm + 5), device=x.device)
+            lb = to_numpy(labels[xi])
+            v = np.zeros((len(lb), nc + nm + 5), dtype=np.float32)
             v[:, :4] = lb[:, 1:5]  # box
             v[:, 4] = 1.0  # conf
-            v[range(len(lb)), lb[:, 0].long() + 5] = 1.0  # cls
-            x = torch.cat((x, v), 0)
+            v[range(len(lb)), lb[:, 0].astype(np.int64) + 5] = 1.0  # cls
+            x = np.concatenate((x, v), 0)
 
         # If none remain process next image
         if not x.shape[0]:
@@ -156,53 +176,26 @@ def NonMaximumSuppression(
         x[:, 5:] *= x[:, 4:5]  # conf = obj_conf * cls_conf
 
         # Box/Mask
-        box = xywh2xyxy(
-            x[:, :4]
-        )  # center_x, center_y, width, height) to (x1, y1, x2, y2)
+        box = xywh2xyxy(x[:, :4])  # center_x, center_y, width, height) to (x1, y1, x2, y2)
         mask = x[:, mi:]  # zero columns if no masks
 
         # Detections matrix nx6 (xyxy, conf, cls)
         if multi_label:
-            i, j = (x[:, 5:mi] > conf_thres).nonzero(as_tuple=False).T
-            x = torch.cat((box[i], x[i, 5 + j, None], j[:, None].float(), mask[i]), 1)
+            i, j = (x[:, 5:mi] > conf_thres).nonzero()
+            x = np.concatenate((box[i], x[i, 5 + j, None], j[:, None].astype(np.float32), mask[i]), 1)
         else:  # best class only
-            conf, j = x[:, 5:mi].max(1, keepdim=True)
-            x = torch.cat((box, conf, j.float(), mask), 1)[conf.view(-1) > conf_thres]
+            j = x[:, 5:mi].argmax(1)[:, None]
+            conf = np.take_along_axis(x[:, 5:mi], j, 1)
+            x = np.concatenate((box, conf, j.astype(np.float32), mask), 1)[conf[:, 0] > conf_thres]
 
         # Filter by class
         if classes is not None:
-            x = x[(x[:, 5:6] == torch.tensor(classes, device=x.device)).any(1)]
-
-        # Apply finite constraint
-        # if not torch.isfinite(x).all():
-        #     x = x[torch.isfinite(x).all(1)]
+            x = x[(x[:, 5:6] == np.asarray(classes)).any(1)]
 
         # Check shape
-        n = x.shape[0]  # number of boxes
-        if not n:  # no boxes
+        if not x.shape[0]:  # no boxes
             continue
-        x = x[
-            x[:, 4].argsort(descending=True)[:max_nms]
-        ]  # sort by confidence and remove excess boxes
-
-        # Batched NMS
-        c = x[:, 5:6] * (0 if agnostic else max_wh)  # classes
-        boxes, scores = x[:, :4] + c, x[:, 4]  # boxes (offset by class), scores
-        i = nms(boxes, scores, iou_thres)  # NMS
-        i = i[:max_det]  # limit detections
-        if merge and (1 < n < 3e3):  # Merge NMS (boxes merged using weighted mean)
-            # update boxes as boxes(i,4) = weights(i,n) * boxes(n,4)
-            iou = box_iou(boxes[i], boxes) > iou_thres  # iou matrix
-            weights = iou * scores[None]  # box weights
-            x[i, :4] = torch.mm(weights, x[:, :4]).float() / weights.sum(
-                1, keepdim=True
-            )  # merged boxes
-            if redundant:
-                i = i[iou.sum(1) > 1]  # require redundancy
-
-        output[xi] = x[i]
-        if mps:
-            output[xi] = output[xi].to(device)
+        output[xi] = _batched_nms(x, iou_thres, agnostic, max_nms, max_det, merge, redundant)
 
     return output
 
@@ -220,9 +213,10 @@ def non_max_suppression(
 ):
     """
     Non-Maximum Suppression (NMS) on inference results to reject overlapping detections.
+    Unlike NonMaximumSuppression the score is the objectness alone.
 
     Returns:
-         list of detections, on (n,6) tensor per image [xyxy, conf, cls]
+         list of detections, on (n,6) float32 ndarray per image [xyxy, conf, cls]
     """
 
     # Checks
@@ -236,162 +230,407 @@ def non_max_suppression(
         prediction, (list, tuple)
     ):  # YOLOv5 model in validation model, output = (inference_out, loss_out)
         prediction = prediction[0]  # select only inference output
-    device = prediction.device
-    mps = "mps" in device.type  # Apple MPS
-    if mps:  # MPS not fully supported yet, convert tensors to CPU before NMS
-        prediction = prediction.cpu()
+    prediction = to_numpy(prediction).astype(np.float32, copy=False)
     bs = prediction.shape[0]  # batch size
     nc = prediction.shape[2] - nm - 5  # number of classes
     xc = prediction[..., 4] > conf_thres  # candidates
     # Settings
-    # min_wh = 2  # (pixels) minimum box width and height
-    max_wh = 7680  # (pixels) maximum box width and height
-    max_nms = 30000  # maximum number of boxes into torchvision.ops.nms()
-    time_limit = 0.5 + 0.05 * bs  # seconds to quit after
+    max_nms = 30000  # maximum number of boxes into nms()
     redundant = True  # require redundant detections
     multi_label &= nc > 1  # multiple labels per box (adds 0.5ms/img)
     merge = False  # use merge-NMS
 
     mi = 5 + nc  # mask start index
-    output = [torch.zeros((0, 6 + nm), device=prediction.device)] * bs
+    output = [np.zeros((0, 6 + nm), dtype=np.float32)] * bs
     for xi, x in enumerate(prediction):  # image index, image inference
-        # Apply constraints
-        # x[((x[..., 2:4] < min_wh) | (x[..., 2:4] > max_wh)).any(1), 4] = 0  # width-height
         x = x[xc[xi]]  # confidence
         # Cat apriori labels if autolabelling
         if labels and len(labels[xi]):
-            lb = labels[xi]
-            v = torch.zeros((len(lb), nc + nm + 5), device=x.device)
+            lb = to_numpy(labels[xi])
+            v = np.zeros((len(lb), nc + nm + 5), dtype=np.float32)
             v[:, :4] = lb[:, 1:5]  # box
             v[:, 4] = 1.0  # conf
-            v[range(len(lb)), lb[:, 0].long() + 5] = 1.0  # cls
-            x = torch.cat((x, v), 0)
+            v[range(len(lb)), lb[:, 0].astype(np.int64) + 5] = 1.0  # cls
+            x = np.concatenate((x, v), 0)
 
         # If none remain process next image
         if not x.shape[0]:
             continue
 
-        # Compute conf
-        # x[:, 5:] *= x[:, 4:5]  # conf = obj_conf * cls_conf
-
         # Box/Mask
-        box = xywh2xyxy(
-            x[:, :4]
-        )  # center_x, center_y, width, height) to (x1, y1, x2, y2)
-        # box = x[:, :4]  # center_x, center_y, width, height) to (x1, y1, x2, y2)
+        box = xywh2xyxy(x[:, :4])  # center_x, center_y, width, height) to (x1, y1, x2, y2)
 
         mask = x[:, 6:]  # zero columns if no masks
 
         # Detections matrix nx6 (xyxy, conf, cls)
         if multi_label:
-            i, j = (x[:, 5:mi] > 0).nonzero(as_tuple=False).T
-            x = torch.cat((box[i], x[i, 5 + j, None], j[:, None].float(), mask[i]), 1)
+            i, j = (x[:, 5:mi] > 0).nonzero()
+            x = np.concatenate((box[i], x[i, 5 + j, None], j[:, None].astype(np.float32), mask[i]), 1)
         else:  # best class only
-            conf, j = x[:, 5:mi].max(1, keepdim=True)
-            x = torch.cat((box, x[..., 4:5], j.float(), mask), 1)[conf.view(-1) > 0]
+            j = x[:, 5:mi].argmax(1)[:, None]
+            conf = np.take_along_axis(x[:, 5:mi], j, 1)
+            x = np.concatenate((box, x[..., 4:5], j.astype(np.float32), mask), 1)[conf[:, 0] > 0]
         # Filter by class
         if classes is not None:
-            x = x[(x[:, 5:6] == torch.tensor(classes, device=x.device)).any(1)]
-
-        # Apply finite constraint
-        # if not torch.isfinite(x).all():
-        #     x = x[torch.isfinite(x).all(1)]
+            x = x[(x[:, 5:6] == np.asarray(classes)).any(1)]
 
         # Check shape
-        n = x.shape[0]  # number of boxes
-        if not n:  # no boxes
+        if not x.shape[0]:  # no boxes
             continue
-        x = x[
-            x[:, 4].argsort(descending=True)[:max_nms]
-        ]  # sort by confidence and remove excess boxes
-
-        # Batched NMS
-        c = x[:, 5:6] * (0 if agnostic else max_wh)  # classes
-        boxes, scores = x[:, :4] + c, x[:, 4]  # boxes (offset by class), scores
-        # print(scores)
-        i = nms(boxes, scores, iou_thres)  # NMS
-        i = i[:max_det]  # limit detections
-        if merge and (1 < n < 3e3):  # Merge NMS (boxes merged using weighted mean)
-            # update boxes as boxes(i,4) = weights(i,n) * boxes(n,4)
-            iou = box_iou(boxes[i], boxes) > iou_thres  # iou matrix
-            weights = iou * scores[None]  # box weights
-            x[i, :4] = torch.mm(weights, x[:, :4]).float() / weights.sum(
-                1, keepdim=True
-            )  # merged boxes
-            if redundant:
-                i = i[iou.sum(1) > 1]  # require redundancy
-
-        output[xi] = x[i]
-        if mps:
-            output[xi] = output[xi].to(device)
+        output[xi] = _batched_nms(x, iou_thres, agnostic, max_nms, max_det, merge, redundant)
+
+    return output
+
+
+DEFAULT_NMS = FastNMS()
+
+# 模型类别标签，下标即类别编号
+LABELS = [
+    'hero',
+    'monster',
+    'monster_szt',
+    'go',
+    'opendoor_r',
+    'opendoor_l',
+    'opendoor_t',
+    'opendoor_d',
+    'item',
+    'card',
+    'guide',
+    'repair',
+    'again',
+    'comeback',
+    'zeroPL'
+]
+
+
+def has_embedded_nms(session) -> bool:
+    """
+    模型是否由 tools/export_nms_onnx.py 导出、已内置 NMS
+    :param session:
+    :return:
+    """
+    if session.get_modelmeta().custom_metadata_map.get("nms") == "1":
+        return True
+    # 没有元数据时按输出形状判断：检测数为动态维度且每行 6 列
+    shape = session.get_outputs()[0].shape
+    return len(shape) == 3 and shape[2] == 6 and not isinstance(shape[1], int)
+
 
+def postprocess(output, pad, size, fast_nms: FastNMS = None, embedded_nms: bool = False):
+    """
+    对模型原始输出做 NMS，并把坐标还原为相对原图的 0-1 比例
+    :param output: session.run 的第一个输出 (1, N, 5 + nc)，内置 NMS 的模型为 (1, K, 6)
+    :param pad: (左侧补边, 顶部补边)
+    :param size: (缩放后宽, 缩放后高)
+    :param fast_nms: NMS 配置（阈值、top-k、每类阈值与数量），默认 FastNMS()
+    :param embedded_nms: 模型已内置 NMS，跳过 Python 端 NMS
+    :return: (n, 6) [x1, y1, x2, y2, conf, cls]
+    """
+    left_pad, top_pad = pad
+    new_w, new_h = size
+    if embedded_nms:
+        output = output.reshape(-1, 6)
+    else:
+        # 动态获取输出的属性数量
+        num_attributes = output.shape[2]
+        # 动态调整形状和输出处理
+        output = output.reshape(1, -1, num_attributes)
+        output = (fast_nms or DEFAULT_NMS)(output)
+    # 去掉补边并归一化到原图比例
+    output[:, 0] = (output[:, 0] - left_pad) / new_w
+    output[:, 1] = (output[:, 1] - top_pad) / new_h
+    output[:, 2] = (output[:, 2] - left_pad) / new_w
+    output[:, 3] = (output[:, 3] - top_pad) / new_h
     return output
 
 
 class YOLOv5:
-    def __init__(self, model_path, image_queue, infer_queue, show_queue):
-        self.labels = [
-          'hero',
-          'monster',
-          'monster_szt',
-          'go',
-          'opendoor_r',
-          'opendoor_l',
-          'opendoor_t',
-          'opendoor_d',
-          'item',
-          'card',
-          'guide',
-          'repair',
-          'again',
-          'comeback',
-          'zeroPL'
-        ]
+    # 全分辨率用于战斗与拾取，低分辨率用于寻路与菜单
+    RESOLUTION_FULL = "full"
+    RESOLUTION_LOW = "low"
+
+    def __init__(
+        self,
+        model_path,
+        image_queue,
+        infer_queue,
+        show_queue,
+        tracer=None,
+        frame_gate=None,
+        server=None,
+        session_config: OrtSessionConfig = None,
+        input_size=None,
+        low_input_size=(320, 192),
+        low_model_path=None,
+        full_probe_interval=5,
+        fast_nms: FastNMS = None,
+        detector=None,
+        pipelined: bool = False,
+        pipeline_depth: int = 2,
+        async_infer: bool = False,
+        start: bool = True,
+    ):
+        """
+        :param input_size: 输入尺寸 (宽, 高)，如横屏画面用 (640, 384) 可省去大部分补边；
+                           模型输入为固定尺寸时以模型为准，动态尺寸且未指定时为 640x640
+        :param low_input_size: 低分辨率输入尺寸，主模型输入尺寸为动态时直接复用主模型
+        :param low_model_path: 主模型输入尺寸固定时，单独导出的低分辨率模型路径
+        :param full_probe_interval: 低分辨率模式下每隔多少帧插入一次全分辨率推理，避免漏掉新出现的怪物和物品
+        :param fast_nms: NMS 配置，可按类别设置阈值与最大检测数
+        :param detector: utils.detector 中的检测后端，设置后由它负责预处理、推理与后处理，
+                         不再使用共享推理服务与分辨率切换
+        :param pipelined: 预处理、推理、后处理分别在独立线程中流水执行
+        :param pipeline_depth: 流水线阶段之间最多排队的帧数
+        :param async_infer: 流水线模式下使用 ORT run_async 提交推理
+        :param start: 是否立即启动推理线程（加载模型），为 False 时只构造对象，如测试中直接调用各步骤
+        """
+        self.labels = LABELS
         self.path = model_path
         self.image_queue = image_queue
         self.infer_queue = infer_queue
         self.show_queue = show_queue
+        self.tracer = tracer or LatencyTracer(enabled=False)
+        self.busy_time = 0.0  # 单帧处理耗时的指数滑动平均（秒）
+        self.frame_gate = frame_gate  # 画面未变化时复用上一次的推理结果
+        self.last_output = None
+        self.last_output_frame = 0  # last_output 对应的帧序号
+        self.last_infer_frame = 0  # 最近一次送去推理的帧序号
+        self.fast_nms = fast_nms or FastNMS()
+        self.server = server  # 多设备共享的推理服务，为空时使用自己的会话
+        self.input_size = input_size
+        self.low_input_size = low_input_size
+        self.low_model_path = low_model_path
+        self.full_probe_interval = full_probe_interval
+        self.resolution = self.RESOLUTION_FULL  # 控制线程请求的分辨率
+        self.low_frames = 0
+        self.letterboxes = {}
+        self.sessions = {}  # 低分辨率使用独立模型时的会话
+        self.embedded_nms = {}  # 分辨率 -> 对应模型是否已内置 NMS
+        self.session = None
+        self.detector = detector
+        self.pipeline = InferencePipeline(self, pipeline_depth, async_infer) if pipelined else None
+        self.session_config = session_config
         self.thread = threading.Thread(target=self.thread)  # 创建线程，并指定目标函数
         self.thread.daemon = True  # 设置为守护线程（可选）
-        self.thread.start()
+        if start:
+            self.thread.start()
 
     def thread(self):
-        session = ort.InferenceSession(self.path, providers=["CUDAExecutionProvider"])
-        # session = ort.InferenceSession(self.path, providers=["CPUExecutionProvider"])
+        if self.detector is not None:
+            logger.info(f"使用 {self.detector.name} 检测后端")
+        else:
+            self.init_session()
+
+        if self.pipeline is not None:
+            self.tracer.add_counter("stage_util", self.pipeline.utilization)
+            self.pipeline.start()
+            return
 
-        # 获取模型输入输出信息
-        input_name = session.get_inputs()[0].name
-        output_names = [output.name for output in session.get_outputs()]
-        
         while True:
-            if self.image_queue.empty():
-                time.sleep(0.005)
+            ref = self.image_queue.get()
+            if ref is None:
                 continue
-            img = self.image_queue.get()
-            image = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-            image, top_pad = resize_img(image)
-            image_array = np.array(image).transpose((2, 0, 1))
-            image_array = np.expand_dims(image_array, axis=0).astype(np.float32)
-            inputs = image_array / 255.0
-            output = session.run(output_names, {input_name: inputs})
-            output = output[0]
-            # 动态获取输出的属性数量
-            num_attributes = output.shape[2]
-            # 动态调整形状和输出处理
-            shape = (1, output.shape[1], num_attributes)
-            output = np.resize(output, shape)
-            output = self.from_numpy(output)
-            output = NonMaximumSuppression(output)[0]
-            output[:, 0] = output[:, 0] / 640
-            output[:, 1] = (output[:, 1] - top_pad) / (640 - top_pad * 2)
-            output[:, 2] = output[:, 2] / 640
-            output[:, 3] = (output[:, 3] - top_pad) / (640 - top_pad * 2)
-            
+            img = ref.image
+            start = time.perf_counter()
+            if self.reuse_last_output(ref, start):
+                continue
+            self.tracer.mark(ref, "preprocess_start", start)
+            resolution = self.next_resolution()
+            inputs, meta = self.preprocess(img, resolution)
+            self.tracer.mark(ref, "preprocess_end")
+            output = self.infer(inputs, resolution)
+            self.tracer.mark(ref, "infer")
+            output = self.postprocess(output, meta, resolution)
+            self.tracer.mark(ref, "nms")
             # logger.info(json.dumps(output_dict, indent=4) + " ----output")
             # print(output)
-            self.infer_queue.put([img, output])
-            self.show_queue.put([img, output])
-
-    def from_numpy(self, x):
-        """Converts a NumPy array to a torch tensor, maintaining device compatibility."""
-        return torch.from_numpy(x) if isinstance(x, np.ndarray) else x
+            self.publish(ref, output)
+            self.update_busy_time(time.perf_counter() - start)
+
+    def reuse_last_output(self, ref, now: float) -> bool:
+        """
+        画面未变化时直接发布上一次的结果，过图转场期间发布空结果
+        流水线模式下还有帧在推理时不复用：此时 last_output 不是最近送去推理的帧的结果，复用会比在途的结果先发布
+        :param ref: 帧引用
+        :param now: 当前时间
+        :return: 是否已复用
+        """
+        if self.frame_gate is None:
+            return False
+        if (
+            self.last_output is None
+            or self.frame_gate.should_infer(ref.image, now, ref.thumb)
+            or self.last_output_frame != self.last_infer_frame
+        ):
+            self.last_infer_frame = ref.frame_id
+            return False
+        output = self.last_output
+        if self.frame_gate.in_transition:
+            # 不再发布上一个房间的检测结果
+            output = Detections.empty(self.labels)
+        ref.retain()
+        self.infer_queue.put([ref, output])
+        self.show_queue.put([ref, output])
+        return True
+
+    def close(self):
+        """
+        关闭检测后端（如检测子进程），之后的帧不再推理
+        :return:
+        """
+        if self.detector is not None and hasattr(self.detector, "close"):
+            self.detector.close()
+
+    def publish(self, ref, output):
+        """
+        发布检测结果
+        :param ref: 帧引用（持有一次引用计数）
+        :param output: (n, 6)
+        :return:
+        """
+        output = Detections(output, self.labels)
+        # 先更新结果再更新帧序号，复用方看到帧序号一致时取到的一定是这一帧的结果
+        self.last_output = output
+        self.last_output_frame = ref.frame_id
+        # 同一帧交给两个消费方，引用计数 +1，不拷贝图像
+        ref.retain()
+        self.infer_queue.put([ref, output])
+        self.show_queue.put([ref, output])
+
+    def init_session(self):
+        """
+        创建会话（使用共享推理服务时复用服务的会话信息）并准备各分辨率的预处理
+        :return:
+        """
+        if self.server is None:
+            self.session = create_session(self.path, self.session_config, self.input_size or (640, 640))
+
+            # 获取模型输入输出信息
+            self.input_name = self.session.get_inputs()[0].name
+            self.output_names = [output.name for output in self.session.get_outputs()]
+        session = self.session if self.server is None else self.server.session
+        self.letterboxes[self.RESOLUTION_FULL] = Letterbox(self.resolve_input_size(session))
+        self.embedded_nms[self.RESOLUTION_FULL] = has_embedded_nms(session)
+        if self.embedded_nms[self.RESOLUTION_FULL]:
+            logger.info(f"{self.path} 已内置 NMS，跳过 Python 端 NMS")
+        self.init_low_resolution(session)
+
+    def preprocess(self, img, resolution: str = RESOLUTION_FULL):
+        """
+        :param img: BGR 图像
+        :param resolution: full / low
+        :return: (模型输入, 还原坐标所需的参数)
+        """
+        if self.detector is not None:
+            return self.detector.preprocess(img)
+        inputs, pad, size = self.letterboxes[resolution](img)
+        return inputs, (pad, size)
+
+    def infer(self, inputs, resolution: str = RESOLUTION_FULL):
+        """
+        :return: 模型原始输出
+        """
+        if self.detector is not None:
+            return self.detector.infer(inputs)
+        return self.run(inputs, resolution)[0]
+
+    def postprocess(self, output, meta, resolution: str = RESOLUTION_FULL):
+        """
+        :return: (n, 6) [x1, y1, x2, y2, conf, cls]，相对原图的 0-1 比例
+        """
+        if self.detector is not None:
+            return self.detector.postprocess(output, meta)
+        pad, size = meta
+        return postprocess(output, pad, size, self.fast_nms, self.embedded_nms[resolution])
+
+    def resolve_input_size(self, session):
+        """
+        确定输入尺寸
+        :param session:
+        :return: (宽, 高)
+        """
+        model_size = model_input_size(session)
+        if model_size is None:
+            return self.input_size or (640, 640)
+        if self.input_size and tuple(self.input_size) != model_size:
+            logger.warning(f"模型输入尺寸固定为 {model_size}，忽略配置的 {self.input_size}")
+        return model_size
+
+    def init_low_resolution(self, session):
+        """
+        准备低分辨率推理：动态输入尺寸的模型直接换一个 letterbox，否则加载单独导出的模型
+        :param session: 主模型会话
+        :return:
+        """
+        if model_input_size(session) is None:
+            self.letterboxes[self.RESOLUTION_LOW] = Letterbox(self.low_input_size)
+            self.embedded_nms[self.RESOLUTION_LOW] = self.embedded_nms[self.RESOLUTION_FULL]
+        elif self.low_model_path and self.server is None:
+            try:
+                low_session = create_session(self.low_model_path, self.session_config)
+            except FileNotFoundError as e:
+                # 如 int8 精度下没有量化 best_320.onnx，不能让推理线程因此退出
+                logger.warning(f"低分辨率模型不可用，始终使用全分辨率: {e}")
+                return
+            self.sessions[self.RESOLUTION_LOW] = low_session
+            self.embedded_nms[self.RESOLUTION_LOW] = has_embedded_nms(low_session)
+            self.letterboxes[self.RESOLUTION_LOW] = Letterbox(
+                model_input_size(low_session, self.low_input_size)
+            )
+        else:
+            logger.info("主模型输入尺寸固定且没有低分辨率模型，始终使用全分辨率")
+
+    def set_resolution(self, resolution: str):
+        """
+        由控制线程按游戏状态请求分辨率
+        :param resolution: full / low
+        :return:
+        """
+        self.resolution = resolution
+
+    def next_resolution(self) -> str:
+        """
+        本帧实际使用的分辨率
+        :return:
+        """
+        if self.resolution != self.RESOLUTION_LOW or self.RESOLUTION_LOW not in self.letterboxes:
+            self.low_frames = 0
+            return self.RESOLUTION_FULL
+        self.low_frames += 1
+        if self.full_probe_interval and self.low_frames % self.full_probe_interval == 0:
+            return self.RESOLUTION_FULL
+        return self.RESOLUTION_LOW
+
+    def run(self, inputs, resolution: str = RESOLUTION_FULL):
+        """
+        执行推理
+        :param inputs: (1, C, H, W) float32
+        :param resolution: full / low
+        :return: 输出列表
+        """
+        session = self.sessions.get(resolution)
+        if session is not None:
+            return session.run(None, {session.get_inputs()[0].name: inputs})
+        if self.server is not None:
+            return self.server.infer(inputs)
+        return self.session.run(self.output_names, {self.input_name: inputs})
+
+    def update_busy_time(self, elapsed: float, alpha: float = 0.1):
+        """
+        更新单帧处理耗时
+        :param elapsed: 本帧耗时
+        :param alpha: 滑动平均系数
+        :return:
+        """
+        if self.busy_time == 0.0:
+            self.busy_time = elapsed
+        else:
+            self.busy_time += alpha * (elapsed - self.busy_time)
+
+    def throughput(self) -> float:
+        """
+        推理线程满载时每秒可处理的帧数，尚无数据时返回 0
+        :return:
+        """
+        return 1.0 / self.busy_time if self.busy_time > 0 else 0.0